@@ -2,14 +2,26 @@ import bpy
 import math
 import os
 import glob
+import contextlib
+import csv
+import hashlib
+import json
+import shutil
+import subprocess
+import time
+import numpy as np
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 from mathutils import Vector
-from bpy_extras.object_utils import world_to_camera_view
 import sys 
 
 # Configuration
-output_dir = "/Users/mattfranchi/Repos/space-stager/processing/outputs"
+script_dir = os.path.dirname(os.path.abspath(__file__))
+output_dir = os.environ.get("SS_OUTPUT_DIR", os.path.join(script_dir, "outputs"))
 # Directory containing .blend models to process
-models_dir = "/Users/mattfranchi/Repos/space-stager/processing/models"
+models_dir = os.environ.get("SS_MODELS_DIR", os.path.join(script_dir, "models"))
 # Eight isometric yaws at 45° increments (including 0°)
 angles = [0, 45, 90, 135, 180, 225, 270, 315]  # in degrees around Z (yaw)
 
@@ -25,10 +37,121 @@ debug_overlay = os.environ.get("SS_DEBUG_OVERLAY", "0") in ("1", "true", "True")
 env_hdri_path = os.environ.get("SS_ENV_HDRI", "")
 # Add top-down view export option
 export_top_down = os.environ.get("SS_EXPORT_TOP_DOWN", "1") in ("1", "true", "True")
+# Render farm: shard models across N background Blender processes (1 = render in this process, 0 = one per core)
+farm_workers = int(os.environ.get("SS_WORKERS", "1") or "1")
+# Set by the farm driver on worker processes: JSON list of .blend paths to render and where to report results
+shard_file = os.environ.get("SS_SHARD_FILE", "")
+shard_report_path = os.environ.get("SS_SHARD_REPORT", "")
+# Reduce each model's bounding-box corners to their convex hull before fitting (needs scipy; skipped otherwise)
+hull_reduce_corners = os.environ.get("SS_HULL_CORNERS", "1") not in ("0", "false", "False")
+# Studio mode: load this template .blend (camera, lights, world, Line Art) once and append each model into it
+studio_template = os.environ.get("SS_STUDIO_TEMPLATE", "")
+# Incremental rebuilds: skip models whose .blend and render settings are unchanged (SS_FORCE=1 re-renders all)
+incremental = os.environ.get("SS_INCREMENTAL", "1") not in ("0", "false", "False")
+force_render = os.environ.get("SS_FORCE", "0") in ("1", "true", "True")
+# Per-model manifest written next to the renders in outputs/<model_stem>/
+manifest_name = "render_manifest.json"
+# Record per-stage wall time, resident memory and sample counts; reports go to outputs/profile_report.{json,csv}
+profile_enabled = os.environ.get("SS_PROFILE", "1") not in ("0", "false", "False")
+# Batched rendering: put all views of a model on timeline frames and render them as one
+# animation job with persistent data instead of one still render per view
+batch_render = os.environ.get("SS_BATCH_RENDER", "0") in ("1", "true", "True")
+# Quality tier: 'final' (default), 'draft' (fast framing check renders into outputs/_draft/),
+# or 'promote' (final-quality renders of models approved in outputs/_draft/approved.txt or that passed the draft check)
+quality_tier = os.environ.get("SS_QUALITY", "final").lower()
+draft_dir = os.path.join(output_dir, "_draft")
+draft_samples = int(os.environ.get("SS_DRAFT_SAMPLES", "1"))
+# Promotion also takes models whose draft framing passed the automatic check (0 = operator approval only)
+promote_auto_passed = os.environ.get("SS_PROMOTE_AUTO", "1") not in ("0", "false", "False")
+# Framing check: object must stay this many px off the frame edge and span at least this fraction of it
+draft_edge_px = int(os.environ.get("SS_DRAFT_EDGE_PX", "1"))
+draft_min_fill = float(os.environ.get("SS_DRAFT_MIN_FILL", "0.35"))
+# Also copy each model's final renders, flat, into this directory (e.g. public/data/icons/isometric-bw)
+publish_dir = os.environ.get("SS_PUBLISH_DIR", "")
+if quality_tier == "draft":
+    # Low resolution, minimal samples, EEVEE, no HDRI, kept apart from final renders
+    output_resolution = int(os.environ.get("SS_DRAFT_RES", "128"))
+    engine_choice = "EEVEE"
+    env_hdri_path = ""
+    output_dir = draft_dir
 
 # Ensure output folder exists
 os.makedirs(output_dir, exist_ok=True)
 
+# Stage records for the model currently being processed (see profile_stage)
+current_profile = []
+
+
+def peak_rss_mb():
+    """Lifetime peak resident memory of this Blender process, in MB (None where unsupported).
+
+    This is a high-water mark: it never goes down, so per stage and per model only its growth
+    (peak_growth) says anything about that step.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def current_rss_mb():
+    """Resident memory of this process right now, in MB (Linux only, None elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+
+
+def peak_growth(peak_before):
+    """How far the process peak rose since `peak_before` (0 when a step stayed under an earlier peak)."""
+    peak = peak_rss_mb()
+    if peak is None or peak_before is None:
+        return None
+    return round(peak - peak_before, 1)
+
+
+def stage_start():
+    """Start marker for record_stage: (perf_counter, process peak RSS)."""
+    return time.perf_counter(), peak_rss_mb()
+
+
+def current_samples(scene):
+    try:
+        if scene.render.engine == 'CYCLES':
+            return int(scene.cycles.samples)
+        return int(scene.eevee.taa_render_samples)
+    except Exception:
+        return None
+
+
+def record_stage(stage, start, view=None, samples=None, views=1):
+    """Record a stage begun at `start` (from stage_start) with its RSS at the end and peak growth."""
+    if not profile_enabled:
+        return
+    started, peak_before = start
+    current_profile.append({
+        "stage": stage,
+        "view": view,
+        "seconds": round(time.perf_counter() - started, 4),
+        "rss_mb": current_rss_mb(),
+        "peak_growth_mb": peak_growth(peak_before),
+        "samples": samples,
+        "views": views,
+    })
+
+
+@contextlib.contextmanager
+def profile_stage(stage, view=None, samples=None, views=1):
+    """Time a block and record it as a stage of the current model."""
+    start = stage_start()
+    try:
+        yield
+    finally:
+        record_stage(stage, start, view=view, samples=samples, views=views)
+
 
 def get_main_mesh_objects():
     """Return a list of mesh objects in the file (ignore visibility flags)."""
@@ -57,38 +180,83 @@ def get_model_stem(model_path_arg=None):
     return "model"
 
 
-def compute_world_bounds_center_and_size(objects):
-    """Compute world-space AABB center and XY size for given objects."""
-    if not objects:
-        return Vector((0.0, 0.0, 0.0)), 2.0, 2.0
-    mins = Vector((float('inf'), float('inf'), float('inf')))
-    maxs = Vector((float('-inf'), float('-inf'), float('-inf')))
-    for obj in objects:
-        for corner in obj.bound_box:
-            world_corner = obj.matrix_world @ Vector(corner)
-            mins.x = min(mins.x, world_corner.x)
-            mins.y = min(mins.y, world_corner.y)
-            mins.z = min(mins.z, world_corner.z)
-            maxs.x = max(maxs.x, world_corner.x)
-            maxs.y = max(maxs.y, world_corner.y)
-            maxs.z = max(maxs.z, world_corner.z)
-    center = (mins + maxs) * 0.5
-    size_x = maxs.x - mins.x
-    size_y = maxs.y - mins.y
-    return center, size_x, size_y
-
-
-def get_world_corners(objects):
-    corners = []
+def get_world_corner_array(objects):
+    """Return the world-space bounding-box corners of all objects as one (N, 3) array.
+
+    Coincident corners are merged and, when SS_HULL_CORNERS is on and scipy is
+    available, the set is reduced to its convex hull vertices: the hull has the same
+    extent along every viewing direction, so framing is unchanged.
+    """
+    blocks = []
     for obj in objects:
         try:
-            for c in obj.bound_box:
-                corners.append(obj.matrix_world @ Vector(c))
+            local = np.array([tuple(c) for c in obj.bound_box], dtype=np.float64)
+            matrix = np.array(obj.matrix_world, dtype=np.float64)
+            blocks.append(local @ matrix[:3, :3].T + matrix[:3, 3])
         except Exception:
             pass
+    if not blocks:
+        return np.zeros((0, 3), dtype=np.float64)
+    corners = np.unique(np.concatenate(blocks), axis=0)
+    if hull_reduce_corners and len(corners) > 64:
+        try:
+            from scipy.spatial import ConvexHull
+            corners = corners[ConvexHull(corners).vertices]
+        except Exception:
+            # scipy missing or degenerate (flat) geometry: keep all corners
+            pass
     return corners
 
 
+def compute_world_bounds_center_and_size(corners):
+    """Compute world-space AABB center and XY size from a corner array."""
+    if len(corners) == 0:
+        return Vector((0.0, 0.0, 0.0)), 2.0, 2.0
+    mins = corners.min(axis=0)
+    maxs = corners.max(axis=0)
+    center = Vector(((mins + maxs) * 0.5).tolist())
+    return center, float(maxs[0] - mins[0]), float(maxs[1] - mins[1])
+
+
+def isometric_view_margin(angle):
+    """Framing margin per yaw: diagonal views and the 0/45 degree views get extra room."""
+    angle_mod = int(angle) % 360
+    margin = 1.22 if angle_mod in (45, 135, 225, 315) else 1.18
+    if angle_mod in (0, 360, 45):
+        margin = max(margin, 1.30)
+    return margin
+
+
+def solve_ortho_scales(corners, center, yaw_degs, elevation_deg, margins, aspect, resolution_x, border_px):
+    """Solve the orthographic width needed for every isometric yaw and the top-down view at once.
+
+    The camera for each yaw sits on a sphere around `center` looking at it with world +Z
+    up (see set_camera_look_at), so its image-plane axes are analytic:
+    right = (-sin(yaw), cos(yaw), 0) and up = (-cos(yaw) sin(elev), -sin(yaw) sin(elev), cos(elev)).
+    Projecting all corners onto these axes in one matrix product gives the half extents per
+    view. Returns (list of widths per yaw, None where not finite; top-down width or None).
+    """
+    if len(corners) == 0:
+        return [None] * len(yaw_degs), None
+    yaws = np.radians(np.asarray(yaw_degs, dtype=np.float64))
+    elev = math.radians(elevation_deg)
+    sin_y, cos_y = np.sin(yaws), np.cos(yaws)
+    right = np.stack([-sin_y, cos_y, np.zeros_like(yaws)], axis=1)
+    up = np.stack([-cos_y * math.sin(elev), -sin_y * math.sin(elev), np.full_like(yaws, math.cos(elev))], axis=1)
+    rel = corners - np.array(center, dtype=np.float64)
+    half_w = np.abs(rel @ right.T).max(axis=0)
+    half_h = np.abs(rel @ up.T).max(axis=0)
+    widths = np.maximum(2.0 * half_w, 2.0 * half_h * aspect) * np.asarray(margins, dtype=np.float64)
+    if border_px > 0 and resolution_x > 0:
+        # Add border_px pixels on both sides at the final world-per-pixel size
+        widths += 2.0 * (widths / resolution_x) * border_px
+    iso = [max(float(w), 0.1) if math.isfinite(w) and w > 0 else None for w in widths]
+    # Top-down views fit the XY footprint with a fixed margin
+    footprint = corners[:, :2].max(axis=0) - corners[:, :2].min(axis=0)
+    top = float(footprint.max()) * 1.25
+    return iso, top if math.isfinite(top) else None
+
+
 def ensure_orbit_empty(name: str, location: Vector):
     obj = bpy.data.objects.get(name)
     if obj and obj.type == 'EMPTY':
@@ -221,101 +389,56 @@ def export_gp_to_svg(filepath: str):
     )
 
 
-def main():
-    # Collect all .blend files to process
-    blend_files = sorted([p for p in glob.glob(os.path.join(models_dir, "*.blend")) if os.path.isfile(p)])
+def setup_render_rig(scene, keep_template_lighting=False):
+    """Configure engine and output settings, the ortho camera, world and sun rig; returns the camera.
 
-    for model_path in blend_files:
-        # Attempt to open model .blend
+    With keep_template_lighting, a studio template's node-based world and lights are left as authored.
+    """
+    # Scene setup
+    # Render engine selection
+    if engine_choice == 'CYCLES':
+        scene.render.engine = 'CYCLES'
         try:
-            if model_path and os.path.isfile(model_path):
-                current_filepath = bpy.data.filepath
-                if not current_filepath or os.path.abspath(current_filepath) != os.path.abspath(model_path):
-                    bpy.ops.wm.open_mainfile(filepath=model_path)
+            scene.cycles.device = 'CPU'
+            scene.cycles.samples = 32
         except Exception:
             pass
-
-        # Always use the current active scene after potential file load
-        scene = bpy.context.scene
-        if not scene:
-            continue
-
-        # Scene setup
-        # Render engine selection
-        if engine_choice == 'CYCLES':
-            scene.render.engine = 'CYCLES'
-            try:
-                scene.cycles.device = 'CPU'
-                scene.cycles.samples = 32
-            except Exception:
-                pass
-        else:
-            scene.render.engine = 'BLENDER_EEVEE_NEXT'
-        scene.render.use_freestyle = False  # Avoid Freestyle; prefer raster or GP Line Art only if explicitly requested
-
-        # High-quality orthographic render defaults (for PNG path)
-        scene.render.resolution_x = output_resolution
-        scene.render.resolution_y = output_resolution
-        scene.render.resolution_percentage = 100
-        # Transparent background so non-model pixels are fully transparent
-        scene.render.film_transparent = True
+    else:
+        scene.render.engine = 'BLENDER_EEVEE_NEXT'
+    if quality_tier == "draft":
         try:
-            # Punchier highlights and sun: Filmic with high contrast
-            scene.view_settings.view_transform = 'Filmic'
-            scene.view_settings.look = 'Very High Contrast'
-            scene.view_settings.exposure = 0.6
-            scene.view_settings.gamma = 1.0
-            scene.display_settings.display_device = 'sRGB'
+            scene.eevee.taa_render_samples = draft_samples
         except Exception:
             pass
+    scene.render.use_freestyle = False  # Avoid Freestyle; prefer raster or GP Line Art only if explicitly requested
 
-        mesh_objects = get_main_mesh_objects()
-        center, size_x, size_y = compute_world_bounds_center_and_size(mesh_objects)
-
-        # Ensure all collections are enabled in the active view layer and renderable
-        def enable_all_layer_collections(layer_collection):
-            try:
-                layer_collection.exclude = False
-                if hasattr(layer_collection, 'hide_viewport'):
-                    layer_collection.hide_viewport = False
-            except Exception:
-                pass
-            for child in getattr(layer_collection, 'children', []):
-                enable_all_layer_collections(child)
-
-        try:
-            enable_all_layer_collections(bpy.context.view_layer.layer_collection)
-        except Exception:
-            pass
-
-        # Also mark object and collection render flags on
-        try:
-            for obj in bpy.data.objects:
-                try:
-                    obj.hide_render = False
-                    if hasattr(obj, 'visible_get') and not obj.visible_get():
-                        obj.hide_set(False)
-                except Exception:
-                    pass
-            for coll in bpy.data.collections:
-                try:
-                    coll.hide_render = False
-                except Exception:
-                    pass
-        except Exception:
-            pass
+    # High-quality orthographic render defaults (for PNG path)
+    scene.render.resolution_x = output_resolution
+    scene.render.resolution_y = output_resolution
+    scene.render.resolution_percentage = 100
+    # Transparent background so non-model pixels are fully transparent
+    scene.render.film_transparent = True
+    try:
+        # Punchier highlights and sun: Filmic with high contrast
+        scene.view_settings.view_transform = 'Filmic'
+        scene.view_settings.look = 'Very High Contrast'
+        scene.view_settings.exposure = 0.6
+        scene.view_settings.gamma = 1.0
+        scene.display_settings.display_device = 'sRGB'
+    except Exception:
+        pass
 
-        cam = ensure_camera("BatchCam", scene)
-        scene.camera = cam
+    cam = ensure_camera("BatchCam", scene)
+    scene.camera = cam
 
-        # Orthographic camera framing
-        cam.data.type = 'ORTHO'
-        max_size = max(2.0, max(size_x, size_y))
-        cam.data.ortho_scale = max_size * 1.25
-        cam.data.clip_start = 0.01
-        cam.data.clip_end = 5000.0
+    # Orthographic camera framing
+    cam.data.type = 'ORTHO'
+    cam.data.clip_start = 0.01
+    cam.data.clip_end = 5000.0
 
-        # Improve lighting: world and a simple 3-sun rig
+    # Improve lighting: world and a simple 3-sun rig
+    # (a studio template's own node-based world is kept as-is)
+    if not (keep_template_lighting and scene.world and scene.world.use_nodes):
         try:
             world = scene.world or bpy.data.worlds.new("World")
             scene.world = world
@@ -341,313 +464,814 @@ def main():
         except Exception:
             pass
 
-        # Optional debug overlay: bright emissive axis cross at center
-        if debug_overlay:
+    def ensure_sun(name: str, rotation_euler, energy: float, color=(1.0, 1.0, 1.0)):
+        light_obj = bpy.data.objects.get(name)
+        if not light_obj or light_obj.type != 'LIGHT':
+            light_data = bpy.data.lights.new(name=name, type='SUN')
+            light_obj = bpy.data.objects.new(name, light_data)
+            scene.collection.objects.link(light_obj)
+        light_obj.rotation_euler = rotation_euler
+        light_obj.data.energy = energy
+        try:
+            light_obj.data.color = color
+        except Exception:
+            pass
+        return light_obj
+
+    try:
+        # A studio template that ships its own lights keeps them untouched
+        if not (keep_template_lighting and any(o.type == 'LIGHT' for o in scene.objects)):
+            # Key light
+            ensure_sun("IsoSunKey", (math.radians(50), 0.0, math.radians(45)), 5.0, (1.0, 0.98, 0.95))
+            # Fill
+            ensure_sun("IsoSunFill", (math.radians(70), 0.0, math.radians(180+30)), 1.2, (0.9, 0.95, 1.0))
+            # Rim
+            ensure_sun("IsoSunRim", (math.radians(40), 0.0, math.radians(-60)), 2.0, (0.95, 0.97, 1.0))
+        # AO and shadows
+        if hasattr(scene, 'eevee'):
             try:
-                mat = bpy.data.materials.get("SS_Debug_Emissive") or bpy.data.materials.new("SS_Debug_Emissive")
-                mat.use_nodes = True
-                nt = mat.node_tree
-                for n in list(nt.nodes):
-                    nt.nodes.remove(n)
-                out = nt.nodes.new("ShaderNodeOutputMaterial")
-                emit = nt.nodes.new("ShaderNodeEmission")
-                emit.inputs[0].default_value = (1.0, 0.2, 0.2, 1.0)
-                emit.inputs[1].default_value = 5.0
-                nt.links.new(emit.outputs[0], out.inputs[0])
-                for axis, color in (('X', (1, 0.2, 0.2, 1)), ('Y', (0.2, 1, 0.2, 1)), ('Z', (0.2, 0.2, 1, 1))):
-                    mesh = bpy.data.meshes.new(f"SS_Debug_{axis}")
-                    obj = bpy.data.objects.new(f"SS_Debug_{axis}", mesh)
-                    bpy.context.scene.collection.objects.link(obj)
-                    verts = [
-                        (center.x - 0.5, center.y, center.z),
-                        (center.x + 0.5, center.y, center.z),
-                    ] if axis == 'X' else [
-                        (center.x, center.y - 0.5, center.z),
-                        (center.x, center.y + 0.5, center.z),
-                    ] if axis == 'Y' else [
-                        (center.x, center.y, center.z - 0.5),
-                        (center.x, center.y, center.z + 0.5),
-                    ]
-                    edges = [(0, 1)]
-                    mesh.from_pydata(verts, edges, [])
-                    if obj.data.materials:
-                        obj.data.materials[0] = mat
-                    else:
-                        obj.data.materials.append(mat)
-                    obj.hide_render = False
+                scene.eevee.use_gtao = True
+                scene.eevee.gtao_distance = 0.8
+                scene.eevee.gtao_factor = 1.0
+                scene.eevee.use_shadows = True
+                # Reflections for metallic materials
+                if hasattr(scene.eevee, 'use_ssr'):
+                    scene.eevee.use_ssr = True
+                if hasattr(scene.eevee, 'use_ssr_refraction'):
+                    scene.eevee.use_ssr_refraction = True
             except Exception:
                 pass
+    except Exception:
+        pass
+
+    return cam
+
+
+def enable_all_renderable():
+    """Enable every layer collection and clear hide flags so all objects in the file render."""
+    # Ensure all collections are enabled in the active view layer and renderable
+    def enable_all_layer_collections(layer_collection):
+        try:
+            layer_collection.exclude = False
+            if hasattr(layer_collection, 'hide_viewport'):
+                layer_collection.hide_viewport = False
+        except Exception:
+            pass
+        for child in getattr(layer_collection, 'children', []):
+            enable_all_layer_collections(child)
 
-        def ensure_sun(name: str, rotation_euler, energy: float, color=(1.0, 1.0, 1.0)):
-            light_obj = bpy.data.objects.get(name)
-            if not light_obj or light_obj.type != 'LIGHT':
-                light_data = bpy.data.lights.new(name=name, type='SUN')
-                light_obj = bpy.data.objects.new(name, light_data)
-                scene.collection.objects.link(light_obj)
-            light_obj.rotation_euler = rotation_euler
-            light_obj.data.energy = energy
+    try:
+        enable_all_layer_collections(bpy.context.view_layer.layer_collection)
+    except Exception:
+        pass
+
+    # Also mark object and collection render flags on
+    try:
+        for obj in bpy.data.objects:
+            try:
+                obj.hide_render = False
+                if hasattr(obj, 'visible_get') and not obj.visible_get():
+                    obj.hide_set(False)
+            except Exception:
+                pass
+        for coll in bpy.data.collections:
             try:
-                light_obj.data.color = color
+                coll.hide_render = False
             except Exception:
                 pass
-            return light_obj
+    except Exception:
+        pass
+
+
+def render_model(model_path, views=None):
+    """Open one .blend and render the configured views into outputs/<model_stem>/.
+
+    `views` optionally restricts rendering to a set of output filenames (see
+    expected_view_files); framing is still fitted across all angles so re-rendered
+    views match the ones kept from a previous run.
+    Returns True when the model was rendered, False when it could not be opened.
+    """
+    # Attempt to open model .blend
+    try:
+        if model_path and os.path.isfile(model_path):
+            current_filepath = bpy.data.filepath
+            if not current_filepath or os.path.abspath(current_filepath) != os.path.abspath(model_path):
+                with profile_stage("open"):
+                    bpy.ops.wm.open_mainfile(filepath=model_path)
+    except Exception as exc:
+        print(f"[3d2svg] Failed to open {model_path}: {exc}")
+        return False
+
+    # Always use the current active scene after potential file load
+    scene = bpy.context.scene
+    if not scene:
+        return False
+    prep_start = stage_start()
+
+    cam = setup_render_rig(scene)
+    enable_all_renderable()
+    mesh_objects = get_main_mesh_objects()
+    record_stage("scene_prep", prep_start)
+    return render_model_views(scene, cam, mesh_objects, get_model_stem(model_path), views)
+
+
+# Studio scene shared by all models rendered in this process (see load_studio)
+studio_state = {"scene": None, "camera": None, "template_sha256": None}
 
+
+def load_studio():
+    """Open the studio template once per process and set up its render rig."""
+    if studio_state["scene"] is None:
+        with profile_stage("open"):
+            bpy.ops.wm.open_mainfile(filepath=studio_template)
+        scene = bpy.context.scene
+        prep_start = stage_start()
+        studio_state["camera"] = setup_render_rig(scene, keep_template_lighting=True)
+        record_stage("scene_prep", prep_start)
+        studio_state["scene"] = scene
+    return studio_state["scene"]
+
+
+def append_model_collection(model_path, scene):
+    """Append all objects of a model .blend into a fresh collection in the studio scene.
+
+    Cameras and lights from the model file are skipped; the studio provides its own rig.
+    """
+    coll = bpy.data.collections.new("SS_Model")
+    scene.collection.children.link(coll)
+    with bpy.data.libraries.load(model_path, link=False) as (data_from, data_to):
+        data_to.objects = list(data_from.objects)
+    for obj in data_to.objects:
+        if obj is None or obj.type in ('CAMERA', 'LIGHT'):
+            continue
+        coll.objects.link(obj)
+        obj.hide_render = False
+    return coll
+
+
+def remove_model_collection(coll):
+    """Remove a model appended by append_model_collection and free its now-unused data."""
+    for obj in list(coll.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
+    bpy.data.collections.remove(coll)
+    # Meshes, materials and images (and skipped cameras/lights) appended with the model are orphans now
+    try:
+        bpy.data.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
+    except Exception:
         try:
-            # Key light
-            ensure_sun("IsoSunKey", (math.radians(50), 0.0, math.radians(45)), 5.0, (1.0, 0.98, 0.95))
-            # Fill
-            ensure_sun("IsoSunFill", (math.radians(70), 0.0, math.radians(180+30)), 1.2, (0.9, 0.95, 1.0))
-            # Rim
-            ensure_sun("IsoSunRim", (math.radians(40), 0.0, math.radians(-60)), 2.0, (0.95, 0.97, 1.0))
-            # AO and shadows
-            if hasattr(scene, 'eevee'):
-                try:
-                    scene.eevee.use_gtao = True
-                    scene.eevee.gtao_distance = 0.8
-                    scene.eevee.gtao_factor = 1.0
-                    scene.eevee.use_shadows = True
-                    # Reflections for metallic materials
-                    if hasattr(scene.eevee, 'use_ssr'):
-                        scene.eevee.use_ssr = True
-                    if hasattr(scene.eevee, 'use_ssr_refraction'):
-                        scene.eevee.use_ssr_refraction = True
-                except Exception:
-                    pass
+            bpy.ops.outliner.orphans_purge(do_recursive=True)
         except Exception:
             pass
 
-        # Utility: set camera to look at target with world up
-        def set_camera_look_at(cam_obj, cam_loc: Vector, target: Vector, world_up: Vector = Vector((0, 0, 1))):
-            """Aim camera using to_track_quat, then correct roll so image-plane up aligns with projected world_up.
-            This stabilizes cardinal views without risking degenerate matrices.
-            """
-            import mathutils
-            from mathutils import Quaternion
-            cam_obj.location = cam_loc
-            forward = (target - cam_loc)
-            if forward.length == 0:
-                forward = Vector((0.0, 0.0, -1.0))
-            # Aim camera forward (-Z)
-            rot_quat = forward.to_track_quat('-Z', 'Y')
-            cam_obj.rotation_euler = rot_quat.to_euler()
-            # Roll correction: align camera up (+Y) with world_up projected into image plane
-            cam_quat = cam_obj.rotation_euler.to_quaternion()
-            cam_forward_world = cam_quat @ Vector((0.0, 0.0, -1.0))
-            cam_up_world = cam_quat @ Vector((0.0, 1.0, 0.0))
-            up_proj = world_up - cam_forward_world * world_up.dot(cam_forward_world)
-            if up_proj.length > 1e-8 and cam_up_world.length > 1e-8:
-                up_proj.normalize()
-                cam_up_world.normalize()
-                # Signed angle around forward axis
-                cross = cam_up_world.cross(up_proj)
-                sign = 1.0 if cam_forward_world.dot(cross) > 0 else -1.0
-                angle = cam_up_world.angle(up_proj)
-                roll_delta = -sign * angle
-                # Apply roll around camera forward axis (world space)
-                roll_quat = Quaternion(cam_forward_world, roll_delta)
-                cam_quat = roll_quat @ cam_quat
-                cam_obj.rotation_euler = cam_quat.to_euler()
-
-        def fit_ortho_scale_to_bounds(cam_obj, world_corners, margin: float = 1.1):
-            """Fit orthographic width to contain all world corners with given margin.
-            Accounts for render aspect ratio so both width and height fit.
-            """
-            if not world_corners:
-                return
-            inv = cam_obj.matrix_world.inverted()
-            xs = []
-            ys = []
-            for wc in world_corners:
-                lc = inv @ wc
-                xs.append(lc.x)
-                ys.append(lc.y)
-            if not xs or not ys:
-                return
-            half_w = max(abs(min(xs)), abs(max(xs)))
-            half_h = max(abs(min(ys)), abs(max(ys)))
-            # Compute width needed so that height also fits given output aspect
-            scn = bpy.context.scene
-            aspect = (scn.render.resolution_x or 1) / max(1, scn.render.resolution_y)
-            width_needed = max(2.0 * half_w, 2.0 * half_h * aspect)
-            width_needed *= margin
-            # Ensure at least a few pixels of border to avoid visible edge cropping
-            border_px = int(os.environ.get("SS_BORDER_PX", "4"))
-            if border_px > 0 and scn.render.resolution_x > 0:
-                world_per_px = width_needed / scn.render.resolution_x
-                width_needed += 2.0 * world_per_px * border_px
-            if not math.isfinite(width_needed) or width_needed <= 0:
-                return
-            cam_obj.data.ortho_scale = max(width_needed, 0.1)
-
-        def compute_needed_ortho_scale_for_current_pose(cam_obj, world_corners, scn, margin: float = 1.18, border_px: int = 4):
-            """Compute required orthographic width for current camera pose to fit all points with margin.
-            Returns the width needed (ortho_scale) without mutating the camera.
-            """
-            if not world_corners:
-                return cam_obj.data.ortho_scale
-            inv = cam_obj.matrix_world.inverted()
-            xs = []
-            ys = []
-            for wc in world_corners:
-                lc = inv @ wc
-                xs.append(lc.x)
-                ys.append(lc.y)
-            if not xs or not ys:
-                return cam_obj.data.ortho_scale
-            half_w = max(abs(min(xs)), abs(max(xs)))
-            half_h = max(abs(min(ys)), abs(max(ys)))
-            aspect = (scn.render.resolution_x or 1) / max(1, scn.render.resolution_y)
-            width_needed = max(2.0 * half_w, 2.0 * half_h * aspect)
-            width_needed *= margin
-            if border_px > 0 and scn.render.resolution_x > 0:
-                world_per_px = width_needed / scn.render.resolution_x
-                width_needed += 2.0 * world_per_px * border_px
-            if not math.isfinite(width_needed) or width_needed <= 0:
-                return cam_obj.data.ortho_scale
-            return max(width_needed, 0.1)
-
-        def fit_ortho_scale_by_ndc(scn, cam_obj, world_points, margin: float = 1.05):
-            """Ensure no cropping by measuring object span in normalized device coords.
-            If the projected span exceeds the frame (>=1.0), increase ortho_scale accordingly.
-            """
-            if not world_points:
-                return
-            # Compute normalized coordinates [0..1]
-            min_x = 1.0
-            min_y = 1.0
-            max_x = 0.0
-            max_y = 0.0
-            for p in world_points:
-                uvw = world_to_camera_view(scn, cam_obj, p)
-                x, y = uvw.x, uvw.y
-                # Clamp for safety
-                if x < min_x:
-                    min_x = x
-                if x > max_x:
-                    max_x = x
-                if y < min_y:
-                    min_y = y
-                if y > max_y:
-                    max_y = y
-            span_x = max(1e-6, max_x - min_x)
-            span_y = max(1e-6, max_y - min_y)
-            span = max(span_x, span_y)
-            if not math.isfinite(span):
-                return
-            if span * margin > 1.0:
-                factor = span * margin
-                cam_obj.data.ortho_scale = max(0.1, cam_obj.data.ortho_scale * factor)
-
-        def render_top_down_view(cam_obj, angle_deg, model_stem, model_output_dir):
-            """Render a top-down view from the given angle around the Z-axis."""
-            yaw_rad = math.radians(angle_deg) + base_yaw_rad
-            
-            # Position camera directly above the center, looking straight down
-            cam_obj.location = Vector((center.x, center.y, center.z + radius))
-            
-            # Rotate camera to look down at the target
-            # Start with camera pointing down (-Z)
-            cam_obj.rotation_euler = (0, 0, yaw_rad)
-            
-            # Then rotate around X to look down
-            cam_obj.rotation_euler = (math.radians(90), 0, yaw_rad)
-            
-            bpy.context.view_layer.update()
-            
-            if output_format in ("PNG", "BOTH"):
-                scene.render.image_settings.file_format = 'PNG'
-                scene.render.image_settings.color_mode = 'RGBA'
-                scene.render.filepath = os.path.join(model_output_dir, f"{model_stem}_TOP_{angle_deg:03d}.png")
-                bpy.ops.render.render(write_still=True)
 
-        # Ensure Line Art GP object exists and is configured only if SVG requested
-        gp = None
-        if output_format in ("SVG", "BOTH"):
-            gp = ensure_lineart_gp_object("LineArt", cam)
+def render_model_in_studio(model_path, views=None):
+    """Render one model inside the shared studio scene instead of opening its .blend.
 
-        # Create model-specific output directory
-        model_stem = get_model_stem(model_path)
-        model_output_dir = os.path.join(output_dir, model_stem)
-        os.makedirs(model_output_dir, exist_ok=True)
+    Same contract as render_model; skips the per-model file load and rig rebuild.
+    """
+    scene = load_studio()
+    try:
+        with profile_stage("append"):
+            coll = append_model_collection(model_path, scene)
+    except Exception as exc:
+        print(f"[3d2svg] Failed to append {model_path}: {exc}")
+        return False
+    try:
+        mesh_objects = [obj for obj in coll.all_objects if obj.type == 'MESH']
+        return render_model_views(scene, studio_state["camera"], mesh_objects, get_model_stem(model_path), views)
+    finally:
+        with profile_stage("unlink"):
+            remove_model_collection(coll)
 
-        # Precompute constants for isometric camera placement
-        elev_rad = math.radians(isometric_elevation_deg)
-        base_yaw_rad = math.radians(base_yaw_offset_deg)
-        radius = max_size * 2.0 + 1.0
 
-        # Two-pass fit: compute a single max ortho_scale that fits all angles, then render
-        cos_elev = math.cos(elev_rad)
-        sin_elev = math.sin(elev_rad)
+def render_poses_as_animation(scene, cam, poses, model_output_dir):
+    """Render several camera poses as one animation job instead of one still render per view.
 
-        # Pass 1: compute max required scale across angles for isometric views
-        max_required_scale = cam.data.ortho_scale
-        for angle in angles:
-            yaw_rad = math.radians(angle) + base_yaw_rad
-            cos_yaw = math.cos(yaw_rad)
-            sin_yaw = math.sin(yaw_rad)
-            x = center.x + radius * cos_yaw * cos_elev
-            y = center.y + radius * sin_yaw * cos_elev
-            z = center.z + radius * sin_elev
-            cam_loc = Vector((x, y, z))
-            set_camera_look_at(cam, cam_loc, center, world_up=Vector((0, 0, 1)))
-            angle_mod = int(angle) % 360
-            is_diag = angle_mod in (45, 135, 225, 315)
-            base_margin = 1.22 if is_diag else 1.18
-            if angle_mod in (0, 360, 45):
-                base_margin = max(base_margin, 1.30)
-            req = compute_needed_ortho_scale_for_current_pose(cam, get_world_corners(mesh_objects), scene, margin=base_margin, border_px=int(os.environ.get("SS_BORDER_PX", "6")))
-            if req > max_required_scale:
-                max_required_scale = req
-
-        cam.data.ortho_scale = max_required_scale
-
-        # Pass 2: render isometric views with unified scale
+    Each (filename, location, rotation, ortho_scale) pose becomes a camera keyframe on its own
+    frame, with constant interpolation, and a timeline marker bound to the camera names that
+    frame. The range is rendered with persistent data, so the scene is synced and shaders are
+    compiled once. Rendered frames are then renamed to the view filenames. The frame range,
+    output path and persistent-data setting are restored afterwards, and the keyframes and
+    markers removed.
+    """
+    saved = {
+        "frame_start": scene.frame_start,
+        "frame_end": scene.frame_end,
+        "frame_step": scene.frame_step,
+        "frame_current": scene.frame_current,
+        "filepath": scene.render.filepath,
+        "use_persistent_data": scene.render.use_persistent_data,
+        "use_file_extension": scene.render.use_file_extension,
+    }
+    frames_dir = os.path.join(model_output_dir, "_frames")
+    os.makedirs(frames_dir, exist_ok=True)
+    markers = []
+    try:
+        cam.animation_data_clear()
+        cam.data.animation_data_clear()
+        for frame, (filename, location, rotation, ortho_scale) in enumerate(poses, start=1):
+            cam.location = location
+            cam.rotation_euler = rotation
+            cam.data.ortho_scale = ortho_scale
+            cam.keyframe_insert("location", frame=frame)
+            cam.keyframe_insert("rotation_euler", frame=frame)
+            cam.data.keyframe_insert("ortho_scale", frame=frame)
+            marker = scene.timeline_markers.new(filename, frame=frame)
+            marker.camera = cam
+            markers.append(marker)
+        # Frames sit exactly on keys, so interpolation only matters if a frame is re-rendered by hand
+        try:
+            for anim in (cam.animation_data, cam.data.animation_data):
+                if anim and anim.action:
+                    for fcurve in anim.action.fcurves:
+                        for point in fcurve.keyframe_points:
+                            point.interpolation = 'CONSTANT'
+        except AttributeError:  # layered actions without the legacy fcurves accessor
+            pass
+
+        scene.frame_start = 1
+        scene.frame_end = len(poses)
+        scene.frame_step = 1
+        scene.render.use_persistent_data = True
+        scene.render.use_file_extension = True
+        scene.render.image_settings.file_format = 'PNG'
+        scene.render.image_settings.color_mode = 'RGBA'
+        scene.render.filepath = os.path.join(frames_dir, "frame_")
+        with profile_stage("render", view=f"batch of {len(poses)}", samples=current_samples(scene), views=len(poses)):
+            bpy.ops.render.render(animation=True)
+
+        # Frame number -> view filename
+        for frame, (filename, *_pose) in enumerate(poses, start=1):
+            frame_path = scene.render.frame_path(frame=frame)
+            if os.path.isfile(frame_path):
+                os.replace(frame_path, os.path.join(model_output_dir, filename))
+            else:
+                print(f"[3d2svg] Batched render produced no frame {frame} for {filename}")
+    finally:
+        for marker in markers:
+            scene.timeline_markers.remove(marker)
+        cam.animation_data_clear()
+        cam.data.animation_data_clear()
+        scene.frame_start = saved["frame_start"]
+        scene.frame_end = saved["frame_end"]
+        scene.frame_step = saved["frame_step"]
+        scene.frame_set(saved["frame_current"])
+        scene.render.filepath = saved["filepath"]
+        scene.render.use_persistent_data = saved["use_persistent_data"]
+        scene.render.use_file_extension = saved["use_file_extension"]
+        with contextlib.suppress(OSError):
+            os.rmdir(frames_dir)
+
+
+def render_model_views(scene, cam, mesh_objects, model_stem, views=None):
+    """Frame `mesh_objects` and render every isometric and top-down view for one model."""
+    # Walk every object's bounding box once; all framing below works off this array
+    world_corners = get_world_corner_array(mesh_objects)
+    center, size_x, size_y = compute_world_bounds_center_and_size(world_corners)
+
+    # Orthographic camera framing
+    max_size = max(2.0, max(size_x, size_y))
+    cam.data.ortho_scale = max_size * 1.25
+
+    # Optional debug overlay: bright emissive axis cross at center
+    if debug_overlay:
+        try:
+            mat = bpy.data.materials.get("SS_Debug_Emissive") or bpy.data.materials.new("SS_Debug_Emissive")
+            mat.use_nodes = True
+            nt = mat.node_tree
+            for n in list(nt.nodes):
+                nt.nodes.remove(n)
+            out = nt.nodes.new("ShaderNodeOutputMaterial")
+            emit = nt.nodes.new("ShaderNodeEmission")
+            emit.inputs[0].default_value = (1.0, 0.2, 0.2, 1.0)
+            emit.inputs[1].default_value = 5.0
+            nt.links.new(emit.outputs[0], out.inputs[0])
+            for axis, color in (('X', (1, 0.2, 0.2, 1)), ('Y', (0.2, 1, 0.2, 1)), ('Z', (0.2, 0.2, 1, 1))):
+                mesh = bpy.data.meshes.new(f"SS_Debug_{axis}")
+                obj = bpy.data.objects.new(f"SS_Debug_{axis}", mesh)
+                bpy.context.scene.collection.objects.link(obj)
+                verts = [
+                    (center.x - 0.5, center.y, center.z),
+                    (center.x + 0.5, center.y, center.z),
+                ] if axis == 'X' else [
+                    (center.x, center.y - 0.5, center.z),
+                    (center.x, center.y + 0.5, center.z),
+                ] if axis == 'Y' else [
+                    (center.x, center.y, center.z - 0.5),
+                    (center.x, center.y, center.z + 0.5),
+                ]
+                edges = [(0, 1)]
+                mesh.from_pydata(verts, edges, [])
+                if obj.data.materials:
+                    obj.data.materials[0] = mat
+                else:
+                    obj.data.materials.append(mat)
+                obj.hide_render = False
+        except Exception:
+            pass
+
+    # Utility: set camera to look at target with world up
+    def set_camera_look_at(cam_obj, cam_loc: Vector, target: Vector, world_up: Vector = Vector((0, 0, 1))):
+        """Aim camera using to_track_quat, then correct roll so image-plane up aligns with projected world_up.
+        This stabilizes cardinal views without risking degenerate matrices.
+        """
+        from mathutils import Quaternion
+        cam_obj.location = cam_loc
+        forward = (target - cam_loc)
+        if forward.length == 0:
+            forward = Vector((0.0, 0.0, -1.0))
+        # Aim camera forward (-Z)
+        rot_quat = forward.to_track_quat('-Z', 'Y')
+        cam_obj.rotation_euler = rot_quat.to_euler()
+        # Roll correction: align camera up (+Y) with world_up projected into image plane
+        cam_quat = cam_obj.rotation_euler.to_quaternion()
+        cam_forward_world = cam_quat @ Vector((0.0, 0.0, -1.0))
+        cam_up_world = cam_quat @ Vector((0.0, 1.0, 0.0))
+        up_proj = world_up - cam_forward_world * world_up.dot(cam_forward_world)
+        if up_proj.length > 1e-8 and cam_up_world.length > 1e-8:
+            up_proj.normalize()
+            cam_up_world.normalize()
+            # Signed angle around forward axis
+            cross = cam_up_world.cross(up_proj)
+            sign = 1.0 if cam_forward_world.dot(cross) > 0 else -1.0
+            angle = cam_up_world.angle(up_proj)
+            roll_delta = -sign * angle
+            # Apply roll around camera forward axis (world space)
+            roll_quat = Quaternion(cam_forward_world, roll_delta)
+            cam_quat = roll_quat @ cam_quat
+            cam_obj.rotation_euler = cam_quat.to_euler()
+
+    def top_down_pose(angle_deg):
+        """Camera directly above the center looking straight down, rotated by the given yaw."""
+        yaw_rad = math.radians(angle_deg) + base_yaw_rad
+        return Vector((center.x, center.y, center.z + radius)), (math.radians(90), 0, yaw_rad)
+
+    # Ensure Line Art GP object exists and is configured only if SVG requested
+    gp = None
+    if output_format in ("SVG", "BOTH"):
+        gp = ensure_lineart_gp_object("LineArt", cam)
+
+    # Create model-specific output directory
+    model_output_dir = os.path.join(output_dir, model_stem)
+    os.makedirs(model_output_dir, exist_ok=True)
+
+    # Precompute constants for isometric camera placement
+    elev_rad = math.radians(isometric_elevation_deg)
+    base_yaw_rad = math.radians(base_yaw_offset_deg)
+    radius = max_size * 2.0 + 1.0
+
+    # Two-pass fit: compute a single max ortho_scale that fits all angles, then render
+    cos_elev = math.cos(elev_rad)
+    sin_elev = math.sin(elev_rad)
+
+    # Pass 1: solve the required scale for all isometric yaws and the top-down view in one batch
+    fit_start = stage_start()
+    aspect = (scene.render.resolution_x or 1) / max(1, scene.render.resolution_y)
+    iso_scales, top_down_scale = solve_ortho_scales(
+        world_corners, center, [a + base_yaw_offset_deg for a in angles], isometric_elevation_deg,
+        [isometric_view_margin(a) for a in angles], aspect, scene.render.resolution_x,
+        int(os.environ.get("SS_BORDER_PX", "6")),
+    )
+    max_required_scale = max([cam.data.ortho_scale] + [w for w in iso_scales if w is not None])
+    cam.data.ortho_scale = max_required_scale
+    record_stage("fit", fit_start)
+
+    # Pass 2: collect the camera pose (location, rotation, ortho scale) of every requested view
+    png_requested = output_format in ("PNG", "BOTH")
+    poses = []
+    for angle in angles:
+        yaw_rad = math.radians(angle) + base_yaw_rad
+        cos_yaw = math.cos(yaw_rad)
+        sin_yaw = math.sin(yaw_rad)
+        x = center.x + radius * cos_yaw * cos_elev
+        y = center.y + radius * sin_yaw * cos_elev
+        z = center.z + radius * sin_elev
+        cam_loc = Vector((x, y, z))
+        set_camera_look_at(cam, cam_loc, center, world_up=Vector((0, 0, 1)))
+
+        filename = f"{model_stem}_{angle:03d}.png"
+        if png_requested and (views is None or filename in views):
+            poses.append((filename, cam.location.copy(), cam.rotation_euler.copy(), max_required_scale))
+
+    # Top-down views if enabled
+    if export_top_down:
+        # Top-down scale was solved alongside the isometric views
+        top_scale = top_down_scale if top_down_scale is not None else max_required_scale
         for angle in angles:
-            yaw_rad = math.radians(angle) + base_yaw_rad
-            cos_yaw = math.cos(yaw_rad)
-            sin_yaw = math.sin(yaw_rad)
-            x = center.x + radius * cos_yaw * cos_elev
-            y = center.y + radius * sin_yaw * cos_elev
-            z = center.z + radius * sin_elev
-            cam_loc = Vector((x, y, z))
-            set_camera_look_at(cam, cam_loc, center, world_up=Vector((0, 0, 1)))
-            bpy.context.view_layer.update()
+            filename = f"{model_stem}_TOP_{angle:03d}.png"
+            if png_requested and (views is None or filename in views):
+                location, rotation = top_down_pose(angle)
+                poses.append((filename, location, rotation, top_scale))
 
-            if output_format in ("PNG", "BOTH"):
-                scene.render.image_settings.file_format = 'PNG'
-                scene.render.image_settings.color_mode = 'RGBA'
-                scene.render.filepath = os.path.join(model_output_dir, f"{model_stem}_{angle:03d}.png")
+    if batch_render and len(poses) > 1:
+        render_poses_as_animation(scene, cam, poses, model_output_dir)
+    else:
+        for filename, location, rotation, ortho_scale in poses:
+            cam.location = location
+            cam.rotation_euler = rotation
+            cam.data.ortho_scale = ortho_scale
+            bpy.context.view_layer.update()
+            scene.render.image_settings.file_format = 'PNG'
+            scene.render.image_settings.color_mode = 'RGBA'
+            scene.render.filepath = os.path.join(model_output_dir, filename)
+            with profile_stage("render", view=filename, samples=current_samples(scene)):
                 bpy.ops.render.render(write_still=True)
 
-        # Render top-down views if enabled
-        if export_top_down:
-            # For top-down views, we need to adjust the ortho scale to fit the model from above
-            # Reset camera to top-down position for scale calculation
-            cam.location = Vector((center.x, center.y, center.z + radius))
-            cam.rotation_euler = (math.radians(90), 0, 0)
-            
-            # Calculate appropriate ortho scale for top-down view
-            world_corners = get_world_corners(mesh_objects)
-            if world_corners:
-                # Project corners to 2D (X,Y) plane for top-down view
-                min_x = min_y = float('inf')
-                max_x = max_y = float('-inf')
-                for corner in world_corners:
-                    min_x = min(min_x, corner.x)
-                    max_x = max(max_x, corner.x)
-                    min_y = min(min_y, corner.y)
-                    max_y = max(max_y, corner.y)
-                
-                size_x = max_x - min_x
-                size_y = max_y - min_y
-                max_size_2d = max(size_x, size_y)
-                
-                # Set ortho scale with margin
-                cam.data.ortho_scale = max_size_2d * 1.25
-            
-            # Render all 8 top-down rotated views
-            for angle in angles:
-                render_top_down_view(cam, angle, model_stem, model_output_dir)
+    return True
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def studio_template_sha256():
+    if not studio_template:
+        return None
+    if studio_state["template_sha256"] is None:
+        studio_state["template_sha256"] = file_sha256(studio_template)
+    return studio_state["template_sha256"]
+
+
+def render_config():
+    """Settings that change rendered pixels; any difference invalidates a model's cached views."""
+    return {
+        "output_format": output_format,
+        "output_resolution": output_resolution,
+        "isometric_elevation_deg": isometric_elevation_deg,
+        "base_yaw_offset_deg": base_yaw_offset_deg,
+        "engine_choice": engine_choice,
+        "border_px": int(os.environ.get("SS_BORDER_PX", "6")),
+        "angles": list(angles),
+        "export_top_down": export_top_down,
+        "env_hdri_path": env_hdri_path,
+        "debug_overlay": debug_overlay,
+        "studio_template_sha256": studio_template_sha256(),
+        "quality": "draft" if quality_tier == "draft" else "final",
+    }
+
+
+def expected_view_files(model_stem):
+    """Output filenames produced for a model under the current configuration."""
+    if output_format not in ("PNG", "BOTH"):
+        return []
+    files = [f"{model_stem}_{angle:03d}.png" for angle in angles]
+    if export_top_down:
+        files += [f"{model_stem}_TOP_{angle:03d}.png" for angle in angles]
+    return files
+
+
+def load_manifest(model_output_dir):
+    try:
+        with open(os.path.join(model_output_dir, manifest_name)) as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def stale_views(model_output_dir, manifest, blend_hash, config, view_files):
+    """Return the view files that must be re-rendered, given the model's previous manifest."""
+    if manifest.get("blend_sha256") != blend_hash or manifest.get("config") != config:
+        return list(view_files)
+    recorded = manifest.get("outputs", {})
+    stale = []
+    for filename in view_files:
+        path = os.path.join(model_output_dir, filename)
+        if filename not in recorded or not os.path.isfile(path) or file_sha256(path) != recorded[filename]:
+            stale.append(filename)
+    return stale
+
+
+def check_draft_framing(model_stem):
+    """Inspect a model's draft renders for cropped or badly framed views.
+
+    A view fails when opaque pixels come within draft_edge_px of the frame edge (cropping)
+    or when the object's alpha bounding box spans less than draft_min_fill of the frame.
+    Returns {"ok": bool, "issues": [str]}.
+    """
+    issues = []
+    model_output_dir = os.path.join(output_dir, model_stem)
+    for filename in expected_view_files(model_stem):
+        path = os.path.join(model_output_dir, filename)
+        if not os.path.isfile(path):
+            issues.append(f"{filename}: missing")
+            continue
+        image = bpy.data.images.load(path, check_existing=False)
+        try:
+            w, h = image.size
+            pixels = np.empty(w * h * 4, dtype=np.float32)
+            image.pixels.foreach_get(pixels)
+        finally:
+            bpy.data.images.remove(image)
+        alpha = pixels[3::4].reshape(h, w) > 0.01
+        rows = np.flatnonzero(alpha.any(axis=1))
+        cols = np.flatnonzero(alpha.any(axis=0))
+        if len(rows) == 0:
+            issues.append(f"{filename}: empty")
+            continue
+        if (cols[0] < draft_edge_px or rows[0] < draft_edge_px
+                or cols[-1] >= w - draft_edge_px or rows[-1] >= h - draft_edge_px):
+            issues.append(f"{filename}: touches frame edge")
+        fill = max((cols[-1] - cols[0] + 1) / w, (rows[-1] - rows[0] + 1) / h)
+        if fill < draft_min_fill:
+            issues.append(f"{filename}: fills only {fill:.0%} of frame")
+    return {"ok": not issues, "issues": issues}
+
+
+def write_draft_report(results):
+    """Write outputs/_draft/draft_report.json with each model's framing check result."""
+    models = {r["model"]: {"path": r["path"], "ok": r["ok"], **(r.get("framing") or {"ok": False, "issues": [r["error"]]})}
+              for r in results}
+    write_json(os.path.join(draft_dir, "draft_report.json"), {"resolution": output_resolution, "models": models})
+    passed = sum(1 for m in models.values() if m["ok"])
+    print(f"[3d2svg] Draft framing check: {passed}/{len(models)} models passed")
+    for stem, m in sorted(models.items()):
+        if not m["ok"]:
+            print(f"[3d2svg]   {stem}: {'; '.join(m['issues'])}")
+    print(f"[3d2svg] Approve models by listing their names in {os.path.join(draft_dir, 'approved.txt')}, "
+          f"then run with SS_QUALITY=promote")
+
+
+def select_promoted_models(blend_files):
+    """Keep only models the operator approved or, with SS_PROMOTE_AUTO, whose draft framing passed."""
+    approved = set()
+    approved_path = os.path.join(draft_dir, "approved.txt")
+    if os.path.isfile(approved_path):
+        with open(approved_path) as f:
+            approved = {line.strip() for line in f if line.strip() and not line.startswith("#")}
+    passed = set()
+    report_path = os.path.join(draft_dir, "draft_report.json")
+    if promote_auto_passed and os.path.isfile(report_path):
+        with open(report_path) as f:
+            passed = {stem for stem, m in json.load(f).get("models", {}).items() if m.get("ok")}
+    selected = [p for p in blend_files if get_model_stem(p) in approved | passed]
+    print(f"[3d2svg] Promoting {len(selected)}/{len(blend_files)} models to final quality "
+          f"({len(approved)} approved, {len(passed)} passed draft check)")
+    return selected
+
+
+def publish_views(model_output_dir, view_files):
+    """Copy rendered views into publish_dir when missing or different; returns how many were copied."""
+    os.makedirs(publish_dir, exist_ok=True)
+    copied = 0
+    for filename in view_files:
+        src = os.path.join(model_output_dir, filename)
+        dst = os.path.join(publish_dir, filename)
+        if os.path.isfile(src) and not (os.path.isfile(dst) and file_sha256(dst) == file_sha256(src)):
+            shutil.copy2(src, dst)
+            copied += 1
+    return copied
+
+
+def process_model(model_path):
+    """Render one model if its inputs changed and return its result record (success, error, wall time)."""
+    model_stem = get_model_stem(model_path)
+    model_output_dir = os.path.join(output_dir, model_stem)
+    result = {"model": model_stem, "path": model_path, "ok": False, "skipped": False,
+              "views_rendered": 0, "seconds": 0.0, "error": None}
+    current_profile.clear()
+    start = time.perf_counter()
+    peak_before = peak_rss_mb()
+    try:
+        blend_hash = file_sha256(model_path)
+        config = render_config()
+        view_files = expected_view_files(model_stem)
+        views = None
+        if incremental and not force_render and view_files:
+            views = stale_views(model_output_dir, load_manifest(model_output_dir), blend_hash, config, view_files)
+            if not views:
+                result["ok"] = result["skipped"] = True
+        if not result["skipped"]:
+            render = render_model_in_studio if studio_template else render_model
+            result["ok"] = bool(render(model_path, views=set(views) if views is not None else None))
+            if not result["ok"]:
+                result["error"] = "model could not be opened"
+            else:
+                result["views_rendered"] = len(views) if views is not None else len(view_files)
+                outputs = {}
+                for filename in view_files:
+                    path = os.path.join(model_output_dir, filename)
+                    if os.path.isfile(path):
+                        outputs[filename] = file_sha256(path)
+                write_json(os.path.join(model_output_dir, manifest_name), {
+                    "blend_path": model_path,
+                    "blend_sha256": blend_hash,
+                    "config": config,
+                    "outputs": outputs,
+                })
+        if result["ok"] and quality_tier == "draft":
+            result["framing"] = check_draft_framing(model_stem)
+        elif result["ok"] and publish_dir:
+            result["published"] = publish_views(model_output_dir, view_files)
+    except Exception as exc:
+        result["ok"] = False
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    result["rss_mb"] = current_rss_mb()
+    result["peak_growth_mb"] = peak_growth(peak_before)
+    result["process_peak_rss_mb"] = peak_rss_mb()
+    result["profile"] = list(current_profile)
+    if result["skipped"]:
+        status = "up to date, skipped"
+    elif result["ok"]:
+        status = f"rendered {result['views_rendered']} views"
+    else:
+        status = f"FAILED ({result['error']})"
+    print(f"[3d2svg] {model_stem}: {status} in {result['seconds']:.1f}s")
+    return result
+
+
+def profile_rows(results):
+    """Flatten per-model stage records into report rows."""
+    rows = []
+    for r in results:
+        for rec in r.get("profile") or []:
+            rows.append({"model": r["model"], "engine": engine_choice, "resolution": output_resolution, **rec})
+    return rows
+
+
+def write_profile_report(results):
+    """Write outputs/profile_report.json (per model) and outputs/profile_report.csv (per stage)."""
+    models = []
+    for r in results:
+        stages = {}
+        for rec in r.get("profile") or []:
+            stages[rec["stage"]] = round(stages.get(rec["stage"], 0.0) + rec["seconds"], 4)
+        renders = [rec for rec in r.get("profile") or [] if rec["stage"] == "render"]
+        models.append({
+            "model": r["model"],
+            "ok": r["ok"],
+            "skipped": r.get("skipped", False),
+            "seconds": r["seconds"],
+            "rss_mb": r.get("rss_mb"),
+            "peak_growth_mb": r.get("peak_growth_mb"),
+            "process_peak_rss_mb": r.get("process_peak_rss_mb"),
+            "stages": stages,
+            "views": renders,
+        })
+    write_json(os.path.join(output_dir, "profile_report.json"), {
+        "engine": engine_choice,
+        "resolution": output_resolution,
+        "models": models,
+    })
+    fields = ["model", "stage", "view", "views", "seconds", "rss_mb", "peak_growth_mb", "samples", "engine", "resolution"]
+    with open(os.path.join(output_dir, "profile_report.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for row in profile_rows(results):
+            writer.writerow({k: row.get(k) for k in fields})
+
+
+def print_profile_summary(results):
+    """Print a per-model table of stage times (seconds), RSS after the model and peak growth during it (MB)."""
+    header = f"{'model':<28}{'open':>8}{'prep':>8}{'fit':>8}{'views':>7}{'render':>9}{'s/view':>8}{'total':>9}{'rssMB':>8}{'+peakMB':>9}"
+    print(f"[3d2svg] Profile ({engine_choice}, {output_resolution}px):")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        recs = r.get("profile") or []
+        total = {}
+        for rec in recs:
+            total[rec["stage"]] = total.get(rec["stage"], 0.0) + rec["seconds"]
+        n_views = sum(rec.get("views", 1) for rec in recs if rec["stage"] == "render")
+        per_view = total.get("render", 0.0) / n_views if n_views else 0.0
+        rss = r.get("rss_mb")
+        growth = r.get("peak_growth_mb")
+        print(f"{r['model'][:27]:<28}{total.get('open', 0.0):>8.2f}{total.get('scene_prep', 0.0):>8.2f}"
+              f"{total.get('fit', 0.0):>8.3f}{n_views:>7}{total.get('render', 0.0):>9.2f}{per_view:>8.2f}"
+              f"{r['seconds']:>9.2f}{(rss if rss is not None else 0):>8.0f}{(growth if growth is not None else 0):>9.0f}")
+
+
+def write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def shard_blend_files(blend_files, num_shards):
+    """Split models into shards of roughly equal total .blend size, largest files first."""
+    sizes = {p: os.path.getsize(p) for p in blend_files}
+    shards = [[] for _ in range(num_shards)]
+    loads = [0] * num_shards
+    for path in sorted(blend_files, key=lambda p: sizes[p], reverse=True):
+        i = loads.index(min(loads))
+        shards[i].append(path)
+        loads[i] += sizes[path]
+    return [sorted(shard) for shard in shards if shard]
+
+
+def run_render_farm(blend_files, num_workers):
+    """Render models across background Blender worker processes and merge their results.
+
+    Every worker renders into the shared output_dir, so outputs land in the usual
+    outputs/<model_stem>/ layout; per-shard file lists, logs and reports live in outputs/_farm/.
+    """
+    farm_dir = os.path.join(output_dir, "_farm")
+    os.makedirs(farm_dir, exist_ok=True)
+    shards = shard_blend_files(blend_files, num_workers)
+    # Split cores between workers so concurrent renders do not oversubscribe the CPU
+    threads = max(1, (os.cpu_count() or 1) // len(shards))
+    script_path = os.path.abspath(__file__)
+    print(f"[3d2svg] Render farm: {len(blend_files)} models across {len(shards)} workers ({threads} threads each)")
+
+    start = time.perf_counter()
+    workers = []
+    for i, shard in enumerate(shards):
+        shard_path = os.path.join(farm_dir, f"shard_{i:02d}.json")
+        report_path = os.path.join(farm_dir, f"shard_{i:02d}_report.json")
+        log_path = os.path.join(farm_dir, f"shard_{i:02d}.log")
+        write_json(shard_path, shard)
+        if os.path.exists(report_path):
+            os.remove(report_path)
+        env = dict(os.environ, SS_WORKERS="1", SS_SHARD_FILE=shard_path, SS_SHARD_REPORT=report_path)
+        cmd = [bpy.app.binary_path, "--background", "--threads", str(threads), "--python", script_path]
+        log = open(log_path, "w")
+        proc = subprocess.Popen(cmd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        workers.append((i, shard, report_path, proc, log))
+
+    results = []
+    for i, shard, report_path, proc, log in workers:
+        code = proc.wait()
+        log.close()
+        shard_results = []
+        if os.path.isfile(report_path):
+            try:
+                with open(report_path) as f:
+                    shard_results = json.load(f)
+            except Exception:
+                shard_results = []
+        reported = {r.get("path") for r in shard_results}
+        for path in shard:
+            if path not in reported:
+                # Worker crashed or was killed before finishing this model
+                shard_results.append({
+                    "model": get_model_stem(path), "path": path, "ok": False, "skipped": False,
+                    "views_rendered": 0, "seconds": 0.0,
+                    "error": f"worker {i} exited with code {code} before reporting",
+                })
+        for r in shard_results:
+            r["worker"] = i
+        results.extend(shard_results)
+
+    results.sort(key=lambda r: r["model"])
+    failed = [r for r in results if not r["ok"]]
+    report = {
+        "workers": len(shards),
+        "skipped": sum(1 for r in results if r.get("skipped")),
+        "threads_per_worker": threads,
+        "seconds": round(time.perf_counter() - start, 3),
+        "succeeded": len(results) - len(failed),
+        "failed": len(failed),
+        "models": results,
+    }
+    write_json(os.path.join(output_dir, "farm_report.json"), report)
+    print(f"[3d2svg] Render farm finished in {report['seconds']:.1f}s: {report['succeeded']} ok, {report['failed']} failed")
+    for r in failed:
+        print(f"[3d2svg]   {r['model']}: {r['error']} (see {os.path.join(farm_dir, 'shard_%02d.log' % r['worker'])})")
+    if profile_enabled:
+        write_profile_report(results)
+        print_profile_summary(results)
+    if quality_tier == "draft":
+        write_draft_report(results)
+    return report
+
+
+def main():
+    if studio_template and not os.path.isfile(studio_template):
+        raise SystemExit(f"[3d2svg] SS_STUDIO_TEMPLATE not found: {studio_template}")
+    if shard_file:
+        # Farm worker: render only the models assigned by the driver
+        with open(shard_file) as f:
+            blend_files = json.load(f)
+    else:
+        # Collect all .blend files to process
+        blend_files = sorted([p for p in glob.glob(os.path.join(models_dir, "*.blend")) if os.path.isfile(p)])
+
+    if quality_tier == "promote" and not shard_file:
+        blend_files = select_promoted_models(blend_files)
+
+    num_workers = farm_workers if farm_workers > 0 else (os.cpu_count() or 1)
+    if not shard_file and num_workers > 1 and len(blend_files) > 1:
+        run_render_farm(blend_files, num_workers)
+        return
+
+    results = []
+    for model_path in blend_files:
+        results.append(process_model(model_path))
+        if shard_report_path:
+            # Rewrite after every model so a crashing worker still reports what it finished
+            write_json(shard_report_path, results)
+
+    # Farm workers leave reporting to the driver
+    if profile_enabled and not shard_report_path and results:
+        write_profile_report(results)
+        print_profile_summary(results)
+    if quality_tier == "draft" and not shard_report_path and results:
+        write_draft_report(results)
 
 
 if __name__ == "__main__":
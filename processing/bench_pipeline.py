@@ -0,0 +1,287 @@
+# Benchmarks for the Python asset stages on synthetic fixtures.
+#
+# Generates deterministic fixtures at several scales (GTFS feeds by stop_times.txt rows, permit
+# areas by polygon count), runs each stage script as a subprocess and records wall time, the
+# child's own peak RSS (os.wait4) and the total size of what it wrote. Results are compared
+# against a stored baseline; a stage that got slower, hungrier or changed its output size past
+# the tolerances is reported as a regression and the run exits non-zero.
+#
+# Fixtures are cached in processing/_bench/fixtures and reused across runs; the latest results
+# go to processing/_bench/bench_report.json. A benchmark whose stage crashes also fails the run.
+#
+# Timings depend on the machine, so no baseline is committed. On a new machine (or CI runner),
+# record one first with --update-baseline; until then a run reports its numbers and exits
+# non-zero because there is nothing to compare against.
+#
+# Usage:
+#   python processing/bench_pipeline.py --update-baseline       # first run: store the baseline
+#   python processing/bench_pipeline.py                         # small + medium, compare to baseline
+#   python processing/bench_pipeline.py --scales large --repeat 1
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(REPO_ROOT, "processing", "_bench")
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+REPORT_PATH = os.path.join(BENCH_DIR, "bench_report.json")
+BASELINE_PATH = os.path.join(REPO_ROOT, "processing", "bench_baseline.json")
+
+GTFS_BUILDER = "public/data/static/preprocessing/bus_stops_geojson_from_gtfs.py"
+MINIFY = "public/data/permit-areas/minify_geojson.py"
+CITYWIDE_MAP = "processing/citywide-map/citywide_map.py"
+
+# stop_times.txt rows and permit polygons per scale
+SCALES = {
+    "small": {"stop_times": 1_000, "polygons": 1_000},
+    "medium": {"stop_times": 100_000, "polygons": 10_000},
+    "large": {"stop_times": 10_000_000, "polygons": 50_000},
+}
+GTFS_FEEDS = 3
+# NYC bounding box for synthetic geometry
+NYC_BOUNDS = (-74.25, 40.49, -73.70, 40.92)
+
+
+def gtfs_fixture(rows, seed=0):
+    """Write GTFS_FEEDS synthetic feeds sharing `rows` stop_times rows; returns the gtfs dir."""
+    out_dir = os.path.join(FIXTURE_DIR, f"gtfs-{rows}")
+    if os.path.exists(os.path.join(out_dir, "done")):
+        return out_dir
+    shutil.rmtree(out_dir, ignore_errors=True)
+    rng = np.random.default_rng(seed)
+    per_feed = max(1, rows // GTFS_FEEDS)
+    for f in range(GTFS_FEEDS):
+        feed_dir = os.path.join(out_dir, f"feed{f}")
+        os.makedirs(feed_dir)
+        n_stops = max(20, per_feed // 50)
+        n_trips = max(10, per_feed // 20)
+        n_routes = 50
+        prefix = f"F{f}_"
+        pd.DataFrame({
+            "stop_id": [f"{prefix}{i}" for i in range(n_stops)],
+            "stop_name": [f"Stop {i}" for i in range(n_stops)],
+            "stop_desc": "",
+            "stop_lat": np.round(rng.uniform(NYC_BOUNDS[1], NYC_BOUNDS[3], n_stops), 6),
+            "stop_lon": np.round(rng.uniform(NYC_BOUNDS[0], NYC_BOUNDS[2], n_stops), 6),
+            "location_type": "",
+            "zone_id": "",
+        }).to_csv(os.path.join(feed_dir, "stops.txt"), index=False)
+        pd.DataFrame({"route_id": [f"{prefix}R{i}" for i in range(n_routes)],
+                      "route_short_name": [f"R{i}" for i in range(n_routes)]}).to_csv(
+            os.path.join(feed_dir, "routes.txt"), index=False)
+        pd.DataFrame({"route_id": [f"{prefix}R{i}" for i in rng.integers(0, n_routes, n_trips)],
+                      "service_id": "weekday",
+                      "trip_id": [f"{prefix}T{i}" for i in range(n_trips)]}).to_csv(
+            os.path.join(feed_dir, "trips.txt"), index=False)
+        # stop_times is written in slices so the 10M-row fixture never sits in memory at once
+        with open(os.path.join(feed_dir, "stop_times.txt"), "w") as f_out:
+            f_out.write("trip_id,arrival_time,departure_time,stop_id,stop_sequence\n")
+            for start in range(0, per_feed, 1_000_000):
+                n = min(1_000_000, per_feed - start)
+                seq = np.arange(start, start + n)
+                chunk = pd.DataFrame({
+                    "trip_id": np.char.add(prefix + "T", rng.integers(0, n_trips, n).astype(str)),
+                    "arrival_time": "08:00:00",
+                    "departure_time": "08:00:00",
+                    "stop_id": np.char.add(prefix, rng.integers(0, n_stops, n).astype(str)),
+                    "stop_sequence": seq % 60,
+                })
+                chunk.to_csv(f_out, index=False, header=False)
+    open(os.path.join(out_dir, "done"), "w").close()
+    return out_dir
+
+
+def permit_fixture(polygons, seed=0):
+    """Write `polygons` Voronoi cells over NYC (a gap-free coverage, like adjacent park areas)."""
+    import geopandas as gpd
+    import shapely
+
+    path = os.path.join(FIXTURE_DIR, f"permit-areas-{polygons}.geojson")
+    if os.path.exists(path):
+        return path
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    bounds = shapely.box(*NYC_BOUNDS)
+    points = shapely.multipoints(rng.uniform(NYC_BOUNDS[:2], NYC_BOUNDS[2:], (polygons, 2)))
+    cells = shapely.get_parts(shapely.voronoi_polygons(points, extend_to=bounds))
+    # Densify edges so vertex counts resemble surveyed park boundaries
+    cells = shapely.segmentize(shapely.intersection(cells, bounds), 0.0002)
+    n = len(cells)
+    gdf = gpd.GeoDataFrame({
+        "system": [f"SYS-{i}" for i in range(n)],
+        "cemsid": [str(i) for i in range(n)],
+        "name": [f"Area {i}" for i in range(n)],
+        "propertyname": [f"Park {i // 10}" for i in range(n)],
+        "subpropertyname": [f"Zone {i % 10}" for i in range(n)],
+        "unused": np.arange(n),
+    }, geometry=cells, crs="EPSG:4326")
+    sys.path.insert(0, os.path.join(REPO_ROOT, "processing"))
+    from geojson_stream import write_geojson
+    write_geojson(gdf, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def define_benchmarks(scales):
+    """Return [(name, scale, cwd, cmd builder, requirement)] for the requested scales."""
+    python = sys.executable
+    benches = []
+    for scale in scales:
+        sizes = SCALES[scale]
+        benches.append(("bus_stops", scale, os.path.dirname(GTFS_BUILDER),
+                        lambda out, rows=sizes["stop_times"]: [
+                            python, os.path.join(REPO_ROOT, GTFS_BUILDER), "--gtfs-dir", gtfs_fixture(rows),
+                            "--output", os.path.join(out, "bus_stops.geojson"), "--no-cache"],
+                        None))
+        benches.append(("permit_areas", scale, os.path.dirname(MINIFY),
+                        lambda out, n=sizes["polygons"]: [
+                            python, os.path.join(REPO_ROOT, MINIFY), "--input", permit_fixture(n),
+                            "--output", os.path.join(out, "permit-areas.geojson")],
+                        None))
+    # The citywide map reads a fixed dataset, so it runs once regardless of scale
+    benches.append(("citywide_map", "fixed", os.path.dirname(CITYWIDE_MAP),
+                    lambda out: [python, os.path.join(REPO_ROOT, CITYWIDE_MAP), "--output", os.path.join(out, "nybb.png")],
+                    "geodatasets"))
+    return benches
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def run_once(cmd, cwd, log_path):
+    """Run a command; return (returncode, seconds, child peak RSS in MB)."""
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(cmd, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 reports this child's own rusage, unlike RUSAGE_CHILDREN which is a running max
+        _, status, usage = os.wait4(proc.pid, 0)
+    seconds = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return proc.returncode, seconds, rss_mb
+
+
+def run_benchmark(name, scale, cwd, make_cmd, repeat):
+    out_dir = os.path.join(BENCH_DIR, "out", f"{name}-{scale}")
+    log_path = os.path.join(BENCH_DIR, f"{name}-{scale}.log")
+    cmd = make_cmd(out_dir)  # builds the fixture on first use, outside the timed run
+    runs = []
+    for _ in range(repeat):
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.makedirs(out_dir)
+        returncode, seconds, rss_mb = run_once(cmd, os.path.join(REPO_ROOT, cwd), log_path)
+        if returncode != 0:
+            return {"status": "failed", "reason": f"exit code {returncode}, see {os.path.relpath(log_path, REPO_ROOT)}"}
+        runs.append((seconds, rss_mb))
+    # Best of N is the least noisy estimate of wall time
+    return {
+        "status": "ok",
+        "seconds": round(min(r[0] for r in runs), 3),
+        "peak_rss_mb": round(max(r[1] for r in runs), 1),
+        "output_bytes": dir_size(out_dir),
+        "repeat": repeat,
+    }
+
+
+def compare(result, baseline, args):
+    """List the metrics of `result` that regressed past the tolerances relative to `baseline`."""
+    if not baseline or result.get("status") != "ok":
+        return []
+    problems = []
+    checks = (("seconds", args.time_tolerance), ("peak_rss_mb", args.memory_tolerance),
+              ("output_bytes", args.size_tolerance))
+    for metric, tolerance in checks:
+        old, new = baseline.get(metric), result.get(metric)
+        if old and new is not None and new > old * (1 + tolerance):
+            problems.append(f"{metric} {old} -> {new} (+{new / old - 1:.0%})")
+    if baseline.get("output_bytes") and result["output_bytes"] < baseline["output_bytes"] * (1 - args.size_tolerance):
+        problems.append(f"output_bytes shrank {baseline['output_bytes']} -> {result['output_bytes']}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Python asset stages on synthetic fixtures.")
+    parser.add_argument("--scales", default="small,medium", help=f"Comma-separated scales: {', '.join(SCALES)}")
+    parser.add_argument("--stages", default="", help="Only these benchmarks (comma-separated names)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the fastest is kept (default: 3)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Write these results into the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="Allowed wall-time increase (default: 0.25)")
+    parser.add_argument("--memory-tolerance", type=float, default=0.20, help="Allowed peak-RSS increase (default: 0.20)")
+    parser.add_argument("--size-tolerance", type=float, default=0.01, help="Allowed output-size change (default: 0.01)")
+    args = parser.parse_args()
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+    only = {s.strip() for s in args.stages.split(",") if s.strip()}
+    os.makedirs(BENCH_DIR, exist_ok=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("results", {})
+    elif not args.update_baseline:
+        print(f"[bench] no baseline at {os.path.relpath(args.baseline, REPO_ROOT)}; "
+              "record one with --update-baseline before comparing")
+
+    results = {}
+    regressions = {}
+    for name, scale, cwd, make_cmd, requirement in define_benchmarks(scales):
+        if only and name not in only:
+            continue
+        key = f"{name}/{scale}"
+        if requirement and importlib.util.find_spec(requirement) is None:
+            results[key] = {"status": "skipped", "reason": f"{requirement} not installed"}
+        else:
+            results[key] = run_benchmark(name, scale, cwd, make_cmd, max(1, args.repeat))
+        result = results[key]
+        problems = compare(result, baseline.get(key), args)
+        if problems:
+            regressions[key] = problems
+        if result["status"] == "ok":
+            old = baseline.get(key, {}).get("seconds")
+            delta = f" ({result['seconds'] / old - 1:+.0%} vs baseline)" if old else " (no baseline)"
+            print(f"[bench] {key:<24} {result['seconds']:>8.2f}s{delta}  {result['peak_rss_mb']:>8.1f} MB  "
+                  f"{result['output_bytes'] / 1024:>10.0f} KiB" + ("  REGRESSION" if problems else ""))
+        else:
+            print(f"[bench] {key:<24} {result['status']}: {result['reason']}")
+        for problem in problems:
+            print(f"[bench]   {problem}")
+
+    failed = sorted(key for key, result in results.items() if result["status"] == "failed")
+    missing = sorted(key for key, result in results.items() if result["status"] == "ok" and key not in baseline)
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+              "results": results, "regressions": regressions, "failed": failed, "missing_baseline": missing}
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[bench] report: {os.path.relpath(REPORT_PATH, REPO_ROOT)}")
+
+    if args.update_baseline:
+        merged = dict(baseline)
+        merged.update({k: v for k, v in results.items() if v["status"] == "ok"})
+        with open(args.baseline, "w") as f:
+            json.dump({"updated_at": report["created_at"], "results": dict(sorted(merged.items()))}, f, indent=2)
+        print(f"[bench] baseline updated: {os.path.relpath(args.baseline, REPO_ROOT)}")
+    elif missing:
+        print(f"[bench] {len(missing)} benchmark(s) have no baseline ({', '.join(missing)}); "
+              "run with --update-baseline to record them")
+    if failed:
+        print(f"[bench] {len(failed)} benchmark(s) failed: {', '.join(failed)}")
+    if failed or regressions or (missing and not args.update_baseline):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+# Single entry point for rebuilding the generated files under public/data.
+#
+# Each stage declares the command that produces it, its input files (globs, relative to the
+# repo root), its outputs and the stages it depends on. Stages whose dependencies are done run
+# concurrently in a small thread pool (each stage is its own subprocess). A stage is skipped when
+# its outputs exist and the fingerprint of its command and input files matches the last
+# successful run; input hashes are cached by size and mtime, so unchanged files are not re-read.
+# Network downloads only run with --fetch, or when their outputs are missing.
+#
+# Every run writes processing/_build/build_report.json (status, reason, seconds per stage)
+# and keeps per-stage logs in processing/_build/<stage>.log.
+#
+# Usage:
+#   python processing/build_assets.py                     # rebuild whatever is out of date
+#   python processing/build_assets.py --fetch             # also refresh the downloads first
+#   python processing/build_assets.py permit_areas tiles  # only these stages (and what they need)
+#   python processing/build_assets.py --dry-run           # show what would run
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD_DIR = os.path.join(REPO_ROOT, "processing", "_build")
+STATE_PATH = os.path.join(BUILD_DIR, "build_state.json")
+REPORT_PATH = os.path.join(BUILD_DIR, "build_report.json")
+STATE_VERSION = 1
+
+PERMIT_DIR = "public/data/permit-areas"
+STATIC_DIR = "public/data/static"
+PREPROCESSING_DIR = "public/data/static/preprocessing"
+ICONS_DIR = "public/data/icons/isometric-bw"
+
+
+def latest(pattern):
+    """Newest file matching a repo-relative glob, or the pattern itself when nothing matches yet."""
+    matches = glob.glob(os.path.join(REPO_ROOT, pattern))
+    if not matches:
+        return pattern
+    return os.path.relpath(max(matches, key=os.path.getmtime), REPO_ROOT)
+
+
+def define_stages(args):
+    """Return the stage table in declaration order.
+
+    cwd is the repo-relative directory the original script expects to run in. A callable cmd is
+    resolved when the stage is planned, after its dependencies ran (e.g. to pick the newest download).
+    A stage with "fetch": True talks to the network and only runs with --fetch or missing outputs.
+    """
+    python = sys.executable
+    return [
+        {
+            "name": "permit_areas_download",
+            "cmd": [python, "socrata_download.py"],
+            "cwd": PERMIT_DIR,
+            "inputs": [f"{PERMIT_DIR}/socrata_download.py"],
+            "outputs": [f"{PERMIT_DIR}/nyc_2*.geojson"],
+            "fetch": True,
+        },
+        {
+            "name": "permit_areas",
+            "cmd": lambda: [python, "minify_geojson.py", "--input",
+                            os.path.basename(latest(f"{PERMIT_DIR}/nyc_2*.geojson"))],
+            "cwd": PERMIT_DIR,
+            "inputs": [f"{PERMIT_DIR}/minify_geojson.py", f"{PERMIT_DIR}/nyc_2*.geojson"],
+            "outputs": [f"{PERMIT_DIR}/nyc-permit-areas-minified.geojson",
+                        f"{PERMIT_DIR}/nyc-permit-areas-minified.index.bin"],
+            "deps": ["permit_areas_download"],
+        },
+        {
+            "name": "events",
+            # Each download is a snapshot of the whole dataset, so only the newest one is aggregated;
+            # the state file then skips events it already counted
+            "cmd": lambda: [python, "aggregate_events.py", "--output", "../events_by_cemsid.json",
+                            os.path.relpath(os.path.join(REPO_ROOT, latest(args.events)),
+                                            os.path.join(REPO_ROOT, PERMIT_DIR))],
+            "cwd": PERMIT_DIR,
+            "inputs": [f"{PERMIT_DIR}/aggregate_events.py", args.events],
+            "outputs": ["public/data/events_by_cemsid.json"],
+            "deps": ["permit_areas_download"],
+        },
+        {
+            "name": "citibike_download",
+            "cmd": ["bash", "citibike_stations.sh"],
+            "cwd": STATIC_DIR,
+            "inputs": [f"{STATIC_DIR}/citibike_stations.sh"],
+            "outputs": [f"{STATIC_DIR}/citibike_stations/stations_culled.json"],
+            "fetch": True,
+        },
+        {
+            "name": "citibike",
+            "cmd": [python, "citibike_stations_geojson.py"],
+            "cwd": PREPROCESSING_DIR,
+            "inputs": [f"{PREPROCESSING_DIR}/citibike_stations_geojson.py",
+                       f"{STATIC_DIR}/citibike_stations/stations_culled.json"],
+            "outputs": [f"{STATIC_DIR}/citibike_stations/citibike_stations.geojson"],
+            "deps": ["citibike_download"],
+        },
+        {
+            "name": "bus_stops",
+            "cmd": [python, "bus_stops_geojson_from_gtfs.py", "--gtfs-dir", os.path.join(REPO_ROOT, args.gtfs_dir),
+                    "--output", "../bus_stops_nyc.geojson"],
+            "cwd": PREPROCESSING_DIR,
+            "inputs": [f"{PREPROCESSING_DIR}/bus_stops_geojson_from_gtfs.py", f"{args.gtfs_dir}/*/*.txt"],
+            "outputs": [f"{STATIC_DIR}/bus_stops_nyc.geojson"],
+        },
+        {
+            "name": "enrich_areas",
+            "cmd": [python, "enrich_areas.py"],
+            "cwd": PREPROCESSING_DIR,
+            "inputs": [f"{PREPROCESSING_DIR}/enrich_areas.py", f"{STATIC_DIR}/bus_stops_nyc.geojson",
+                       f"{STATIC_DIR}/citibike_stations/citibike_stations.geojson",
+                       f"{PERMIT_DIR}/nyc-permit-areas-minified.geojson"],
+            # The plazas artifact is enriched in place; the permit areas stage keeps its own output
+            "outputs": [f"{STATIC_DIR}/nyc_public_plazas_enriched.geojson",
+                        f"{PERMIT_DIR}/nyc-permit-areas-enriched.geojson"],
+            "deps": ["permit_areas", "bus_stops", "citibike"],
+        },
+        {
+            "name": "tiles",
+            "cmd": [python, "tile_static_layers.py", "--layer", "bus_stops=../bus_stops_nyc.geojson",
+                    "--layer", "plazas=../nyc_public_plazas_enriched.geojson", "--out-dir", "../tiles"],
+            "cwd": PREPROCESSING_DIR,
+            "inputs": [f"{PREPROCESSING_DIR}/tile_static_layers.py", f"{STATIC_DIR}/bus_stops_nyc.geojson",
+                       f"{STATIC_DIR}/nyc_public_plazas_enriched.geojson"],
+            "outputs": [f"{STATIC_DIR}/tiles/index.json"],
+            "deps": ["bus_stops", "enrich_areas"],
+        },
+        {
+            "name": "citywide_map",
+            "cmd": [python, "citywide_map.py", "--output", "../../public/data/nybb.png"],
+            "cwd": "processing/citywide-map",
+            "inputs": ["processing/citywide-map/citywide_map.py"],
+            "outputs": ["public/data/nybb.png", "public/data/nybb.svg", "public/data/nybb.geojson"],
+        },
+        {
+            "name": "icons",
+            "cmd": [args.blender, "--background", "--python", "3d2svg.py"],
+            "cwd": "processing",
+            "env": {"SS_MODELS_DIR": os.path.join(REPO_ROOT, args.models_dir),
+                    "SS_OUTPUT_DIR": os.path.join(REPO_ROOT, "processing/outputs"),
+                    "SS_PUBLISH_DIR": os.path.join(REPO_ROOT, ICONS_DIR)},
+            "inputs": ["processing/3d2svg.py", f"{args.models_dir}/*.blend"],
+            # Per-model renders and manifests, and the flat copies the app and the icon stages read;
+            # a checkout may only have the published icons
+            "outputs": ["processing/outputs/*/render_manifest.json", f"{ICONS_DIR}/*.png"],
+            "any_output": True,
+            "requires": args.blender,
+        },
+        {
+            "name": "icon_atlas",
+            "cmd": [python, "pack_atlas.py", "../public/data/icons/isometric-bw", "--out-dir",
+                    "../public/data/icons/atlas", "--name", "isometric-bw"],
+            "cwd": "processing",
+            "inputs": ["processing/pack_atlas.py", f"{ICONS_DIR}/**/*.png"],
+            "outputs": ["public/data/icons/atlas/isometric-bw.json"],
+            "deps": ["icons"],
+        },
+        {
+            "name": "icon_variants",
+            "cmd": [python, "optimize_icons.py", "../public/data/icons/isometric-bw", "--out-dir",
+                    "../public/data/icons/optimized/isometric-bw", "--palette-colors", "16"],
+            "cwd": "processing",
+            "inputs": ["processing/optimize_icons.py", "processing/pack_atlas.py", f"{ICONS_DIR}/**/*.png"],
+            "outputs": ["public/data/icons/optimized/isometric-bw/manifest.json"],
+            "deps": ["icons"],
+        },
+    ]
+
+
+def expand(patterns):
+    """Sorted repo-relative files matching any of the globs."""
+    files = set()
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(REPO_ROOT, pattern), recursive=True):
+            if os.path.isfile(path):
+                files.add(os.path.relpath(path, REPO_ROOT))
+    return sorted(files)
+
+
+def file_digest(rel_path, hash_cache):
+    """sha256 of a file, reusing the cached digest while size and mtime are unchanged."""
+    st = os.stat(os.path.join(REPO_ROOT, rel_path))
+    key = [st.st_size, st.st_mtime_ns]
+    cached = hash_cache.get(rel_path)
+    if cached and cached[:2] == key:
+        return cached[2]
+    h = hashlib.sha256()
+    with open(os.path.join(REPO_ROOT, rel_path), "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    hash_cache[rel_path] = key + [h.hexdigest()]
+    return h.hexdigest()
+
+
+def command(stage):
+    return stage["cmd"]() if callable(stage["cmd"]) else stage["cmd"]
+
+
+def stage_fingerprint(stage, hash_cache):
+    h = hashlib.sha256()
+    h.update(json.dumps([command(stage), sorted(stage.get("env", {}).items())]).encode())
+    for rel_path in expand(stage["inputs"]):
+        h.update(rel_path.encode())
+        h.update(file_digest(rel_path, hash_cache).encode())
+    return h.hexdigest()
+
+
+def outputs_present(stage):
+    present = [bool(glob.glob(os.path.join(REPO_ROOT, pattern))) for pattern in stage["outputs"]]
+    return any(present) if stage.get("any_output") else all(present)
+
+
+def load_state():
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH) as f:
+            state = json.load(f)
+        if state.get("version") == STATE_VERSION:
+            return state
+    return {"version": STATE_VERSION, "stages": {}, "hashes": {}}
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def select_stages(stages, names):
+    """Requested stages plus everything they depend on, keeping declaration order."""
+    by_name = {stage["name"]: stage for stage in stages}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(unknown)}. Available: {', '.join(by_name)}")
+    wanted = set()
+    pending = list(names or by_name)
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(by_name[name].get("deps", []))
+    return [stage for stage in stages if stage["name"] in wanted]
+
+
+def plan_stage(stage, state, args, hash_cache, changed):
+    """Decide whether a stage runs: returns (action, reason, fingerprint)."""
+    if stage.get("requires") and not shutil.which(stage["requires"]):
+        # Downstream stages can still use what a previous run (or the checkout) left behind
+        if outputs_present(stage):
+            return "skip", f"{stage['requires']} not found, keeping existing outputs", None
+        return "unavailable", f"{stage['requires']} not found", None
+    if stage.get("fetch"):
+        if args.fetch or args.force:
+            return "run", "--fetch", None
+        if outputs_present(stage):
+            return "skip", "downloaded (use --fetch to refresh)", None
+        return "run", "outputs missing", None
+    if args.dry_run and any(dep in changed for dep in stage.get("deps", [])):
+        # A dependency that would run has not produced this stage's inputs yet
+        return "run", "dependency would run", None
+    if not expand([p for p in stage["inputs"] if not p.endswith(".py")]) and len(stage["inputs"]) > 1:
+        if outputs_present(stage):
+            return "skip", "no input files, keeping existing outputs", None
+        return "missing-inputs", "no input files", None
+    fingerprint = stage_fingerprint(stage, hash_cache)
+    previous = state["stages"].get(stage["name"], {})
+    if args.force:
+        return "run", "--force", fingerprint
+    if any(dep in changed for dep in stage.get("deps", [])):
+        return "run", "dependency rebuilt", fingerprint
+    if not outputs_present(stage):
+        return "run", "outputs missing", fingerprint
+    if previous.get("fingerprint") != fingerprint:
+        return "run", "inputs changed" if previous else "no previous build", fingerprint
+    return "skip", "up to date", fingerprint
+
+
+def run_stage(stage):
+    """Run a stage's command, streaming its output to processing/_build/<name>.log."""
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    log_path = os.path.join(BUILD_DIR, f"{stage['name']}.log")
+    env = dict(os.environ, **stage.get("env", {}))
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        proc = subprocess.run(command(stage), cwd=os.path.join(REPO_ROOT, stage["cwd"]), env=env,
+                              stdout=log, stderr=subprocess.STDOUT)
+    return proc.returncode, time.perf_counter() - start, os.path.relpath(log_path, REPO_ROOT)
+
+
+def build(stages, args):
+    state = load_state()
+    hash_cache = state.setdefault("hashes", {})
+    results = {}
+    changed = set()
+    done = set()
+    blocked = set()
+    running = {}
+
+    def finish(stage, result):
+        results[stage["name"]] = result
+        done.add(stage["name"])
+        if result["status"] in ("failed", "blocked", "unavailable", "missing-inputs") and not stage.get("fetch"):
+            blocked.add(stage["name"])
+        print(f"[build] {stage['name']:<22} {result['status']:<15} {result['reason']}"
+              + (f" ({result['seconds']:.1f}s)" if result.get("seconds") else ""))
+
+    remaining = list(stages)
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        while remaining or running:
+            for stage in list(remaining):
+                deps = [d for d in stage.get("deps", []) if d in {s["name"] for s in stages}]
+                if any(d not in done for d in deps):
+                    continue
+                remaining.remove(stage)
+                if any(d in blocked for d in deps):
+                    finish(stage, {"status": "blocked", "reason": "dependency did not build"})
+                    continue
+                action, reason, fingerprint = plan_stage(stage, state, args, hash_cache, changed)
+                if action != "run":
+                    status = "skipped" if action == "skip" else action
+                    finish(stage, {"status": status, "reason": reason})
+                    continue
+                if args.dry_run:
+                    changed.add(stage["name"])
+                    finish(stage, {"status": "would-run", "reason": reason})
+                    continue
+                print(f"[build] {stage['name']:<22} running         {reason}")
+                running[pool.submit(run_stage, stage)] = (stage, reason, fingerprint)
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, reason, fingerprint = running.pop(future)
+                returncode, seconds, log_path = future.result()
+                if returncode == 0:
+                    changed.add(stage["name"])
+                    # Fetch stages have no fingerprint; their outputs feed the downstream fingerprints
+                    if fingerprint is None and not stage.get("fetch"):
+                        fingerprint = stage_fingerprint(stage, hash_cache)
+                    state["stages"][stage["name"]] = {"fingerprint": fingerprint, "built_at": time.time()}
+                    finish(stage, {"status": "built", "reason": reason, "seconds": seconds, "log": log_path})
+                else:
+                    finish(stage, {"status": "failed", "reason": f"exit code {returncode}, see {log_path}",
+                                   "seconds": seconds, "log": log_path})
+
+    if not args.dry_run:
+        write_json(STATE_PATH, state)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild generated assets under public/data.")
+    parser.add_argument("stages", nargs="*", help="Stages to build (default: all); dependencies are included")
+    parser.add_argument("--fetch", action="store_true", help="Re-run download stages (network)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every selected stage")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would run")
+    parser.add_argument("--jobs", type=int, default=min(4, os.cpu_count() or 1), help="Stages run at once (default: up to 4)")
+    parser.add_argument("--list", action="store_true", help="List stages and exit")
+    parser.add_argument("--gtfs-dir", default=f"{STATIC_DIR}/gtfs", help="GTFS feeds, one sub-directory each (repo-relative)")
+    parser.add_argument("--models-dir", default="processing/models", help=".blend models for the icon render (repo-relative)")
+    parser.add_argument("--events", default=f"{PERMIT_DIR}/nyc_2*.geojson",
+                        help="Glob of event downloads for events_by_cemsid.json; the newest match is used "
+                             "(repo-relative, default: the permit_areas_download output)")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"), help="Blender executable")
+    args = parser.parse_args()
+
+    stages = define_stages(args)
+    if args.list:
+        for stage in stages:
+            deps = ", ".join(stage.get("deps", [])) or "-"
+            print(f"{stage['name']:<22} deps: {deps:<24} outputs: {', '.join(stage['outputs'])}")
+        return
+
+    selected = select_stages(stages, args.stages)
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    start = time.perf_counter()
+    results = build(selected, args)
+    report = {
+        "started_at": started_at,
+        "seconds": round(time.perf_counter() - start, 3),
+        "dry_run": args.dry_run,
+        "stages": results,
+    }
+    write_json(REPORT_PATH, report)
+    counts = {}
+    for result in results.values():
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print(f"[build] done in {report['seconds']:.1f}s: "
+          + ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+          + f"; report: {os.path.relpath(REPORT_PATH, REPO_ROOT)}")
+    if any(result["status"] == "failed" for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
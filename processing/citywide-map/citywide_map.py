@@ -1,13 +1,108 @@
-# simple script to load nybb from geodatasets and export as a network image 
+# simple script to load nybb from geodatasets and export as a network image
+#
+# Besides the 300 dpi PNG it writes lightweight vector versions of the same borough outlines:
+#   nybb.geojson  simplified, WGS84, coordinates quantized to --precision decimals
+#   nybb.svg      the same shapes as one path per borough, in an integer pixel grid
+#   nybb.json     index with the lon/lat bbox of both, so markers can be placed on them
+import argparse
+import json
+import math
+import os
+import sys
+
 import geopandas as gpd
 import geodatasets
 import matplotlib.pyplot as plt
 
-# load nybb from geodatasets
-nybb = gpd.read_file(geodatasets.get_path('nybb'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from geojson_stream import write_geojson  # noqa: E402
+
+default_output = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../public/data/nybb.png')
+
+# Simplification tolerance in feet (nybb ships in EPSG:2263, NY State Plane)
+SIMPLIFY_FT = 100
+SVG_WIDTH = 1000
+
+
+def simplify_boroughs(nybb, tolerance_ft=SIMPLIFY_FT):
+    """Simplify in the source projected CRS (shared borough edges keep their topology), then go to WGS84."""
+    simplified = nybb.copy()
+    simplified['geometry'] = nybb.geometry.simplify(tolerance_ft, preserve_topology=True)
+    return simplified.to_crs('EPSG:4326')
+
+
+def svg_path(geom, to_px):
+    """SVG path data for a (Multi)Polygon, closing each ring."""
+    polygons = geom.geoms if geom.geom_type == 'MultiPolygon' else [geom]
+    parts = []
+    for polygon in polygons:
+        for ring in [polygon.exterior, *polygon.interiors]:
+            points = [to_px(x, y) for x, y in ring.coords[:-1]]
+            # Drop consecutive duplicates created by snapping to the pixel grid
+            points = [p for i, p in enumerate(points) if i == 0 or p != points[i - 1]]
+            if len(points) >= 3:
+                parts.append('M' + 'L'.join(f'{x},{y}' for x, y in points) + 'Z')
+    return ''.join(parts)
+
+
+def write_svg(boroughs, path, width=SVG_WIDTH):
+    """Write the outlines as SVG styled like the PNG; returns the lon/lat bbox it covers.
+
+    Longitude is scaled by cos(mid latitude) so shapes keep their proportions; x and y are
+    linear in lon/lat, so a point maps with x = (lon - west) / (east - west) * width.
+    """
+    west, south, east, north = boroughs.total_bounds
+    aspect = (east - west) * math.cos(math.radians((south + north) / 2)) / (north - south)
+    height = round(width / aspect)
+
+    def to_px(lon, lat):
+        return round((lon - west) / (east - west) * width), round((north - lat) / (north - south) * height)
+
+    # vector-effect is not inherited, so it goes on every path to keep the stroke 1.5 px at any size
+    paths = [f'<path d="{svg_path(geom, to_px)}" vector-effect="non-scaling-stroke"/>' for geom in boroughs.geometry if geom is not None and not geom.is_empty]
+    with open(path, 'w') as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="{width}" height="{height}">'
+                '<g fill="#fff" stroke="#000" stroke-width="1.5" stroke-linejoin="round">'
+                + ''.join(paths) + '</g></svg>\n')
+    return [float(west), float(south), float(east), float(north)], [width, height]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render the NYC borough outline map.')
+    parser.add_argument('--output', default=default_output, help='Output PNG path (default: public/data/nybb.png)')
+    parser.add_argument('--precision', type=int, default=5, help='GeoJSON coordinate decimals (default: 5, ~1 m)')
+    parser.add_argument('--tolerance-ft', type=float, default=SIMPLIFY_FT, help=f'Simplification tolerance in feet (default: {SIMPLIFY_FT})')
+    parser.add_argument('--no-vector', action='store_true', help='Only write the PNG')
+    args = parser.parse_args()
+
+    # load nybb from geodatasets
+    nybb = gpd.read_file(geodatasets.get_path('nybb'))
+
+    # plot as simple png
+    fig, ax = plt.subplots(figsize=(10, 10))
+    nybb.plot(ax=ax, color='white', edgecolor='black', linewidth=1.5)
+    plt.axis('off')
+    plt.savefig(args.output, dpi=300, bbox_inches='tight', pad_inches=0)
+    print(f'Wrote {args.output} ({os.path.getsize(args.output) / 1024:.0f} KiB)')
+    if args.no_vector:
+        return
+
+    root = os.path.splitext(args.output)[0]
+    boroughs = simplify_boroughs(nybb, args.tolerance_ft)
+    boroughs = boroughs[[c for c in ('BoroCode', 'BoroName') if c in boroughs.columns] + ['geometry']]
+    write_geojson(boroughs, f'{root}.geojson', args.precision)
+    bbox, size = write_svg(boroughs, f'{root}.svg')
+    index = {
+        'bbox': [round(v, 6) for v in bbox],
+        'png': os.path.basename(args.output),
+        'geojson': os.path.basename(f'{root}.geojson'),
+        'svg': {'file': os.path.basename(f'{root}.svg'), 'width': size[0], 'height': size[1]},
+    }
+    with open(f'{root}.json', 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    for ext in ('geojson', 'svg'):
+        print(f'Wrote {root}.{ext} ({os.path.getsize(f"{root}.{ext}") / 1024:.0f} KiB)')
+
 
-# plot as simple png 
-fig, ax = plt.subplots(figsize=(10, 10))
-nybb.plot(ax=ax, color='white', edgecolor='black', linewidth=1.5)
-plt.axis('off')
-plt.savefig('../../public/data/nybb.png', dpi=300, bbox_inches='tight', pad_inches=0)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# Streaming GeoJSON writer shared by the preprocessing scripts.
+#
+# Features are serialized one at a time with compact separators and coordinates rounded to a
+# fixed number of decimals, so writing a layer never builds the whole document in memory (or
+# goes through GDAL). Optionally writes pre-compressed siblings (<path>.gz, <path>.br) for
+# static hosting; brotli needs the `brotli` package and is skipped with a warning otherwise.
+#
+# Scripts outside processing/ import it with:
+#   sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "<relative path to>/processing"))
+#   from geojson_stream import write_geojson
+import gzip
+import json
+import math
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ~1 cm at NYC latitudes; used when no precision is given
+DEFAULT_PRECISION = 7
+COMPRESSIONS = ("gzip", "br")
+COPY_CHUNK = 1 << 20
+
+
+def json_value(value):
+    """Convert numpy/pandas scalars and arrays to plain JSON values (NaN and NaT become null)."""
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "isoformat"):
+        return None if value != value else value.isoformat()
+    return value
+
+
+def round_coordinates(coords, precision):
+    if coords and isinstance(coords[0], (int, float)):
+        return [round(c, precision) for c in coords]
+    return [round_coordinates(c, precision) for c in coords]
+
+
+def geometry_json(geom, precision):
+    """GeoJSON geometry dict for a shapely geometry, with rounded coordinates."""
+    if geom is None or geom.is_empty:
+        return None
+    mapping = geom.__geo_interface__
+    if mapping["type"] == "GeometryCollection":
+        return {"type": "GeometryCollection",
+                "geometries": [geometry_json(part, precision) for part in geom.geoms]}
+    return {"type": mapping["type"], "coordinates": round_coordinates(mapping["coordinates"], precision)}
+
+
+def iter_features(gdf, precision=DEFAULT_PRECISION, properties=None):
+    """Yield GeoJSON feature dicts for the rows of a GeoDataFrame.
+
+    `properties` selects and orders the property columns (default: every non-geometry column).
+    """
+    if properties is None:
+        properties = [c for c in gdf.columns if c != gdf.geometry.name]
+    columns = [gdf[name].tolist() for name in properties]
+    for i, geom in enumerate(gdf.geometry):
+        yield {
+            "type": "Feature",
+            "properties": {name: json_value(column[i]) for name, column in zip(properties, columns)},
+            "geometry": geometry_json(geom, precision),
+        }
+
+
+def compress_file(path, method):
+    """Write <path>.gz or <path>.br next to `path`, streaming; returns the new path or None."""
+    if method == "gzip":
+        out_path = f"{path}.gz"
+        with open(path, "rb") as src, gzip.open(out_path, "wb", compresslevel=9) as dst:
+            shutil.copyfileobj(src, dst, COPY_CHUNK)
+        return out_path
+    if method == "br":
+        if brotli is None:
+            print(f"[geojson_stream] brotli is not installed; skipping {path}.br")
+            return None
+        out_path = f"{path}.br"
+        compressor = brotli.Compressor(quality=11)
+        with open(path, "rb") as src, open(out_path, "wb") as dst:
+            for chunk in iter(lambda: src.read(COPY_CHUNK), b""):
+                dst.write(compressor.process(chunk))
+            dst.write(compressor.finish())
+        return out_path
+    raise ValueError(f"unknown compression {method!r}; expected one of {', '.join(COMPRESSIONS)}")
+
+
+def write_feature_collection(features, path, extra=None, compress=()):
+    """Stream an iterable of feature dicts into a FeatureCollection at `path`.
+
+    `extra` adds top-level members (written before "features"), e.g. lookup tables.
+    `compress` lists sibling encodings to write: "gzip" and/or "br".
+    Returns {"features", "bytes", plus "<method>_bytes" per compressed copy}.
+    """
+    encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+    tmp = f"{path}.tmp"
+    count = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write('{"type":"FeatureCollection"')
+        for key, value in (extra or {}).items():
+            f.write(f",{encoder.encode(key)}:{encoder.encode(value)}")
+        f.write(',"features":[')
+        for feature in features:
+            if count:
+                f.write(",\n")
+            f.write(encoder.encode(feature))
+            count += 1
+        f.write("]}\n")
+    os.replace(tmp, path)
+
+    stats = {"features": count, "bytes": os.path.getsize(path)}
+    for method in compress:
+        out_path = compress_file(path, method)
+        if out_path:
+            stats[f"{method}_bytes"] = os.path.getsize(out_path)
+    return stats
+
+
+def write_geojson(gdf, path, precision=DEFAULT_PRECISION, properties=None, extra=None, compress=()):
+    """Write a GeoDataFrame as compact GeoJSON (WGS84 lon/lat) without going through GDAL."""
+    if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs("EPSG:4326")
+    return write_feature_collection(iter_features(gdf, precision, properties), path, extra, compress)
@@ -0,0 +1,354 @@
+# Blender-free line icons: silhouette and crease edges of a mesh as SVG, for 3d2svg's isometric views
+# plus a plan view.
+#
+# Loads triangles once from an OBJ or glTF/GLB export, welds vertices split at UV/normal seams,
+# and precomputes edge adjacency and crease edges. Front-facing tests for all views are then one
+# matrix product: an edge is drawn when it separates a front face from a back face (silhouette),
+# borders an open front face, or is a crease (dihedral angle above --crease-deg) on a front face.
+# Hidden-line removal is limited to this back-face culling, which suits the mostly convex street
+# furniture models; creases behind other parts of a concave model can show through.
+#
+# Cameras use 3d2svg.py's orthographic math (same env defaults: SS_ISO_ELEV_DEG, SS_BASE_YAW_DEG,
+# SS_OUTPUT_RES, SS_BORDER_PX, SS_EXPORT_TOP_DOWN): one shared ortho width for the isometric yaws
+# from the analytic right/up axes, and a straight-down view framed on the XY footprint.
+# Isometric names match the PNG renders: <out>/<stem>/<stem>_<angle>.svg. The straight-down views
+# are true plan views, while 3d2svg's <stem>_TOP_<angle>.png camera (rotation (90°, 0, yaw)) looks
+# horizontally, so they are named <stem>_PLAN_<angle>.svg rather than pairing with those frames.
+#
+# Usage:
+#   python mesh2svg.py models/bench.glb models/hydrant.obj --out-dir outputs/svg
+import argparse
+import base64
+import json
+import math
+import os
+import struct
+import time
+
+import numpy as np
+
+angles = [0, 45, 90, 135, 180, 225, 270, 315]
+isometric_elevation_deg = float(os.environ.get("SS_ISO_ELEV_DEG", "35.264"))
+base_yaw_offset_deg = float(os.environ.get("SS_BASE_YAW_DEG", "0"))
+output_resolution = int(os.environ.get("SS_OUTPUT_RES", "512"))
+border_px = int(os.environ.get("SS_BORDER_PX", "6"))
+export_top_down = os.environ.get("SS_EXPORT_TOP_DOWN", "1") in ("1", "true", "True")
+
+GLTF_COMPONENTS = {5120: "i1", 5121: "u1", 5122: "i2", 5123: "u2", 5125: "u4", 5126: "f4"}
+GLTF_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT4": 16}
+GLB_MAGIC = 0x46546C67
+GLTF_TRIANGLES = 4
+
+
+def load_obj(path):
+    """Vertices (N, 3) and triangles (F, 3) from a Wavefront OBJ; polygons are fan-triangulated."""
+    vertices = []
+    triangles = []
+    with open(path) as f:
+        for line in f:
+            if line.startswith("v "):
+                vertices.append([float(v) for v in line.split()[1:4]])
+            elif line.startswith("f "):
+                # "f 1/2/3 4//6 -1": vertex index is the first field, negative counts from the end
+                idx = [int(tok.split("/")[0]) for tok in line.split()[1:]]
+                idx = [i - 1 if i > 0 else len(vertices) + i for i in idx]
+                triangles.extend([idx[0], idx[k], idx[k + 1]] for k in range(1, len(idx) - 1))
+    return np.asarray(vertices, dtype=np.float64).reshape(-1, 3), np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+
+
+def node_matrix(node):
+    if "matrix" in node:
+        return np.asarray(node["matrix"], dtype=np.float64).reshape(4, 4).T
+    x, y, z, w = node.get("rotation", [0, 0, 0, 1])
+    rotation = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.asarray(node.get("scale", [1, 1, 1]), dtype=np.float64)
+    matrix[:3, 3] = node.get("translation", [0, 0, 0])
+    return matrix
+
+
+def load_gltf(path):
+    """Vertices and triangles of every triangle primitive in the default scene, in world space."""
+    with open(path, "rb") as f:
+        data = f.read()
+    binary = None
+    if struct.unpack_from("<I", data)[0] == GLB_MAGIC:
+        _, _, length = struct.unpack_from("<III", data)
+        offset = 12
+        doc = None
+        while offset < length:
+            chunk_len, chunk_type = struct.unpack_from("<II", data, offset)
+            chunk = data[offset + 8:offset + 8 + chunk_len]
+            if chunk_type == 0x4E4F534A:  # JSON
+                doc = json.loads(chunk)
+            elif chunk_type == 0x004E4942:  # BIN
+                binary = chunk
+            offset += 8 + chunk_len
+    else:
+        doc = json.loads(data)
+
+    buffers = []
+    for buf in doc.get("buffers", []):
+        uri = buf.get("uri")
+        if uri is None:
+            buffers.append(binary)
+        elif uri.startswith("data:"):
+            buffers.append(base64.b64decode(uri.split(",", 1)[1]))
+        else:
+            with open(os.path.join(os.path.dirname(path), uri), "rb") as f:
+                buffers.append(f.read())
+
+    def accessor(index):
+        acc = doc["accessors"][index]
+        view = doc["bufferViews"][acc["bufferView"]]
+        dtype = np.dtype(GLTF_COMPONENTS[acc["componentType"]]).newbyteorder("<")
+        width = GLTF_SIZES[acc["type"]]
+        start = view.get("byteOffset", 0) + acc.get("byteOffset", 0)
+        stride = view.get("byteStride") or dtype.itemsize * width
+        raw = np.frombuffer(buffers[view["buffer"]], dtype=np.uint8,
+                            count=stride * (acc["count"] - 1) + dtype.itemsize * width, offset=start)
+        rows = np.lib.stride_tricks.as_strided(raw, shape=(acc["count"], dtype.itemsize * width), strides=(stride, 1))
+        return np.ascontiguousarray(rows).view(dtype).reshape(acc["count"], width)
+
+    vertices = []
+    triangles = []
+    count = 0
+
+    def visit(node_index, parent):
+        nonlocal count
+        node = doc["nodes"][node_index]
+        matrix = parent @ node_matrix(node)
+        for prim in doc["meshes"][node["mesh"]]["primitives"] if "mesh" in node else []:
+            if prim.get("mode", GLTF_TRIANGLES) != GLTF_TRIANGLES or "POSITION" not in prim["attributes"]:
+                continue
+            positions = accessor(prim["attributes"]["POSITION"]).astype(np.float64)
+            if "indices" in prim:
+                indices = accessor(prim["indices"]).astype(np.int64).reshape(-1, 3)
+            else:
+                indices = np.arange(len(positions), dtype=np.int64).reshape(-1, 3)
+            vertices.append(positions @ matrix[:3, :3].T + matrix[:3, 3])
+            triangles.append(indices + count)
+            count += len(positions)
+        for child in node.get("children", []):
+            visit(child, matrix)
+
+    scene = doc["scenes"][doc.get("scene", 0)] if doc.get("scenes") else {"nodes": range(len(doc["nodes"]))}
+    for root in scene["nodes"]:
+        visit(root, np.eye(4))
+    if not vertices:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+    return np.concatenate(vertices), np.concatenate(triangles)
+
+
+def load_mesh(path, up_axis="y"):
+    """Load an OBJ/glTF/GLB as (vertices, triangles) in Blender's Z-up frame."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".obj":
+        vertices, triangles = load_obj(path)
+    elif ext in (".gltf", ".glb"):
+        vertices, triangles = load_gltf(path)
+    else:
+        raise ValueError(f"unsupported mesh format {ext!r} (use .obj, .gltf or .glb)")
+    if up_axis == "y":
+        # Blender's glTF/OBJ exporters write +Y up, -Z forward: undo that
+        vertices = np.stack([vertices[:, 0], -vertices[:, 2], vertices[:, 1]], axis=1)
+    return vertices, triangles
+
+
+def weld(vertices, triangles, tolerance=1e-6):
+    """Merge vertices closer than `tolerance` so faces split at seams share edges again."""
+    scale = max(float(np.ptp(vertices, axis=0).max()) if len(vertices) else 1.0, 1e-12)
+    keys = np.round(vertices / (scale * tolerance)).astype(np.int64)
+    _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    triangles = inverse.reshape(-1)[triangles]
+    # Drop faces that collapsed to a line or point
+    degenerate = (triangles[:, 0] == triangles[:, 1]) | (triangles[:, 1] == triangles[:, 2]) | (triangles[:, 0] == triangles[:, 2])
+    return vertices[first], triangles[~degenerate]
+
+
+def build_edges(vertices, triangles, crease_deg):
+    """Unique edges with their (up to two) adjacent faces and a crease flag.
+
+    Returns (edges (E, 2), face0 (E,), face1 (E,) with -1 for boundary edges, crease (E,) bool,
+    face normals (F, 3)). Edges shared by more than two faces keep the first two.
+    """
+    normals = np.cross(vertices[triangles[:, 1]] - vertices[triangles[:, 0]],
+                       vertices[triangles[:, 2]] - vertices[triangles[:, 0]])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = normals / np.where(lengths > 0, lengths, 1.0)
+
+    half = np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]])
+    faces = np.tile(np.arange(len(triangles)), 3)
+    half = np.sort(half, axis=1)
+    edges, inverse = np.unique(half, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(inverse, kind="stable")
+    sorted_edges = inverse[order]
+    starts = np.searchsorted(sorted_edges, np.arange(len(edges)))
+    counts = np.bincount(inverse, minlength=len(edges))
+    face0 = faces[order[starts]]
+    face1 = np.where(counts > 1, faces[order[np.minimum(starts + 1, len(order) - 1)]], -1)
+
+    crease = np.zeros(len(edges), dtype=bool)
+    shared = face1 >= 0
+    cos_angle = np.einsum("ij,ij->i", normals[face0[shared]], normals[face1[shared]])
+    crease[shared] = cos_angle < math.cos(math.radians(crease_deg))
+    return edges, face0, face1, crease, normals
+
+
+def isometric_view_margin(angle):
+    """Framing margin per yaw (kept in sync with 3d2svg.py)."""
+    angle_mod = int(angle) % 360
+    margin = 1.22 if angle_mod in (45, 135, 225, 315) else 1.18
+    if angle_mod in (0, 360, 45):
+        margin = max(margin, 1.30)
+    return margin
+
+
+def view_axes(view_angles, elevation_deg, base_yaw_deg, top_down=False):
+    """Per view: direction towards the camera, image-plane right and up, each (V, 3).
+
+    Isometric views match 3d2svg's look-at camera with world +Z up; top-down (plan) views look
+    straight down with the image rotated by the yaw.
+    """
+    yaws = np.radians(np.asarray(view_angles, dtype=np.float64) + base_yaw_deg)
+    sin_y, cos_y = np.sin(yaws), np.cos(yaws)
+    zeros, ones = np.zeros_like(yaws), np.ones_like(yaws)
+    if top_down:
+        return (np.stack([zeros, zeros, ones], axis=1),
+                np.stack([cos_y, sin_y, zeros], axis=1),
+                np.stack([-sin_y, cos_y, zeros], axis=1))
+    elev = math.radians(elevation_deg)
+    toward = np.stack([cos_y * math.cos(elev), sin_y * math.cos(elev), np.full_like(yaws, math.sin(elev))], axis=1)
+    right = np.stack([-sin_y, cos_y, zeros], axis=1)
+    up = np.stack([-cos_y * math.sin(elev), -sin_y * math.sin(elev), np.full_like(yaws, math.cos(elev))], axis=1)
+    return toward, right, up
+
+
+def chain_edges(edges):
+    """Join edges (E, 2) into vertex-index polylines, walking through vertices of degree 2."""
+    adjacency = {}
+    for a, b in edges.tolist():
+        adjacency.setdefault(a, []).append(b)
+        adjacency.setdefault(b, []).append(a)
+    used = set()
+    chains = []
+
+    def walk(start, nxt):
+        chain = [start]
+        prev, cur = start, nxt
+        while True:
+            used.add((min(prev, cur), max(prev, cur)))
+            chain.append(cur)
+            if len(adjacency[cur]) != 2 or cur == start:
+                return chain
+            step = adjacency[cur][0] if adjacency[cur][1] == prev else adjacency[cur][1]
+            if (min(cur, step), max(cur, step)) in used:
+                return chain
+            prev, cur = cur, step
+
+    # Open chains start at endpoints and junctions, then whatever is left are closed loops
+    for vertex in sorted(adjacency, key=lambda v: len(adjacency[v]) == 2):
+        for nxt in adjacency[vertex]:
+            if (min(vertex, nxt), max(vertex, nxt)) not in used:
+                chains.append(walk(vertex, nxt))
+    return chains
+
+
+def svg_document(points_2d, chains, resolution, stroke_width):
+    """Compact SVG: one stroked path, integer-rounded pixel coordinates."""
+    parts = []
+    for chain in chains:
+        coords = np.rint(points_2d[chain]).astype(np.int64)
+        keep = np.ones(len(coords), dtype=bool)
+        keep[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+        coords = coords[keep]
+        if len(coords) < 2:
+            continue
+        closed = len(chain) > 2 and chain[0] == chain[-1]
+        if closed:
+            coords = coords[:-1]
+        parts.append("M" + "L".join(f"{x},{y}" for x, y in coords.tolist()) + ("Z" if closed else ""))
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {resolution} {resolution}" '
+            f'width="{resolution}" height="{resolution}"><path d="{"".join(parts)}" fill="none" stroke="#000" '
+            f'stroke-width="{stroke_width}" stroke-linecap="round" stroke-linejoin="round"/></svg>\n')
+
+
+def mesh_to_svgs(path, out_dir, resolution=output_resolution, crease_deg=30.0, stroke_width=1.5, up_axis="y"):
+    """Write every isometric (and plan) SVG view of one mesh; returns {filename: bytes}."""
+    start = time.perf_counter()
+    vertices, triangles = load_mesh(path, up_axis)
+    vertices, triangles = weld(vertices, triangles)
+    if len(triangles) == 0:
+        raise ValueError(f"{path} has no triangles")
+    edges, face0, face1, crease, normals = build_edges(vertices, triangles, crease_deg)
+    mins, maxs = vertices.min(axis=0), vertices.max(axis=0)
+    center = (mins + maxs) / 2
+    rel = vertices - center
+    stem = os.path.splitext(os.path.basename(path))[0]
+    model_dir = os.path.join(out_dir, stem)
+    os.makedirs(model_dir, exist_ok=True)
+
+    views = [(f"{stem}_{a:03d}.svg", a, False) for a in angles]
+    if export_top_down:
+        views += [(f"{stem}_PLAN_{a:03d}.svg", a, True) for a in angles]
+
+    toward_iso, right_iso, up_iso = view_axes(angles, isometric_elevation_deg, base_yaw_offset_deg)
+    toward_top, right_top, up_top = view_axes(angles, isometric_elevation_deg, base_yaw_offset_deg, top_down=True)
+    toward = np.concatenate([toward_iso, toward_top]) if export_top_down else toward_iso
+    right = np.concatenate([right_iso, right_top]) if export_top_down else right_iso
+    up = np.concatenate([up_iso, up_top]) if export_top_down else up_iso
+
+    # Ortho widths as in 3d2svg.solve_ortho_scales: one shared width for the isometric yaws
+    half_w = np.abs(rel @ right_iso.T).max(axis=0)
+    half_h = np.abs(rel @ up_iso.T).max(axis=0)
+    iso_widths = np.maximum(2.0 * half_w, 2.0 * half_h) * np.array([isometric_view_margin(a) for a in angles])
+    iso_widths += 2.0 * (iso_widths / resolution) * border_px
+    # 3d2svg starts from 1.25x the larger XY size and only ever grows the shared width
+    iso_width = max(float(iso_widths.max()), float(max(2.0, maxs[0] - mins[0], maxs[1] - mins[1]) * 1.25))
+    top_width = float((maxs[:2] - mins[:2]).max()) * 1.25
+    widths = [iso_width] * len(angles) + ([top_width] * len(angles) if export_top_down else [])
+
+    # Front-facing faces for all views in one product: (F, V)
+    front = (normals @ toward.T) > 0
+    has_two = face1 >= 0
+    front0 = front[face0]
+    front1 = np.where(has_two[:, None], front[np.maximum(face1, 0)], False)
+    silhouette = np.where(has_two[:, None], front0 != front1, front0)
+    visible = silhouette | (crease[:, None] & (front0 | front1))
+    u_all = rel @ right.T
+    v_all = rel @ up.T
+
+    sizes = {}
+    for k, (filename, _angle, _top) in enumerate(views):
+        scale = resolution / widths[k]
+        points = np.stack([resolution / 2 + u_all[:, k] * scale, resolution / 2 - v_all[:, k] * scale], axis=1)
+        doc = svg_document(points, chain_edges(edges[visible[:, k]]), resolution, stroke_width)
+        with open(os.path.join(model_dir, filename), "w") as f:
+            f.write(doc)
+        sizes[filename] = len(doc)
+    print(f"[mesh2svg] {stem}: {len(triangles)} triangles, {len(edges)} edges, {int(crease.sum())} creases -> "
+          f"{len(views)} views, {sum(sizes.values()) / 1024:.0f} KiB in {time.perf_counter() - start:.2f}s")
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write silhouette/crease SVG views of meshes without Blender.")
+    parser.add_argument("meshes", nargs="+", help="Mesh files (.obj, .gltf, .glb)")
+    parser.add_argument("--out-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "outputs"),
+                        help="Output root; each model gets a sub-directory (default: processing/outputs)")
+    parser.add_argument("--resolution", type=int, default=output_resolution, help="SVG size in px (default: SS_OUTPUT_RES or 512)")
+    parser.add_argument("--crease-deg", type=float, default=30.0, help="Dihedral angle that counts as a crease (default: 30)")
+    parser.add_argument("--stroke-width", type=float, default=1.5, help="Line width in px (default: 1.5)")
+    parser.add_argument("--up-axis", choices=("y", "z"), default="y", help="Up axis of the files (default: y, as Blender exports)")
+    args = parser.parse_args()
+    for path in args.meshes:
+        mesh_to_svgs(path, args.out_dir, args.resolution, args.crease_deg, args.stroke_width, args.up_axis)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# Post-render stage: small, multi-density icon files for the app.
+#
+# 3d2svg.py renders every view at SS_OUTPUT_RES (512 px by default) as full RGBA, while the map
+# and sidebars draw icons at 32-96 CSS px. For every rendered view this script:
+#   - trims the image to its alpha bounding box (offset and original size go into the manifest),
+#   - scales it to 1x/2x/4x of --base-size CSS px (never upscaling, premultiplied-alpha Lanczos),
+#   - optionally quantizes to a small palette (--palette-colors; the black-and-white isometric-bw
+#     renders need only a few grey levels plus alpha),
+#   - encodes PNG, WebP and/or AVIF,
+# and writes manifest.json so the frontend can pick a density by devicePixelRatio and the first
+# format the browser supports. Frames whose source PNG is unchanged since the last run are reused.
+#
+# Usage (plain Python with Pillow, no Blender needed):
+#   python optimize_icons.py ../public/data/icons/isometric-bw --out-dir ../public/data/icons/optimized/isometric-bw --palette-colors 16
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, features
+
+from pack_atlas import collect_images, parse_frame_name, trim_frame
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+FORMATS = ("png", "webp", "avif")
+DEFAULT_DENSITIES = (1, 2, 4)
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scaled(image, scale):
+    """Resize an RGBA image by `scale`; Pillow resamples RGBA with premultiplied alpha."""
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image if size == image.size else image.resize(size, Image.Resampling.LANCZOS)
+
+
+def quantize(image, colors):
+    """Palette image with alpha (fast octree keeps the alpha channel); None to keep RGBA."""
+    if not colors:
+        return None
+    return image.quantize(colors=colors, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+
+
+def encode(image, palette_image, fmt, path, quality):
+    if fmt == "png":
+        (palette_image or image).save(path, "PNG", optimize=True)
+    elif fmt == "webp":
+        # Palette-reduced sources compress best lossless; full-color ones as lossy with exact alpha
+        if palette_image is not None:
+            palette_image.convert("RGBA").save(path, "WEBP", lossless=True, quality=100, method=6)
+        else:
+            image.save(path, "WEBP", quality=quality, alpha_quality=100, method=6)
+    elif fmt == "avif":
+        (palette_image.convert("RGBA") if palette_image is not None else image).save(path, "AVIF", quality=quality, speed=6)
+    else:
+        raise ValueError(f"unknown format {fmt!r}")
+
+
+def optimize_frame(task):
+    """Trim, scale and encode one source PNG; returns (key, manifest entry). Runs in a worker."""
+    key, path, digest, out_dir, options = task
+    image, offset, source_size = trim_frame(path)
+    model, view, angle = parse_frame_name(key)
+    entry = {
+        "model": model,
+        "view": view,
+        "angle": angle,
+        "sourceSize": list(source_size),
+        "offset": list(offset),
+        "size": list(image.size),
+        # Renders are centered on the model, so the anchor is the source image center
+        "anchor": [source_size[0] / 2.0 - offset[0], source_size[1] / 2.0 - offset[1]],
+        "sha1": digest,
+        "variants": {},
+    }
+    seen = set()
+    for density in options["densities"]:
+        # Density scale relative to the full source frame, so offsets scale the same way
+        scale = min(1.0, density * options["base_size"] / max(source_size))
+        variant = scaled(image, scale)
+        if variant.size in seen:
+            continue  # small sources: 4x would just repeat 2x at full resolution
+        seen.add(variant.size)
+        palette_image = quantize(variant, options["palette_colors"])
+        files = {}
+        sizes = {}
+        for fmt in options["formats"]:
+            filename = f"{key}@{density}x.{fmt}"
+            encode(variant, palette_image, fmt, os.path.join(out_dir, filename), options["quality"])
+            files[fmt] = filename
+            sizes[fmt] = os.path.getsize(os.path.join(out_dir, filename))
+        entry["variants"][f"{density}x"] = {"scale": scale, "w": variant.width, "h": variant.height,
+                                            "files": files, "bytes": sizes}
+    return key, entry
+
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def optimize_icons(input_dirs, out_dir, options, jobs=0, force=False):
+    """Write density variants for every PNG under input_dirs plus out_dir/manifest.json."""
+    os.makedirs(out_dir, exist_ok=True)
+    sources = collect_images(input_dirs)
+    if not sources:
+        raise SystemExit(f"No PNG files found in {', '.join(input_dirs)}")
+
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    previous = load_manifest(manifest_path)
+    reusable = {}
+    if previous and previous.get("options") == options and not force:
+        reusable = previous["frames"]
+
+    frames = {}
+    tasks = []
+    for key, path in sorted(sources.items()):
+        digest = file_sha1(path)
+        old = reusable.get(key)
+        if old and old["sha1"] == digest and all(
+                os.path.exists(os.path.join(out_dir, name))
+                for variant in old["variants"].values() for name in variant["files"].values()):
+            frames[key] = old
+        else:
+            tasks.append((key, path, digest, out_dir, options))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+        for key, entry in pool.map(optimize_frame, tasks, chunksize=4):
+            frames[key] = entry
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "options": options,
+        "frames": {key: frames[key] for key in sorted(frames)},
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+
+    source_bytes = sum(os.path.getsize(p) for p in sources.values())
+    print(f"[optimize_icons] {len(frames)} frames ({len(tasks)} encoded, {len(frames) - len(tasks)} unchanged) "
+          f"in {time.perf_counter() - start:.1f}s -> {out_dir}")
+    print(f"[optimize_icons] source PNGs: {source_bytes / 1024:.0f} KiB")
+    for density in options["densities"]:
+        label = f"{density}x"
+        totals = {fmt: sum(f["variants"][label]["bytes"][fmt] for f in frames.values() if label in f["variants"])
+                  for fmt in options["formats"]}
+        print(f"[optimize_icons]   {label}: " + ", ".join(
+            f"{fmt} {size / 1024:.0f} KiB ({source_bytes / max(size, 1):.0f}x smaller)" for fmt, size in totals.items()))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trim, scale and re-encode rendered icon views for the app.")
+    parser.add_argument("input_dirs", nargs="+", help="Directories containing rendered PNG views")
+    parser.add_argument("--out-dir", required=True, help="Directory for the variants and manifest.json")
+    parser.add_argument("--base-size", type=int, default=96, help="CSS px of the 1x variant's longer source edge (default: 96)")
+    parser.add_argument("--densities", default="1,2,4", help="Comma-separated density multipliers (default: 1,2,4)")
+    parser.add_argument("--formats", default="png,webp,avif", help="Comma-separated encodings: png, webp, avif")
+    parser.add_argument("--palette-colors", type=int, default=0,
+                        help="Quantize to this many colors (with alpha) before encoding; 0 keeps full RGBA (default: 0)")
+    parser.add_argument("--quality", type=int, default=80, help="Lossy WebP/AVIF quality (default: 80)")
+    parser.add_argument("--jobs", type=int, default=0, help="Worker processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="Re-encode frames even if their source is unchanged")
+    args = parser.parse_args()
+
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown or not formats:
+        parser.error(f"unsupported format(s): {', '.join(sorted(unknown)) or 'none given'}")
+    for fmt in formats:
+        if fmt != "png" and not features.check(fmt):
+            parser.error(f"this Pillow build cannot encode {fmt}; drop it from --formats")
+    try:
+        densities = sorted({int(d) for d in args.densities.split(",") if d.strip()})
+    except ValueError:
+        parser.error("--densities takes comma-separated integers, e.g. 1,2,4")
+    if not densities or densities[0] < 1:
+        parser.error("--densities must be positive")
+    options = {
+        "base_size": args.base_size,
+        "densities": densities,
+        "formats": formats,
+        "palette_colors": args.palette_colors,
+        "quality": args.quality,
+    }
+    optimize_icons(args.input_dirs, args.out_dir, options, args.jobs, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# Post-render stage: pack rendered icon views into texture atlases with a JSON frame index.
+#
+# 3d2svg.py writes one PNG per model per view ({model}_{angle:03d}.png, {model}_TOP_{angle:03d}.png).
+# This script trims each image to its alpha bounding box, shelf-packs the trimmed frames
+# into one or a few atlas pages (PNG and/or lossless WebP) and writes an index with frame
+# rects, trim offsets, original sizes and anchor points, so the app can fetch a handful of
+# atlases instead of hundreds of small files.
+#
+# Usage (plain Python with Pillow, no Blender needed):
+#   python pack_atlas.py ../public/data/icons/isometric-bw --out-dir ../public/data/icons/atlas --name isometric-bw
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+
+from PIL import Image
+
+# Matches 3d2svg.py output names; anything else is packed as a single-view frame
+VIEW_NAME_RE = re.compile(r"^(?P<model>.+?)_(?:(?P<top>TOP)_)?(?P<angle>\d{3})$")
+
+
+def parse_frame_name(stem):
+    """Split an output file stem into (model, view, angle); view is 'iso', 'top' or None."""
+    m = VIEW_NAME_RE.match(stem)
+    if not m:
+        return stem, None, None
+    return m.group("model"), ("top" if m.group("top") else "iso"), int(m.group("angle"))
+
+
+def collect_images(input_dirs):
+    """Return {frame_key: path} for every PNG under the inputs (recursively, first one wins)."""
+    frames = {}
+    for input_dir in input_dirs:
+        for path in sorted(glob.glob(os.path.join(input_dir, "**", "*.png"), recursive=True)):
+            key = os.path.splitext(os.path.basename(path))[0]
+            if key not in frames:
+                frames[key] = path
+    return frames
+
+
+def trim_frame(path):
+    """Load an image and crop it to its non-transparent pixels.
+
+    Returns (cropped RGBA image, (offset_x, offset_y), (source_w, source_h)). Fully
+    transparent images are kept as a single transparent pixel.
+    """
+    image = Image.open(path).convert("RGBA")
+    bbox = image.getchannel("A").getbbox()
+    if bbox is None:
+        bbox = (0, 0, 1, 1)
+    return image.crop(bbox), (bbox[0], bbox[1]), image.size
+
+
+def shelf_pack(sizes, max_size, padding):
+    """Assign positions to rectangles with a height-sorted shelf packer.
+
+    `sizes` is a list of (w, h). Returns (placements, pages) where placements[i] is
+    (page, x, y) and pages is a list of (page_w, page_h). A new page is opened when
+    the next shelf would not fit inside max_size x max_size.
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (sizes[i][1], sizes[i][0]), reverse=True)
+    placements = [None] * len(sizes)
+    pages = []
+    page = -1
+    shelf_x = shelf_y = shelf_h = 0
+    page_w = page_h = 0
+    for i in order:
+        w, h = sizes[i]
+        # Frames get `padding` on both sides: before them and before the page edge
+        if w + 2 * padding > max_size or h + 2 * padding > max_size:
+            raise ValueError(f"frame of {w}x{h}px does not fit in a {max_size}px atlas")
+        if page < 0 or shelf_x + w + 2 * padding > max_size:
+            # Start a new shelf below the current one, or a new page if it would overflow
+            shelf_y += shelf_h
+            shelf_x = 0
+            shelf_h = 0
+            if page < 0 or shelf_y + h + 2 * padding > max_size:
+                if page >= 0:
+                    pages[page] = (page_w, page_h)
+                pages.append((0, 0))
+                page += 1
+                shelf_y = 0
+                page_w = page_h = 0
+        placements[i] = (page, shelf_x + padding, shelf_y + padding)
+        shelf_x += w + padding
+        shelf_h = max(shelf_h, h + padding)
+        page_w = max(page_w, shelf_x + padding)
+        page_h = max(page_h, shelf_y + shelf_h + padding)
+    if page >= 0:
+        pages[page] = (page_w, page_h)
+    return placements, pages
+
+
+def pack_atlas(input_dirs, out_dir, name, max_size=2048, padding=2, formats=("png", "webp")):
+    """Trim, deduplicate and pack all frames; write atlas pages and {name}.json to out_dir.
+
+    Frame entries are keyed by source file stem and give the rect inside the atlas page
+    (x, y, w, h), the trim offset within the original image, the original sourceSize,
+    and the anchor (model center) in frame pixels.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    sources = collect_images(input_dirs)
+    if not sources:
+        raise SystemExit(f"No PNG files found in {', '.join(input_dirs)}")
+
+    frames = {}
+    unique_images = []
+    unique_by_hash = {}
+    source_bytes = 0
+    for key, path in sorted(sources.items()):
+        source_bytes += os.path.getsize(path)
+        image, offset, source_size = trim_frame(path)
+        # Identical views (e.g. top-down views of symmetric objects) share one atlas rect
+        digest = hashlib.sha1(image.tobytes() + repr(image.size).encode()).hexdigest()
+        if digest not in unique_by_hash:
+            unique_by_hash[digest] = len(unique_images)
+            unique_images.append(image)
+        model, view, angle = parse_frame_name(key)
+        frames[key] = {
+            "unique": unique_by_hash[digest],
+            "offset": list(offset),
+            "sourceSize": list(source_size),
+            # Renders are centered on the model, so the anchor is the source image center
+            "anchor": [source_size[0] / 2.0 - offset[0], source_size[1] / 2.0 - offset[1]],
+            "model": model,
+            "view": view,
+            "angle": angle,
+        }
+
+    placements, pages = shelf_pack([im.size for im in unique_images], max_size, padding)
+
+    atlases = []
+    atlas_bytes = 0
+    for page_index, (page_w, page_h) in enumerate(pages):
+        sheet = Image.new("RGBA", (page_w, page_h), (0, 0, 0, 0))
+        for image, (page, x, y) in zip(unique_images, placements):
+            if page == page_index:
+                sheet.paste(image, (x, y))
+        entry = {"width": page_w, "height": page_h, "files": {}}
+        for fmt in formats:
+            filename = f"{name}-{page_index}.{fmt}"
+            path = os.path.join(out_dir, filename)
+            if fmt == "webp":
+                sheet.save(path, "WEBP", lossless=True, quality=100, method=4)
+            else:
+                sheet.save(path, "PNG", optimize=True)
+            entry["files"][fmt] = filename
+            atlas_bytes += os.path.getsize(path)
+        atlases.append(entry)
+
+    for frame in frames.values():
+        unique = frame.pop("unique")
+        page, x, y = placements[unique]
+        frame.update({"atlas": page, "x": x, "y": y, "w": unique_images[unique].width, "h": unique_images[unique].height})
+
+    index = {"version": 1, "atlases": atlases, "frames": frames}
+    with open(os.path.join(out_dir, f"{name}.json"), "w") as f:
+        json.dump(index, f, separators=(",", ":"), sort_keys=True)
+
+    print(f"[pack_atlas] {len(frames)} frames ({len(unique_images)} unique) from {len(sources)} files "
+          f"-> {len(atlases)} atlas page(s) in {out_dir}")
+    print(f"[pack_atlas] source PNGs: {source_bytes / 1024:.0f} KiB, atlases: {atlas_bytes / 1024:.0f} KiB "
+          f"({', '.join(formats)})")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack rendered icon views into texture atlases.")
+    parser.add_argument("input_dirs", nargs="+", help="Directories containing rendered PNG views")
+    parser.add_argument("--out-dir", required=True, help="Directory for atlas pages and the JSON index")
+    parser.add_argument("--name", default="icons", help="Base name for atlas files (default: icons)")
+    parser.add_argument("--max-size", type=int, default=2048, help="Maximum atlas page edge in px (default: 2048)")
+    parser.add_argument("--padding", type=int, default=2, help="Transparent gap between frames in px (default: 2)")
+    parser.add_argument("--formats", default="png,webp", help="Comma-separated atlas encodings: png, webp")
+    args = parser.parse_args()
+
+    formats = tuple(f.strip().lower() for f in args.formats.split(",") if f.strip())
+    unknown = set(formats) - {"png", "webp"}
+    if unknown or not formats:
+        parser.error(f"unsupported atlas format(s): {', '.join(sorted(unknown)) or 'none given'}")
+    pack_atlas(args.input_dirs, args.out_dir, args.name, args.max_size, args.padding, formats)
+
+
+if __name__ == "__main__":
+    main()
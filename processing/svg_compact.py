@@ -0,0 +1,342 @@
+# Post-process stage for Line Art SVG exports (export_gp_to_svg in 3d2svg.py, or mesh2svg.py).
+#
+# Grease Pencil exports write every stroke, often split into many short overlapping pieces, as
+# its own element with full-precision coordinates. For each group of straight-line strokes that
+# share a style (stroke, width, opacity, caps, transform) under the same parent, this script:
+#   - snaps points to a grid and rounds coordinates (--tolerance-px of an output pixel),
+#   - drops zero-length and duplicate segments (the overlapping strokes),
+#   - merges connected segments into polylines, walking through points where only two meet,
+#   - removes collinear points (Douglas-Peucker with the same tolerance),
+# and writes them back as one <path>. The tolerance is measured in output pixels: one SVG user unit
+# covers viewBox width / SS_OUTPUT_RES pixels, so a 512 px render and a 2048 px one are simplified
+# to the same visual accuracy. Curves, fills and other elements are kept as they are.
+#
+# Reports byte and node (point) counts before and after for every file.
+#
+# Usage:
+#   python svg_compact.py outputs                       # compact every .svg under outputs/ in place
+#   python svg_compact.py outputs/bench --out-dir outputs_min --report compact_report.json
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from mesh2svg import chain_edges
+
+SVG_NS = "http://www.w3.org/2000/svg"
+output_resolution = int(os.environ.get("SS_OUTPUT_RES", "512"))
+
+# Presentation attributes that must match for strokes to share one path
+STYLE_ATTRS = ("stroke", "stroke-width", "stroke-opacity", "stroke-linecap", "stroke-linejoin",
+               "stroke-dasharray", "opacity", "style", "class", "transform")
+LINE_TAGS = ("path", "polyline", "polygon", "line")
+PATH_TOKEN_RE = re.compile(r"[A-Za-z]|[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?")
+NUMBER_RE = re.compile(r"[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?")
+
+ET.register_namespace("", SVG_NS)
+
+
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_path(d):
+    """Polylines [(points, closed)] of a path made only of M/L/H/V/Z commands, else None."""
+    tokens = PATH_TOKEN_RE.findall(d or "")
+    polylines = []
+    points = []
+    x = y = 0.0
+    command = None
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.isalpha():
+            command = token
+            i += 1
+            if command in "Zz":
+                if points:
+                    polylines.append((points, True))
+                    x, y = points[0]
+                points = []
+                continue
+            if command not in "MmLlHhVv":
+                return None
+        if command is None:
+            return None
+        try:
+            if command in "MmLl":
+                dx, dy = float(tokens[i]), float(tokens[i + 1])
+                i += 2
+                x, y = (x + dx, y + dy) if command.islower() else (dx, dy)
+            elif command in "Hh":
+                x = x + float(tokens[i]) if command == "h" else float(tokens[i])
+                i += 1
+            else:
+                y = y + float(tokens[i]) if command == "v" else float(tokens[i])
+                i += 1
+        except (IndexError, ValueError):
+            return None
+        if command in "Mm":
+            if points:
+                polylines.append((points, False))
+            points = []
+            # Extra coordinate pairs after a moveto are implicit linetos
+            command = "l" if command == "m" else "L"
+        points.append((x, y))
+    if points:
+        polylines.append((points, False))
+    return polylines
+
+
+def fill_of(element, inherited):
+    """Effective fill of an element: its own attribute or style, else the inherited one."""
+    style = dict(part.split(":", 1) for part in element.get("style", "").split(";") if ":" in part)
+    fill = style.get("fill", element.get("fill"))
+    return inherited if fill is None else fill.strip()
+
+
+def element_polylines(element, fill):
+    """Polylines [(points, closed)] of a straight-line element, or None if it has curves/fills."""
+    tag = local_name(element.tag)
+    if tag != "line" and fill != "none":
+        return None
+    if tag == "path":
+        return parse_path(element.get("d"))
+    if tag in ("polyline", "polygon"):
+        values = [float(v) for v in NUMBER_RE.findall(element.get("points", ""))]
+        points = list(zip(values[0::2], values[1::2]))
+        return [(points, tag == "polygon")] if points else []
+    if tag == "line":
+        return [([(float(element.get("x1", 0)), float(element.get("y1", 0))),
+                  (float(element.get("x2", 0)), float(element.get("y2", 0)))], False)]
+    return None
+
+
+def user_units_per_pixel(root, resolution):
+    """Size of one output pixel in SVG user units, from the viewBox (or width) and the render size."""
+    view_box = [float(v) for v in NUMBER_RE.findall(root.get("viewBox", ""))]
+    if len(view_box) == 4 and view_box[2] > 0:
+        return view_box[2] / resolution
+    width = NUMBER_RE.match(root.get("width", ""))
+    if width:
+        return float(width.group()) / resolution
+    return 1.0
+
+
+def simplify_polyline(points, tolerance):
+    """Douglas-Peucker on an (N, 2) array: drop points within `tolerance` of the kept line."""
+    if len(points) <= 2:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        direction = end - start
+        length = math.hypot(*direction)
+        inner = points[first + 1:last] - start
+        if length > 0:
+            distances = np.abs(inner[:, 0] * direction[1] - inner[:, 1] * direction[0]) / length
+        else:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def merge_polylines(polylines, grid, tolerance):
+    """Snap, dedupe and chain segments; returns a list of (points (N, 2), closed)."""
+    segments = []
+    for points, closed in polylines:
+        pts = np.round(np.asarray(points, dtype=np.float64) / grid).astype(np.int64)
+        if closed:
+            pts = np.vstack([pts, pts[:1]])
+        segments.append(np.stack([pts[:-1], pts[1:]], axis=1))
+    if not segments:
+        return []
+    segments = np.concatenate(segments).reshape(-1, 2, 2)
+    segments = segments[np.any(segments[:, 0] != segments[:, 1], axis=1)]
+    if not len(segments):
+        return []
+
+    # Vertex ids for snapped points, then unique undirected edges
+    nodes, inverse = np.unique(segments.reshape(-1, 2), axis=0, return_inverse=True)
+    edges = np.unique(np.sort(inverse.reshape(-1, 2), axis=1), axis=0)
+    merged = []
+    for chain in chain_edges(edges):
+        closed = len(chain) > 2 and chain[0] == chain[-1]
+        points = simplify_polyline(nodes[chain] * grid, tolerance)
+        if closed:
+            points = points[:-1]
+            closed = len(points) > 2
+        merged.append((points, closed))
+    return merged
+
+
+def format_number(value, decimals):
+    text = f"{value:.{decimals}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def path_data(polylines, decimals):
+    """Compact absolute path data; points after the first L rely on implicit lineto."""
+    parts = []
+    for points, closed in polylines:
+        coords = [f"{format_number(x, decimals)},{format_number(y, decimals)}" for x, y in points]
+        parts.append("M" + coords[0] + ("L" + " ".join(coords[1:]) if len(coords) > 1 else "") + ("Z" if closed else ""))
+    return "".join(parts)
+
+
+def count_nodes(root):
+    """Points drawn by the straight-line elements of a document (curved paths count their numbers / 2)."""
+    nodes = 0
+    for element in root.iter():
+        tag = local_name(element.tag)
+        if tag == "path":
+            nodes += len(NUMBER_RE.findall(element.get("d", ""))) // 2
+        elif tag in ("polyline", "polygon"):
+            nodes += len(NUMBER_RE.findall(element.get("points", ""))) // 2
+        elif tag == "line":
+            nodes += 2
+    return nodes
+
+
+def compact_tree(root, tolerance_px, resolution):
+    """Rewrite the mergeable strokes of a parsed SVG in place."""
+    unit = user_units_per_pixel(root, resolution)
+    tolerance = tolerance_px * unit
+    grid = tolerance / 2
+    decimals = max(0, math.ceil(-math.log10(grid))) if grid < 1 else 0
+    # SVG's initial fill is black; groups usually set fill="none" for their strokes
+    fills = {root: fill_of(root, "black")}
+    for parent in list(root.iter()):
+        groups = {}
+        for child in list(parent):
+            fills[child] = fill_of(child, fills[parent])
+            if local_name(child.tag) not in LINE_TAGS:
+                continue
+            polylines = element_polylines(child, fills[child])
+            if polylines is None:
+                continue
+            key = tuple(child.get(name) for name in STYLE_ATTRS)
+            groups.setdefault(key, []).append((child, polylines))
+        for key, members in groups.items():
+            merged = merge_polylines([p for _, polylines in members for p in polylines], grid, tolerance)
+            first = members[0][0]
+            if merged:
+                parent.insert(list(parent).index(first), merged_path(first, key, merged, decimals))
+            for child, _ in members:
+                parent.remove(child)
+
+
+def merged_path(first, key, merged, decimals):
+    """The <path> replacing a group of strokes, styled like them."""
+    path = ET.Element(f"{{{SVG_NS}}}path")
+    path.set("d", path_data(merged, decimals))
+    path.set("fill", "none")
+    for name, value in zip(STYLE_ATTRS, key):
+        if value is not None:
+            path.set(name, value)
+    # Keep any other attributes (ids aside) the first stroke carried
+    for name, value in first.attrib.items():
+        if name not in path.attrib and name not in ("d", "points", "x1", "y1", "x2", "y2", "id"):
+            path.set(name, value)
+    return path
+
+
+def strip_whitespace(root):
+    for element in root.iter():
+        if element.text is not None and not element.text.strip():
+            element.text = None
+        if element.tail is not None and not element.tail.strip():
+            element.tail = None
+
+
+def compact_file(path, out_path, tolerance_px, resolution):
+    """Compact one SVG file; returns its report row."""
+    bytes_before = os.path.getsize(path)
+    tree = ET.parse(path)
+    root = tree.getroot()
+    nodes_before = count_nodes(root)
+    elements_before = sum(1 for _ in root.iter())
+    compact_tree(root, tolerance_px, resolution)
+    strip_whitespace(root)
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp = f"{out_path}.tmp"
+    tree.write(tmp, encoding="utf-8", xml_declaration=False, short_empty_elements=True)
+    os.replace(tmp, out_path)
+    return {
+        "file": path,
+        "output": out_path,
+        "bytes_before": bytes_before,
+        "bytes_after": os.path.getsize(out_path),
+        "nodes_before": nodes_before,
+        "nodes_after": count_nodes(root),
+        "elements_before": elements_before,
+        "elements_after": sum(1 for _ in root.iter()),
+    }
+
+
+def collect_svgs(paths):
+    """(path, base directory) for every .svg given directly or found under a directory."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found += [(p, path) for p in sorted(glob.glob(os.path.join(path, "**", "*.svg"), recursive=True))]
+        else:
+            found.append((path, os.path.dirname(path)))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge, simplify and round the strokes of Line Art SVG exports.")
+    parser.add_argument("paths", nargs="+", help="SVG files or directories (searched recursively)")
+    parser.add_argument("--out-dir", default=None, help="Write compacted copies here, mirroring the input layout (default: in place)")
+    parser.add_argument("--tolerance-px", type=float, default=0.5,
+                        help="Max deviation in output pixels for snapping and collinear removal (default: 0.5)")
+    parser.add_argument("--resolution", type=int, default=output_resolution,
+                        help=f"Output resolution the SVG viewBox maps to (default: SS_OUTPUT_RES={output_resolution})")
+    parser.add_argument("--report", default=None, help="Also write the per-file report as JSON")
+    args = parser.parse_args()
+
+    rows = []
+    for path, base in collect_svgs(args.paths):
+        out_path = os.path.join(args.out_dir, os.path.relpath(path, base)) if args.out_dir else path
+        try:
+            row = compact_file(path, out_path, args.tolerance_px, args.resolution)
+        except ET.ParseError as exc:
+            print(f"[svg_compact] Skipping {path}: {exc}")
+            continue
+        rows.append(row)
+        print(f"[svg_compact] {os.path.relpath(path, base)}: {row['bytes_before']:,} -> {row['bytes_after']:,} bytes, "
+              f"{row['nodes_before']:,} -> {row['nodes_after']:,} nodes, "
+              f"{row['elements_before']} -> {row['elements_after']} elements")
+
+    if rows:
+        before = sum(r["bytes_before"] for r in rows)
+        after = sum(r["bytes_after"] for r in rows)
+        nodes_before = sum(r["nodes_before"] for r in rows)
+        nodes_after = sum(r["nodes_after"] for r in rows)
+        print(f"[svg_compact] {len(rows)} files: {before:,} -> {after:,} bytes ({100 * (1 - after / max(before, 1)):.0f}% smaller), "
+              f"{nodes_before:,} -> {nodes_after:,} nodes ({100 * (1 - nodes_after / max(nodes_before, 1)):.0f}% fewer)")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"tolerance_px": args.tolerance_px, "resolution": args.resolution, "files": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
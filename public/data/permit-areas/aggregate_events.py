@@ -0,0 +1,278 @@
+# Build events_by_cemsid.json ({cemsid: {"a": average events per year, "t": total events}})
+# from Street Events downloads produced by all.sh.
+#
+# Input files (GeoJSON FeatureCollections, JSON arrays, newline-delimited JSON or CSV) are
+# streamed row by row, so memory stays proportional to the number of permit areas, not events.
+# Per-CEMSID per-year counts and the latest event date counted are kept in a state file; a later
+# run with a new download only counts events after that date and adds them to the stored
+# counts, so refreshing the stats never re-reads history.
+#
+# Dates are parsed (ISO timestamps from the API, MM/DD/YYYY [hh:mm:ss AM] from CSV exports) and
+# stored as ISO text; rows with dates in other formats are reported and skipped. Events dated
+# after --as-of (default: now) are scheduled, not held yet: they are left out and the watermark
+# never moves past the extract date, so a later download still counts them once they happened.
+#
+# Usage:
+#   python aggregate_events.py nyc_20250611_122007.geojson              # full build
+#   python aggregate_events.py nyc_2025-06-01_to_2025-09-01_*.geojson   # incremental update
+#   python aggregate_events.py --rebuild nyc_*.geojson                  # ignore the saved state
+import argparse
+import csv
+import json
+import os
+import re
+from datetime import datetime
+
+output_path = "../events_by_cemsid.json"
+state_path = "events_by_cemsid.state.json"
+
+STATE_VERSION = 1
+READ_CHUNK = 1 << 16
+# Socrata exports integer ids from numeric columns as e.g. "10023.0"
+TRAILING_ZERO_RE = re.compile(r"\.0+$")
+ISO_DATE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:[T ](\d{2}:\d{2}(?::\d{2})?))?")
+# Socrata CSV exports and the web UI
+US_DATE_FORMATS = ("%m/%d/%Y %I:%M:%S %p", "%m/%d/%Y %I:%M %p", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M", "%m/%d/%Y")
+
+
+def iter_json_values(f, skip_to=None):
+    """Yield the elements of the first JSON array in `f`, decoding one element at a time.
+
+    With `skip_to` (e.g. '"features"') the array following that key is used, which lets a
+    FeatureCollection be read without loading it whole.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    def fill():
+        nonlocal buffer, eof
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+    # Find the opening bracket of the array
+    pos = -1
+    while pos < 0:
+        fill()
+        start = 0
+        if skip_to:
+            key = buffer.find(skip_to)
+            if key < 0:
+                if eof:
+                    return
+                continue
+            start = key + len(skip_to)
+        pos = buffer.find("[", start)
+        if pos < 0 and eof:
+            return
+    buffer = buffer[pos + 1:]
+
+    while True:
+        stripped = buffer.lstrip(" \t\r\n,")
+        if stripped.startswith("]"):
+            return
+        try:
+            value, end = decoder.raw_decode(stripped)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            buffer = stripped
+            fill()
+            continue
+        yield value
+        buffer = stripped[end:]
+
+
+def iter_event_rows(path):
+    """Yield one dict of event attributes per row of a GeoJSON, JSON, NDJSON or CSV file."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, newline="" if ext == ".csv" else None, encoding="utf-8") as f:
+        if ext == ".csv":
+            yield from csv.DictReader(f)
+            return
+        if ext in (".ndjson", ".jsonl"):
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield row.get("properties", row)
+            return
+        head = f.read(READ_CHUNK)
+        f.seek(0)
+        # all.sh may leave either a FeatureCollection or a merged array of features/rows
+        skip_to = '"features"' if '"features"' in head else None
+        for row in iter_json_values(f, skip_to):
+            if isinstance(row, dict):
+                yield row.get("properties", row) or {}
+
+
+def normalize_cemsid(value):
+    if value is None:
+        return None
+    value = TRAILING_ZERO_RE.sub("", str(value).strip())
+    return value or None
+
+
+def field_lookup(row, name):
+    """Case-insensitive column access (Socrata GeoJSON keys are lowercase, CSV headers are not)."""
+    if name in row:
+        return row[name]
+    lowered = name.lower()
+    for key, value in row.items():
+        if key.lower() == lowered:
+            return value
+    return None
+
+
+def parse_event_date(value):
+    """Normalize an event timestamp to "YYYY-MM-DDTHH:MM:SS", or None if the format is unknown.
+
+    Socrata floating timestamps ("2025-06-11T08:00:00.000") keep their wall-clock time; any
+    fractional seconds or offset are dropped.
+    """
+    text = str(value).strip()
+    try:
+        iso = ISO_DATE_RE.match(text)
+        if iso:
+            return datetime.fromisoformat(f"{iso.group(1)}T{iso.group(2) or '00:00'}").isoformat()
+        for fmt in US_DATE_FORMATS:
+            try:
+                return datetime.strptime(text, fmt).isoformat()
+            except ValueError:
+                continue
+    except ValueError:
+        pass
+    return None
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("version") != STATE_VERSION:
+        print(f"Ignoring state file {path} with unsupported version {state.get('version')}")
+        return None
+    # Earlier runs stored the raw text of the dates
+    for key in ("first", "through"):
+        if state.get(key):
+            state[key] = parse_event_date(state[key]) or state[key]
+    return state
+
+
+def save_state(path, state):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp, path)
+
+
+def accumulate(paths, state, id_field, date_field, as_of):
+    """Add events from `paths` dated after state["through"] and up to `as_of` into state["counts"].
+
+    Dates are normalized by parse_event_date and compared as ISO strings. Returns a dict of
+    row counts: read, counted, scheduled (after as_of) and bad_date (unrecognized format).
+    """
+    counts = state["counts"]
+    watermark = state.get("through")
+    newest = watermark
+    oldest = state.get("first")
+    rows = counted = scheduled = bad_dates = 0
+    for path in paths:
+        for row in iter_event_rows(path):
+            rows += 1
+            raw_date = field_lookup(row, date_field)
+            cemsid = normalize_cemsid(field_lookup(row, id_field))
+            if not raw_date or cemsid is None:
+                continue
+            date = parse_event_date(raw_date)
+            if date is None:
+                bad_dates += 1
+                if bad_dates <= 5:
+                    print(f"Skipping row with unrecognized {date_field} {raw_date!r}")
+                continue
+            if date > as_of:
+                scheduled += 1
+                continue
+            if watermark is not None and date <= watermark:
+                continue
+            year = date[:4]
+            per_year = counts.setdefault(cemsid, {})
+            per_year[year] = per_year.get(year, 0) + 1
+            counted += 1
+            if newest is None or date > newest:
+                newest = date
+            if oldest is None or date < oldest:
+                oldest = date
+        print(f"Read {path}: {rows} rows so far, {counted} new events")
+    state["through"] = newest
+    state["first"] = oldest
+    return {"read": rows, "counted": counted, "scheduled": scheduled, "bad_date": bad_dates}
+
+
+def summarize(state, years=None):
+    """Return {cemsid: {"a": events per year, "t": total events}} from the stored counts.
+
+    The average divides by the number of calendar years covered by the data (first through
+    latest event) unless `years` is given, so areas without events in some year still get a
+    comparable per-year rate.
+    """
+    if years is None:
+        if not state.get("first") or not state.get("through"):
+            years = 1
+        else:
+            years = int(state["through"][:4]) - int(state["first"][:4]) + 1
+    years = max(years, 1)
+    stats = {}
+    for cemsid, per_year in state["counts"].items():
+        total = sum(per_year.values())
+        stats[cemsid] = {"a": round(total / years, 1), "t": total}
+    return dict(sorted(stats.items())), years
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate Street Events downloads into per-CEMSID event stats.")
+    parser.add_argument("inputs", nargs="+", help="Event downloads (.geojson, .json, .ndjson or .csv)")
+    parser.add_argument("--output", default=output_path, help=f"Stats JSON for the app (default: {output_path})")
+    parser.add_argument("--state", default=state_path, help=f"Incremental state file (default: {state_path})")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the existing state and recount from the inputs")
+    parser.add_argument("--id-field", default="cemsid", help="Column holding the permit area id (default: cemsid)")
+    parser.add_argument("--date-field", default="start_date_time",
+                        help="Event date column used for the year and the incremental watermark (default: start_date_time)")
+    parser.add_argument("--years", type=int, default=None,
+                        help="Divide totals by this many years instead of the span covered by the data")
+    parser.add_argument("--as-of", default=None,
+                        help="Extract date: later (scheduled) events are left for a future run (default: now)")
+    args = parser.parse_args()
+
+    as_of = parse_event_date(args.as_of) if args.as_of else datetime.now().replace(microsecond=0).isoformat()
+    if as_of is None:
+        parser.error(f"--as-of: unrecognized date {args.as_of!r}")
+
+    state = None if args.rebuild else load_state(args.state)
+    if state is None:
+        state = {"version": STATE_VERSION, "id_field": args.id_field, "date_field": args.date_field,
+                 "first": None, "through": None, "counts": {}}
+    else:
+        print(f"Resuming from {args.state}: {len(state['counts'])} areas, events through {state['through']}")
+        if state["through"] and state["through"] > as_of:
+            print(f"Warning: the saved watermark {state['through']} is after {as_of} (scheduled events were "
+                  "counted by an older version); use --rebuild to recount")
+
+    tally = accumulate(args.inputs, state, args.id_field, args.date_field, as_of)
+    save_state(args.state, state)
+
+    stats, years = summarize(state, args.years)
+    tmp = f"{args.output}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(stats, f, separators=(",", ":"))
+    os.replace(tmp, args.output)
+    print(f"Counted {tally['counted']} of {tally['read']} rows ({tally['scheduled']} scheduled after {as_of}, "
+          f"{tally['bad_date']} with unrecognized dates); {len(stats)} areas over {years} year(s), "
+          f"events {state['first']} to {state['through']}")
+    print(f"Event stats saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,245 @@
+import argparse
+import json
+import os
+import struct
+import sys
+
 import geopandas as gpd
+import numpy as np
+import shapely
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../processing"))
+from geojson_stream import COMPRESSIONS, DEFAULT_PRECISION, write_geojson  # noqa: E402
 
 # Path to your original GeoJSON file
 input_path = "nyc_20250611_122007.geojson"
 # Path for the minified output
 output_path = "nyc-permit-areas-minified.geojson"
 
-# Read the original GeoJSON
-gdf = gpd.read_file(input_path)
+# Levels of detail written next to the full-resolution output as <output>.<name>.geojson:
+# (name, simplify tolerance in degrees, coordinate decimals). ~0.0001 deg is ~10 m in NYC.
+LEVELS_OF_DETAIL = [
+    ("z10", 0.0005, 5),
+    ("z13", 0.0001, 6),
+]
+# Spatial index written next to the full-resolution output (see write_spatial_index)
+INDEX_NODE_SIZE = 16
+# flatbush header: magic byte, (format version << 4) | array type (8 = Float64Array)
+FLATBUSH_MAGIC = 0xFB
+FLATBUSH_VERSION = 3
+FLATBUSH_FLOAT64 = 8
+# Grid (degrees, ~1 cm) used to snap nearly-coincident shared vertices before simplifying
+SNAP_GRID = 1e-7
+
+
+def load_permit_areas(path):
+    # Read the original GeoJSON
+    gdf = gpd.read_file(path)
+
+    # Keep only the desired columns (if they exist)
+    columns_to_keep = ["system", "cemsid", "name", "propertyname", "subpropertyname", "geometry"]
+    gdf = gdf[[col for col in columns_to_keep if col in gdf.columns]]
+    # rename 'cemsid' to 'CEMSID'
+    gdf = gdf.rename(columns={"cemsid": "CEMSID"})
+    return gpd.GeoDataFrame(gdf, geometry="geometry")
+
+
+def hilbert_values(x, y):
+    """Hilbert curve index of 16-bit integer coordinates (same bit twiddling as flatbush)."""
+    x = np.asarray(x, dtype=np.uint32)
+    y = np.asarray(y, dtype=np.uint32)
+    a = x ^ y
+    b = 0xFFFF ^ a
+    c = 0xFFFF ^ (x | y)
+    d = x & (y ^ 0xFFFF)
+    A = a | (b >> 1)
+    B = (a >> 1) ^ a
+    C = ((c >> 1) ^ (b & (d >> 1))) ^ c
+    D = ((a & (c >> 1)) ^ (d >> 1)) ^ d
+    a, b, c, d = A, B, C, D
+    A = (a & (a >> 2)) ^ (b & (b >> 2))
+    B = (a & (b >> 2)) ^ (b & ((a ^ b) >> 2))
+    C = C ^ ((a & (c >> 2)) ^ (b & (d >> 2)))
+    D = D ^ ((b & (c >> 2)) ^ ((a ^ b) & (d >> 2)))
+    a, b, c, d = A, B, C, D
+    A = (a & (a >> 4)) ^ (b & (b >> 4))
+    B = (a & (b >> 4)) ^ (b & ((a ^ b) >> 4))
+    C = C ^ ((a & (c >> 4)) ^ (b & (d >> 4)))
+    D = D ^ ((b & (c >> 4)) ^ ((a ^ b) & (d >> 4)))
+    a, b, c, d = A, B, C, D
+    C = C ^ ((a & (c >> 8)) ^ (b & (d >> 8)))
+    D = D ^ ((b & (c >> 8)) ^ ((a ^ b) & (d >> 8)))
+    a = C ^ (C >> 1)
+    b = D ^ (D >> 1)
+    i0 = x ^ y
+    i1 = b | (0xFFFF ^ (i0 | a))
+
+    def interleave(v):
+        v = (v | (v << 8)) & 0x00FF00FF
+        v = (v | (v << 4)) & 0x0F0F0F0F
+        v = (v | (v << 2)) & 0x33333333
+        return (v | (v << 1)) & 0x55555555
+
+    return (interleave(i1) << 1) | interleave(i0)
+
+
+def hilbert_order(gdf):
+    """Sort features along a Hilbert curve through their bounding-box centers.
+
+    Writing features in this order makes feature i the i-th leaf of the packed index, and
+    keeps nearby areas close together in the file.
+    """
+    bounds = gdf.geometry.bounds.to_numpy()
+    minx, miny = np.nanmin(bounds[:, 0]), np.nanmin(bounds[:, 1])
+    width = (np.nanmax(bounds[:, 2]) - minx) or 1.0
+    height = (np.nanmax(bounds[:, 3]) - miny) or 1.0
+    hilbert_max = (1 << 16) - 1
+    cx = np.nan_to_num((bounds[:, 0] + bounds[:, 2]) / 2 - minx)
+    cy = np.nan_to_num((bounds[:, 1] + bounds[:, 3]) / 2 - miny)
+    values = hilbert_values(np.floor(hilbert_max * cx / width), np.floor(hilbert_max * cy / height))
+    return gdf.iloc[np.argsort(values, kind="stable")].reset_index(drop=True)
+
+
+def build_packed_rtree(bounds, node_size=INDEX_NODE_SIZE):
+    """Pack (N, 4) [minx, miny, maxx, maxy] boxes, already in Hilbert order, into a flatbush buffer.
+
+    The layout matches flatbush 4 (Flatbush.from(buffer) in the browser): an 8-byte header,
+    Float64 boxes for every node level bottom-up, then Uint16/Uint32 indices. Leaf indices are
+    the positions of the features in the file; parent indices point at their first child box.
+    """
+    num_items = len(bounds)
+    if num_items == 0:
+        raise ValueError("cannot index an empty layer")
+    node_size = min(max(node_size, 2), 65535)
+
+    level_bounds = [num_items * 4]
+    n = num_items
+    num_nodes = n
+    while True:
+        n = -(-n // node_size)
+        num_nodes += n
+        level_bounds.append(num_nodes * 4)
+        if n == 1:
+            break
+
+    boxes = np.empty(num_nodes * 4, dtype="<f8")
+    indices = np.empty(num_nodes, dtype="<u2" if num_nodes < 16384 else "<u4")
+    boxes[:num_items * 4] = np.asarray(bounds, dtype=np.float64).ravel()
+    indices[:num_items] = np.arange(num_items)
+
+    pos = num_items * 4
+    if num_items <= node_size:
+        # A single node: flatbush only stores the root box
+        leaves = boxes[:pos].reshape(-1, 4)
+        boxes[pos:pos + 4] = [leaves[:, 0].min(), leaves[:, 1].min(), leaves[:, 2].max(), leaves[:, 3].max()]
+        indices[pos >> 2] = 0
+    else:
+        start = 0
+        for end in level_bounds[:-1]:
+            level = boxes[start:end].reshape(-1, 4)
+            for first in range(0, len(level), node_size):
+                children = level[first:first + node_size]
+                indices[pos >> 2] = start + first * 4
+                boxes[pos:pos + 4] = [children[:, 0].min(), children[:, 1].min(),
+                                      children[:, 2].max(), children[:, 3].max()]
+                pos += 4
+            start = end
+
+    header = struct.pack("<BBHI", FLATBUSH_MAGIC, (FLATBUSH_VERSION << 4) + FLATBUSH_FLOAT64, node_size, num_items)
+    return header + boxes.tobytes() + indices.tobytes()
+
+
+def write_spatial_index(gdf, path, node_size=INDEX_NODE_SIZE):
+    """Write <path>.index.bin (flatbush buffer) and <path>.index.json (CEMSID per leaf).
+
+    gdf must already be in Hilbert order and written to `path` in that order, so leaf i of
+    the index is feature i of the GeoJSON and ids[i] is its CEMSID.
+    """
+    root, _ = os.path.splitext(path)
+    bounds = gdf.geometry.bounds.to_numpy(copy=True)
+    # Empty geometries get an inverted box so no query ever matches them
+    bounds[np.isnan(bounds).any(axis=1)] = [np.inf, np.inf, -np.inf, -np.inf]
+    buffer = build_packed_rtree(bounds, node_size)
+    with open(f"{root}.index.bin", "wb") as f:
+        f.write(buffer)
+    ids = gdf["CEMSID"].tolist() if "CEMSID" in gdf.columns else list(range(len(gdf)))
+    meta = {"version": 1, "format": "flatbush", "nodeSize": node_size, "numItems": len(gdf),
+            "source": os.path.basename(path), "bbox": [round(v, 7) for v in gdf.total_bounds], "ids": ids}
+    with open(f"{root}.index.json", "w") as f:
+        json.dump(meta, f, separators=(",", ":"))
+    return len(buffer)
+
+
+def simplify_shared_edges(geoms, tolerance):
+    """Simplify polygons so that neighbouring areas keep identical shared edges.
+
+    Uses GEOS coverage simplification when the areas form a valid coverage (no overlaps).
+    Otherwise each polygon is simplified on its own with topology preserved, which avoids
+    self-intersections but may open slivers between neighbours.
+    Returns (simplified geometries, mode name).
+    """
+    # Shared vertices often differ in the last digits after a GeoJSON round trip; snap them
+    # together first so neighbours are recognised as a coverage.
+    values = shapely.set_precision(geoms.values, SNAP_GRID)
+    if hasattr(shapely, "coverage_simplify"):
+        try:
+            if not hasattr(shapely, "coverage_is_valid") or shapely.coverage_is_valid(values):
+                return gpd.GeoSeries(shapely.coverage_simplify(values, tolerance), index=geoms.index, crs=geoms.crs), "coverage"
+        except shapely.errors.GEOSException:
+            pass
+    return geoms.simplify(tolerance=tolerance, preserve_topology=True), "per-feature"
+
+
+def quantize(geoms, decimals):
+    """Snap coordinates to a 10^-decimals degree grid, keeping polygons valid."""
+    return gpd.GeoSeries(shapely.set_precision(geoms.values, 10.0 ** -decimals), index=geoms.index, crs=geoms.crs)
+
+
+def count_vertices(geoms):
+    return int(shapely.get_num_coordinates(geoms.values).sum())
+
+
+def lod_path(path, name):
+    root, ext = os.path.splitext(path)
+    return f"{root}.{name}{ext}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minify permit areas and build simplified levels of detail.")
+    parser.add_argument("--input", default=input_path, help=f"Source permit areas GeoJSON (default: {input_path})")
+    parser.add_argument("--output", default=output_path, help=f"Full-resolution minified output (default: {output_path})")
+    parser.add_argument("--no-lod", action="store_true", help="Only write the full-resolution minified file")
+    parser.add_argument("--no-index", action="store_true", help="Skip the packed spatial index")
+    parser.add_argument("--compress", default="", help="Also write pre-compressed copies: gzip, br (comma-separated)")
+    args = parser.parse_args()
+    compress = tuple(c.strip() for c in args.compress.split(",") if c.strip())
+    if set(compress) - set(COMPRESSIONS):
+        parser.error(f"--compress accepts: {', '.join(COMPRESSIONS)}")
 
-# Keep only the desired columns (if they exist)
-columns_to_keep = ["system","cemsid", "name", "propertyname", "subpropertyname", "geometry"]
-gdf = gdf[[col for col in columns_to_keep if col in gdf.columns]]
-# rename 'cemsid' to 'CEMSID'
-gdf = gdf.rename(columns={"cemsid": "CEMSID"})
+    # Every output keeps the same Hilbert order, matching the packed spatial index
+    gdf = hilbert_order(load_permit_areas(args.input))
 
-# Simplify geometry (tolerance in degrees, adjust as needed)
-# 0.0002 is a good starting point for city-scale data
-#gdf["geometry"] = gdf["geometry"].simplify(tolerance=0.0002, preserve_topology=True)
+    # Save to new GeoJSON
+    full_vertices = count_vertices(gdf.geometry)
+    full_bytes = write_geojson(gdf, args.output, DEFAULT_PRECISION, compress=compress)["bytes"]
+    print(f"Minified GeoJSON saved to {args.output}")
+    if not args.no_index:
+        index_bytes = write_spatial_index(gdf, args.output)
+        print(f"Spatial index for {len(gdf)} areas saved to {os.path.splitext(args.output)[0]}.index.bin ({index_bytes} bytes)")
+    print(f"{'level':<8}{'tolerance':>11}{'vertices':>11}{'reduction':>11}{'bytes':>12}{'reduction':>11}  mode")
+    print(f"{'full':<8}{'-':>11}{full_vertices:>11}{'-':>11}{full_bytes:>12}{'-':>11}")
+    if args.no_lod:
+        return
 
-gdf = gpd.GeoDataFrame(gdf, geometry="geometry")
+    for name, tolerance, decimals in LEVELS_OF_DETAIL:
+        simplified, mode = simplify_shared_edges(gdf.geometry, tolerance)
+        lod = gdf.set_geometry(quantize(simplified, decimals))
+        lod = lod[~lod.geometry.is_empty]
+        vertices = count_vertices(lod.geometry)
+        size = write_geojson(lod, lod_path(args.output, name), decimals, compress=compress)["bytes"]
+        print(f"{name:<8}{tolerance:>11}{vertices:>11}{1 - vertices / max(full_vertices, 1):>11.1%}"
+              f"{size:>12}{1 - size / max(full_bytes, 1):>11.1%}  {mode}")
 
-# Save to new GeoJSON
-gdf.to_file(output_path, driver="GeoJSON")
 
-print(f"Minified GeoJSON saved to {output_path}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# Resumable, concurrent replacement for all.sh: page through a Socrata dataset and merge the
+# pages into one GeoJSON (or JSON) file.
+#
+# Pages ($limit/$offset, ordered by :id so pages are stable) are fetched by an asyncio pool of
+# at most --jobs requests at a time, retried with exponential backoff on network errors, 429
+# and 5xx responses. Every finished page is written to a checkpoint directory, so an
+# interrupted run picks up where it stopped. The output is streamed together page by page
+# without holding the whole dataset in memory; the checkpoint is removed after a full merge.
+#
+# Only the standard library is used: requests run in worker threads via urllib.
+# --base-url points the downloader at any Socrata-compatible endpoint, e.g. the local stub server
+# in test_socrata_download.py.
+#
+# Usage:
+#   python socrata_download.py                                   # everything, like all.sh
+#   python socrata_download.py --start-date 2024-01-01 --end-date 2024-12-31 --jobs 6
+import argparse
+import asyncio
+import hashlib
+import http.client
+import json
+import os
+import random
+import shutil
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+BASE_URL = "https://data.cityofnewyork.us/resource/c5vm-g2dk.geojson"
+LIMIT = 50000  # Socrata supports up to 50k records per request
+CHECKPOINT_ROOT = ".socrata_parts"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Resource suffixes Socrata uses to pick the export format
+EXPORT_SUFFIXES = {".json", ".geojson", ".csv"}
+
+
+def build_where(start_date=None, end_date=None):
+    """SoQL date filter with the same semantics as all.sh."""
+    parts = []
+    if start_date:
+        parts.append(f"start_date_time >= '{start_date}'")
+    if end_date:
+        parts.append(f"end_date_time <= '{end_date}'")
+    return " AND ".join(parts)
+
+
+def output_name(start_date=None, end_date=None):
+    """all.sh naming: nyc[_from_<start>][_to_<end>]_<timestamp>.geojson"""
+    suffix = ""
+    if start_date:
+        suffix += f"_from_{start_date}"
+    if end_date:
+        suffix += f"_to_{end_date}"
+    return f"nyc{suffix}_{time.strftime('%Y%m%d_%H%M%S')}.geojson"
+
+
+def page_url(base_url, limit, offset, where):
+    params = {"$limit": limit, "$offset": offset, "$order": ":id"}
+    if where:
+        params["$where"] = where
+    return f"{base_url}?{urllib.parse.urlencode(params)}"
+
+
+def count_url(base_url, where):
+    """Count query for the dataset: the same resource path with its export suffix, if any, set to .json."""
+    # Aggregates come back as a plain JSON row list, whatever the export format
+    parts = urllib.parse.urlsplit(base_url)
+    head, _, name = parts.path.rpartition("/")
+    stem, ext = os.path.splitext(name)
+    if ext.lower() in EXPORT_SUFFIXES:
+        name = f"{stem}.json"
+    params = urllib.parse.parse_qsl(parts.query) + [("$select", "count(*)")]
+    if where:
+        params.append(("$where", where))
+    return urllib.parse.urlunsplit(parts._replace(path=f"{head}/{name}", query=urllib.parse.urlencode(params)))
+
+
+def http_get(url, app_token=None, timeout=120):
+    """Blocking GET returning the body; raises urllib errors to the retry loop."""
+    request = urllib.request.Request(url, headers={"Accept": "application/json"})
+    if app_token:
+        request.add_header("X-App-Token", app_token)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+
+async def fetch_with_retry(url, semaphore, args, parse=json.loads):
+    """GET `url` in a worker thread and return `parse(body)`, holding one pool slot.
+
+    Network errors, retryable HTTP statuses and bodies that fail to parse (e.g. a page cut off
+    mid-transfer) are retried with exponential backoff and jitter.
+    """
+    delay = args.backoff
+    for attempt in range(1, args.retries + 2):
+        async with semaphore:
+            try:
+                body = await asyncio.to_thread(http_get, url, args.app_token, args.timeout)
+                return parse(body)
+            except urllib.error.HTTPError as exc:
+                if exc.code not in RETRY_STATUSES or attempt > args.retries:
+                    raise
+                retry_after = exc.headers.get("Retry-After") if exc.headers else None
+                wait = float(retry_after) if retry_after and retry_after.isdigit() else delay
+                reason = f"HTTP {exc.code}"
+            except (urllib.error.URLError, http.client.HTTPException, TimeoutError, ConnectionError) as exc:
+                if attempt > args.retries:
+                    raise
+                wait = delay
+                reason = str(exc)
+            except ValueError as exc:
+                # json.JSONDecodeError and UnicodeDecodeError are ValueErrors
+                if attempt > args.retries:
+                    raise
+                wait = delay
+                reason = f"unreadable response ({exc})"
+        print(f"[retry] {reason}; attempt {attempt}/{args.retries}, waiting {wait:.1f}s")
+        await asyncio.sleep(wait + random.uniform(0, wait / 4))
+        delay = min(delay * 2, 60)
+
+
+def page_records(body):
+    """Records of one page: GeoJSON features or plain JSON rows."""
+    data = json.loads(body)
+    if isinstance(data, dict):
+        if "features" not in data:
+            raise ValueError(f"expected a FeatureCollection, got keys {sorted(data)[:5]}")
+        return data.get("features") or [], "geojson"
+    return data, "json"
+
+
+def checkpoint_dir(args, where):
+    key = hashlib.sha256(json.dumps([args.base_url, where, args.limit]).encode()).hexdigest()[:16]
+    return os.path.join(args.checkpoint_dir, key)
+
+
+def page_path(parts_dir, page):
+    return os.path.join(parts_dir, f"page_{page:06d}.json")
+
+
+def write_page(parts_dir, page, records, kind):
+    tmp = page_path(parts_dir, page) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"kind": kind, "records": records}, f, separators=(",", ":"))
+    os.replace(tmp, page_path(parts_dir, page))
+
+
+async def download_page(page, semaphore, args, where, parts_dir):
+    """Fetch one page into the checkpoint unless it is already there; returns its record count."""
+    path = page_path(parts_dir, page)
+    if os.path.exists(path):
+        with open(path) as f:
+            return len(json.load(f)["records"])
+    records, kind = await fetch_with_retry(page_url(args.base_url, args.limit, page * args.limit, where),
+                                           semaphore, args, parse=page_records)
+    write_page(parts_dir, page, records, kind)
+    print(f"Page {page + 1}: {len(records)} records")
+    return len(records)
+
+
+async def download_pages(args, where, parts_dir):
+    """Download all pages into parts_dir and return the number of pages holding records."""
+    semaphore = asyncio.Semaphore(max(1, args.jobs))
+    total = None
+    try:
+        rows = await fetch_with_retry(count_url(args.base_url, where), semaphore, args)
+        total = int(rows[0]["count"])
+        print(f"Found total count: {total}")
+    except (urllib.error.URLError, ValueError, KeyError, IndexError, TypeError) as exc:
+        print(f"Count request failed ({exc}); paging until an empty page")
+
+    if total is not None:
+        num_pages = max(1, -(-total // args.limit))
+        counts = await asyncio.gather(*(download_page(p, semaphore, args, where, parts_dir) for p in range(num_pages)))
+        # The dataset may have grown since the count; keep paging while the last page is full
+        page = num_pages
+        while counts and counts[-1] == args.limit:
+            counts.append(await download_page(page, semaphore, args, where, parts_dir))
+            page += 1
+    else:
+        counts = []
+        page = 0
+        # Without a count, fetch a window of pages at a time until one comes back short
+        while not counts or counts[-1] == args.limit:
+            window = range(page, page + max(1, args.jobs))
+            for count in await asyncio.gather(*(download_page(p, semaphore, args, where, parts_dir) for p in window)):
+                counts.append(count)
+                if count < args.limit:
+                    break
+            page += len(window)
+    return len([c for c in counts if c]), sum(counts)
+
+
+def merge_pages(parts_dir, num_pages, output_path):
+    """Stream the checkpointed pages into one FeatureCollection (or JSON array) in page order."""
+    tmp = output_path + ".tmp"
+    total = 0
+    with open(tmp, "w") as out:
+        kind = None
+        first = True
+        for page in range(num_pages):
+            with open(page_path(parts_dir, page)) as f:
+                part = json.load(f)
+            if kind is None:
+                kind = part["kind"]
+                out.write('{"type":"FeatureCollection","features":[' if kind == "geojson" else "[")
+            for record in part["records"]:
+                if not first:
+                    out.write(",\n")
+                out.write(json.dumps(record, separators=(",", ":")))
+                first = False
+                total += 1
+        if kind is None:
+            out.write('{"type":"FeatureCollection","features":[')
+            kind = "geojson"
+        out.write("]}\n" if kind == "geojson" else "]\n")
+    os.replace(tmp, output_path)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download a Socrata dataset with concurrent, resumable paging.")
+    parser.add_argument("-s", "--start-date", help="Events starting on or after this date (YYYY-MM-DD)")
+    parser.add_argument("-e", "--end-date", help="Events ending on or before this date (YYYY-MM-DD)")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Concurrent page requests (default: 4)")
+    parser.add_argument("--base-url", default=BASE_URL, help=f"Dataset endpoint (default: {BASE_URL})")
+    parser.add_argument("--limit", type=int, default=LIMIT, help=f"Records per page (default: {LIMIT})")
+    parser.add_argument("--output", default=None, help="Output file (default: all.sh naming in the current directory)")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_ROOT, help=f"Where finished pages are kept (default: {CHECKPOINT_ROOT})")
+    parser.add_argument("--keep-parts", action="store_true", help="Keep the page checkpoint after merging")
+    parser.add_argument("--retries", type=int, default=5, help="Retries per request (default: 5)")
+    parser.add_argument("--backoff", type=float, default=1.0, help="First retry delay in seconds, doubled each retry")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--app-token", default=os.environ.get("SOCRATA_APP_TOKEN"), help="Socrata app token (env SOCRATA_APP_TOKEN)")
+    args = parser.parse_args()
+
+    where = build_where(args.start_date, args.end_date)
+    parts_dir = checkpoint_dir(args, where)
+    os.makedirs(parts_dir, exist_ok=True)
+    done = len([n for n in os.listdir(parts_dir) if n.endswith(".json")])
+    if done:
+        print(f"Resuming: {done} page(s) already downloaded in {parts_dir}")
+
+    start = time.perf_counter()
+    num_pages, total = asyncio.run(download_pages(args, where, parts_dir))
+    output_path = args.output or output_name(args.start_date, args.end_date)
+    merged = merge_pages(parts_dir, num_pages, output_path)
+    if not args.keep_parts:
+        shutil.rmtree(parts_dir)
+    print(f"Final output contains {merged} records ({num_pages} pages) in {output_path} "
+          f"after {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
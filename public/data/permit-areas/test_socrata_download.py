@@ -0,0 +1,145 @@
+# Tests for socrata_download.py against a local stub Socrata server (standard library only).
+#
+# Run: python -m unittest test_socrata_download   (or pytest) from public/data/permit-areas
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import socrata_download
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "socrata_download.py")
+RECORDS = 23
+LIMIT = 5
+
+
+class StubSocrata(BaseHTTPRequestHandler):
+    """Serves RECORDS GeoJSON features under /resource/events.geojson with $limit/$offset paging.
+
+    server.faults maps an offset to a list of faults served, one per request, before the real page:
+    "429" (with Retry-After: 0), "500", "truncated" (cut-off JSON body).
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status, body, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        with self.server.lock:
+            self.server.requests.append((url.path, params))
+        if params.get("$select") == "count(*)":
+            if url.path != "/resource/events.json":
+                self.send_body(404, b"{}")
+                return
+            self.send_body(200, json.dumps([{"count": str(RECORDS)}]).encode())
+            return
+
+        offset = int(params["$offset"])
+        with self.server.lock:
+            faults = self.server.faults.get(offset) or []
+            fault = faults.pop(0) if faults else None
+        if fault == "429":
+            self.send_body(429, b"slow down", [("Retry-After", "0")])
+            return
+        if fault == "500":
+            self.send_body(500, b"oops")
+            return
+        features = [{"type": "Feature", "properties": {"event_id": i}, "geometry": None}
+                    for i in range(offset, min(offset + int(params["$limit"]), RECORDS))]
+        body = json.dumps({"type": "FeatureCollection", "features": features}).encode()
+        if fault == "truncated":
+            body = body[:len(body) // 2]
+        self.send_body(200, body)
+
+
+class SocrataDownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubSocrata)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.faults = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/resource/events.geojson"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "out.geojson")
+        self.parts = os.path.join(self.tmp.name, "parts")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def download(self, *extra):
+        cmd = [sys.executable, SCRIPT, "--base-url", self.base_url, "--limit", str(LIMIT), "--jobs", "3",
+               "--output", self.output, "--checkpoint-dir", self.parts, "--backoff", "0.01", *extra]
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+
+    def event_ids(self):
+        with open(self.output) as f:
+            return [feature["properties"]["event_id"] for feature in json.load(f)["features"]]
+
+    def page_offsets(self):
+        return sorted(int(p["$offset"]) for _, p in self.server.requests if "$offset" in p)
+
+    def test_pages_are_merged_in_order(self):
+        result = self.download()
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertEqual(self.event_ids(), list(range(RECORDS)))
+        self.assertEqual(self.page_offsets(), [0, 5, 10, 15, 20])
+        self.assertFalse(os.listdir(self.parts), "checkpoint should be removed after a full merge")
+
+    def test_retries_429_with_retry_after_and_truncated_pages(self):
+        self.server.faults = {5: ["429"], 10: ["truncated", "500"]}
+        result = self.download()
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertEqual(self.event_ids(), list(range(RECORDS)))
+        self.assertIn("HTTP 429", result.stdout)
+        self.assertIn("unreadable response", result.stdout)
+        self.assertEqual(self.page_offsets().count(10), 3)
+
+    def test_resumes_from_checkpoint(self):
+        # First run: one page keeps failing, the others are checkpointed
+        self.server.faults = {15: ["500"] * 10}
+        result = self.download("--retries", "1")
+        self.assertNotEqual(result.returncode, 0)
+        first = set(self.page_offsets())
+
+        self.server.requests.clear()
+        self.server.faults = {}
+        result = self.download()
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertIn("Resuming", result.stdout)
+        self.assertEqual(self.event_ids(), list(range(RECORDS)))
+        # Only the page that never completed is fetched again
+        self.assertEqual(self.page_offsets(), [15])
+        self.assertLessEqual({0, 5, 10, 20}, first)
+
+
+class CountUrlTest(unittest.TestCase):
+    def test_export_suffix_is_replaced(self):
+        url = socrata_download.count_url("https://data.cityofnewyork.us/resource/c5vm-g2dk.geojson", "")
+        self.assertTrue(url.startswith("https://data.cityofnewyork.us/resource/c5vm-g2dk.json?"))
+
+    def test_url_without_suffix_keeps_its_path(self):
+        for base in ("http://127.0.0.1:8000/resource/x", "https://data.example.org/resource/abcd-1234"):
+            parts = urllib.parse.urlsplit(socrata_download.count_url(base, "a > 1"))
+            self.assertEqual(parts.netloc + parts.path, urllib.parse.urlsplit(base).netloc + urllib.parse.urlsplit(base).path)
+            self.assertEqual(dict(urllib.parse.parse_qsl(parts.query)), {"$select": "count(*)", "$where": "a > 1"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,56 +1,337 @@
-# %%
-import geopandas as gpd 
-import pandas as pd 
-from glob import glob 
+# Build bus_stops_nyc.geojson from the MTA bus GTFS feeds: every stop with the list of routes serving it.
+#
+# stop_times.txt is streamed in chunks (trip_id/stop_id only) and mapped to routes through a
+# trip -> route dictionary, so peak memory grows with the number of stops and trips rather
+# than with the tens of millions of stop_times rows across all borough feeds. Each feed is
+# processed in its own worker process and the per-feed stop -> routes sets are merged at the end.
+# When pyarrow is installed its multithreaded streaming CSV reader is used for stop_times.txt.
+#
+# Per-feed results are cached as Parquet under --cache-dir (when pyarrow or fastparquet is
+# installed), keyed on the feed_info.txt version and the size/mtime of the GTFS files read, so
+# only feeds that MTA republished are rebuilt.
+#
+# --compact writes a slimmer GeoJSON for the browser (stop_id/stop_name only, coordinates
+# quantized to ~1 m, route ids replaced by indices into a shared top-level "routes" table);
+# --binary additionally writes a packed typed-array file (.bin) or a FlatGeobuf (.fgb).
+# GeoJSON is streamed feature by feature through processing/geojson_stream.py; --compress also
+# writes .gz/.br copies for the static server.
+#
+# Usage: python bus_stops_geojson_from_gtfs.py [--gtfs-dir ../gtfs] [--output ../gtfs/bus_stops_nyc.geojson] [--workers N]
+import argparse
+import importlib.util
+import json
+import os
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from glob import glob
 
-# %%
-bus_stops_nyc = pd.concat([pd.read_csv(f) for f in glob("../gtfs/*/stops.txt")])
+import geopandas as gpd
+import pandas as pd
 
-# %%
-bus_routes_nyc = pd.concat([pd.read_csv(f) for f in glob("../gtfs/*/routes.txt")])
-bus_stop_times_nyc = pd.concat([pd.read_csv(f) for f in glob("../gtfs/*/stop_times.txt")])
-bus_trips_nyc = pd.concat([pd.read_csv(f) for f in glob("../gtfs/*/trips.txt")])
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
 
-# %%
-print(bus_stops_nyc.isna().sum())
-print(bus_routes_nyc.isna().sum())
-print(bus_stop_times_nyc.isna().sum())
-print(bus_trips_nyc.isna().sum())
+# The feed cache needs a pandas Parquet engine; without one, feeds are always rebuilt
+HAS_PARQUET = pa is not None or importlib.util.find_spec("fastparquet") is not None
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../processing"))
+from geojson_stream import COMPRESSIONS, iter_features, json_value, write_feature_collection, write_geojson  # noqa: E402
 
-# %%
-# drop cols with nas 
-bus_stops_nyc = bus_stops_nyc.dropna(axis=1, how='all')
-# drop 'location_type', and 'stop_desc'
-bus_stops_nyc = bus_stops_nyc.drop(columns=['location_type', 'stop_desc'])
 
+def load_trip_routes(trips_path, valid_routes):
+    """Map trip_id -> route_id for one feed, keeping only routes listed in routes.txt."""
+    trips = pd.read_csv(trips_path, usecols=["trip_id", "route_id"], dtype=str)
+    trips = trips[trips["route_id"].isin(valid_routes)]
+    return dict(zip(trips["trip_id"], trips["route_id"]))
 
-# %%
-# convert to geodataframe
-bus_stops_nyc = gpd.GeoDataFrame(
-    bus_stops_nyc, 
-    geometry=gpd.points_from_xy(bus_stops_nyc.stop_lon, bus_stops_nyc.stop_lat),
-    crs="EPSG:4326"
-)
 
+def iter_stop_times(stop_times_path, chunksize=1_000_000):
+    """Yield DataFrames of (trip_id, stop_id) strings from stop_times.txt, one chunk at a time."""
+    columns = ["trip_id", "stop_id"]
+    if pa is not None:
+        reader = pa_csv.open_csv(
+            stop_times_path,
+            read_options=pa_csv.ReadOptions(block_size=64 << 20),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=columns, column_types={c: pa.string() for c in columns}
+            ),
+        )
+        for batch in reader:
+            yield batch.to_pandas()
+        return
+    yield from pd.read_csv(stop_times_path, usecols=columns, dtype=str, chunksize=chunksize)
 
-# join stop_times and trips 
-bus_stop_times_nyc = bus_stop_times_nyc.merge(bus_trips_nyc, on='trip_id')
-# join merged with routes 
-merged_route_info = bus_routes_nyc.merge(bus_stop_times_nyc, on='route_id')
-# for each stop_id in stop_times.txt, list all distinct route_id (from trips.txt -> routes.txt merge) that have trips serving the stop. 
-routes_per_stop = merged_route_info.groupby('stop_id')['route_id'].apply(set).apply(list).reset_index()
 
+def accumulate_stop_routes(stop_times_path, trip_routes, stop_routes, chunksize=1_000_000):
+    """Add the (stop_id, route_id) pairs of one feed's stop_times.txt to stop_routes in place."""
+    for chunk in iter_stop_times(stop_times_path, chunksize):
+        pairs = pd.DataFrame({"stop_id": chunk["stop_id"], "route_id": chunk["trip_id"].map(trip_routes)})
+        pairs = pairs.dropna().drop_duplicates()
+        for stop_id, route_id in zip(pairs["stop_id"], pairs["route_id"]):
+            stop_routes.setdefault(stop_id, set()).add(route_id)
+    return stop_routes
 
-# add routes per stop to bus_stops_nyc
-bus_stops_nyc = bus_stops_nyc.merge(routes_per_stop, on='stop_id', how='left')
 
+def process_feed(feed_dir, chunksize=1_000_000):
+    """Worker: read one feed and return (stops DataFrame, {stop_id: set(route_id)})."""
+    stops = pd.read_csv(os.path.join(feed_dir, "stops.txt"))
+    routes = pd.read_csv(os.path.join(feed_dir, "routes.txt"), usecols=["route_id"], dtype=str)
+    trip_routes = load_trip_routes(os.path.join(feed_dir, "trips.txt"), set(routes["route_id"]))
+    stop_routes = accumulate_stop_routes(os.path.join(feed_dir, "stop_times.txt"), trip_routes, {}, chunksize)
+    print(f"{feed_name(feed_dir)}: {len(stops)} stops, {len(trip_routes)} trips, "
+          f"{len(stop_routes)} served stops")
+    return stops, stop_routes
 
-# %%
-# write to geojson
-bus_stops_nyc.to_file("../gtfs/bus_stops_nyc.geojson", driver='GeoJSON')
 
-# %%
+# GTFS files whose contents feed into the output
+FEED_FILES = ("stops.txt", "routes.txt", "trips.txt", "stop_times.txt")
 
 
+def feed_name(feed_dir):
+    return os.path.basename(os.path.normpath(feed_dir))
 
+
+def feed_fingerprint(feed_dir):
+    """Identify a feed's contents by its feed_info.txt version and the size/mtime of the files we read.
+
+    Cheap to compute on every run: stop_times.txt is hundreds of MB, so it is never read for a cache hit.
+    """
+    version = None
+    feed_info_path = os.path.join(feed_dir, "feed_info.txt")
+    if os.path.isfile(feed_info_path):
+        feed_info = pd.read_csv(feed_info_path, dtype=str)
+        if "feed_version" in feed_info.columns and len(feed_info):
+            version = feed_info["feed_version"].iloc[0]
+    files = {}
+    for name in FEED_FILES:
+        stat = os.stat(os.path.join(feed_dir, name))
+        files[name] = [stat.st_size, stat.st_mtime_ns]
+    return {"feed_version": version, "files": files}
+
+
+def load_cache_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_cached_feed(cache_dir, name):
+    stops = pd.read_parquet(os.path.join(cache_dir, f"{name}.stops.parquet"))
+    pairs = pd.read_parquet(os.path.join(cache_dir, f"{name}.stop_routes.parquet"))
+    stop_routes = {}
+    for stop_id, route_id in zip(pairs["stop_id"], pairs["route_id"]):
+        stop_routes.setdefault(stop_id, set()).add(route_id)
+    return stops, stop_routes
+
+
+def save_cached_feed(cache_dir, name, partial):
+    stops, stop_routes = partial
+    pairs = pd.DataFrame(
+        [(stop_id, route_id) for stop_id, routes in stop_routes.items() for route_id in sorted(routes)],
+        columns=["stop_id", "route_id"],
+    )
+    stops.to_parquet(os.path.join(cache_dir, f"{name}.stops.parquet"), index=False)
+    pairs.to_parquet(os.path.join(cache_dir, f"{name}.stop_routes.parquet"), index=False)
+
+
+def process_feeds(feed_dirs, chunksize=1_000_000, workers=None, cache_dir=None):
+    """Process feeds in parallel and reduce them to (stops DataFrame, {stop_id: set(route_id)}).
+
+    With cache_dir, feeds whose fingerprint matches the cache manifest are loaded from
+    Parquet and only changed feeds are re-processed.
+    """
+    partials = {}
+    fingerprints = {}
+    manifest = {}
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        manifest = load_cache_manifest(cache_dir)
+        with ThreadPoolExecutor() as pool:
+            fingerprints = dict(zip(feed_dirs, pool.map(feed_fingerprint, feed_dirs)))
+        for feed_dir in feed_dirs:
+            name = feed_name(feed_dir)
+            if manifest.get(name) == fingerprints[feed_dir]:
+                try:
+                    partials[feed_dir] = load_cached_feed(cache_dir, name)
+                    print(f"{name}: unchanged, loaded from cache")
+                except (OSError, ValueError, ImportError):
+                    pass
+
+    stale = [d for d in feed_dirs if d not in partials]
+    workers = min(workers or os.cpu_count() or 1, max(1, len(stale)))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partials.update(zip(stale, pool.map(process_feed, stale, [chunksize] * len(stale))))
+    else:
+        partials.update((d, process_feed(d, chunksize)) for d in stale)
+
+    if cache_dir and stale:
+        for feed_dir in stale:
+            try:
+                save_cached_feed(cache_dir, feed_name(feed_dir), partials[feed_dir])
+            except (OSError, ValueError, ImportError) as exc:
+                print(f"{feed_name(feed_dir)}: not cached ({exc})")
+                continue
+            manifest[feed_name(feed_dir)] = fingerprints[feed_dir]
+        with open(os.path.join(cache_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"Rebuilt {len(stale)} of {len(feed_dirs)} feeds")
+
+    partials = [partials[d] for d in feed_dirs]
+    stop_routes = {}
+    for _, feed_stop_routes in partials:
+        for stop_id, routes in feed_stop_routes.items():
+            stop_routes.setdefault(stop_id, set()).update(routes)
+    return pd.concat([stops for stops, _ in partials]), stop_routes
+
+
+def clean_stops(bus_stops_nyc):
+    print(bus_stops_nyc.isna().sum())
+    # drop cols with nas
+    bus_stops_nyc = bus_stops_nyc.dropna(axis=1, how='all')
+    # drop 'location_type', and 'stop_desc'
+    bus_stops_nyc = bus_stops_nyc.drop(columns=['location_type', 'stop_desc'], errors='ignore')
+    return bus_stops_nyc
+
+
+def build_bus_stops(feed_dirs, chunksize=1_000_000, workers=None, cache_dir=None):
+    """Return a GeoDataFrame of all stops with a `route_id` list of the routes serving each stop."""
+    bus_stops_nyc, stop_routes = process_feeds(feed_dirs, chunksize, workers, cache_dir)
+    bus_stops_nyc = clean_stops(bus_stops_nyc)
+    # stop_times ids were read as strings; stops.txt keeps pandas' inferred dtype for output
+    bus_stops_nyc["route_id"] = bus_stops_nyc["stop_id"].astype(str).map(
+        lambda stop_id: sorted(stop_routes[stop_id]) if stop_id in stop_routes else None
+    )
+    return gpd.GeoDataFrame(
+        bus_stops_nyc,
+        geometry=gpd.points_from_xy(bus_stops_nyc.stop_lon, bus_stops_nyc.stop_lat),
+        crs="EPSG:4326"
+    )
+
+
+# Properties kept in compact output; stop_lat/stop_lon duplicate the geometry
+COMPACT_PROPERTIES = ("stop_id", "stop_name")
+# 5 decimal places of a degree is ~1.1 m of latitude in NYC
+COMPACT_PRECISION = 5
+PACKED_MAGIC = b"SSBS"
+
+
+def encode_routes(bus_stops_nyc):
+    """Dictionary-encode route lists: return (sorted route table, per-stop lists of table indices)."""
+    route_lists = [r if isinstance(r, list) else [] for r in bus_stops_nyc["route_id"]]
+    table = sorted({route for routes in route_lists for route in routes})
+    index = {route: i for i, route in enumerate(table)}
+    return table, [[index[route] for route in routes] for routes in route_lists]
+
+
+def write_compact_geojson(bus_stops_nyc, path, precision=COMPACT_PRECISION, compress=()):
+    """Write stops as minified GeoJSON with quantized coordinates and dictionary-encoded routes."""
+    table, route_indices = encode_routes(bus_stops_nyc)
+    properties = [name for name in COMPACT_PROPERTIES if name in bus_stops_nyc.columns]
+
+    def features():
+        for feature, routes in zip(iter_features(bus_stops_nyc, precision, properties), route_indices):
+            feature["properties"]["routes"] = routes
+            yield feature
+
+    return write_feature_collection(features(), path, extra={"routes": table}, compress=compress)
+
+
+def write_packed_stops(bus_stops_nyc, path, precision=COMPACT_PRECISION):
+    """Write stops as one little-endian buffer the browser can view with typed arrays.
+
+    Layout: b"SSBS", uint32 header length, UTF-8 JSON header
+    {"version", "count", "scale", "routes", "stop_ids", "stop_names"} padded to 4 bytes, then
+    int32 lon[count], int32 lat[count] (degrees * scale), uint32 route_offsets[count + 1]
+    and uint16 route_indices[route_offsets[count]] into the routes table.
+    """
+    table, route_indices = encode_routes(bus_stops_nyc)
+    if len(table) > 0xFFFF:
+        raise ValueError(f"{len(table)} routes do not fit uint16 route indices")
+    scale = 10 ** precision
+    header = json.dumps({
+        "version": 1,
+        "count": len(bus_stops_nyc),
+        "scale": scale,
+        "routes": table,
+        "stop_ids": [json_value(v) for v in bus_stops_nyc["stop_id"]],
+        "stop_names": [json_value(v) for v in bus_stops_nyc["stop_name"]],
+    }, separators=(",", ":")).encode("utf-8")
+    header += b" " * (-(len(PACKED_MAGIC) + 4 + len(header)) % 4)
+    lons = [round(p.x * scale) for p in bus_stops_nyc.geometry]
+    lats = [round(p.y * scale) for p in bus_stops_nyc.geometry]
+    offsets = [0]
+    for routes in route_indices:
+        offsets.append(offsets[-1] + len(routes))
+    flat = [i for routes in route_indices for i in routes]
+    with open(path, "wb") as f:
+        f.write(PACKED_MAGIC + struct.pack("<I", len(header)) + header)
+        f.write(struct.pack(f"<{len(lons)}i", *lons))
+        f.write(struct.pack(f"<{len(lats)}i", *lats))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(struct.pack(f"<{len(flat)}H", *flat))
+
+
+def write_flatgeobuf_stops(bus_stops_nyc, path):
+    """Write compact stops as FlatGeobuf; route indices are stored as a comma-separated string."""
+    table, route_indices = encode_routes(bus_stops_nyc)
+    compact = bus_stops_nyc[[c for c in COMPACT_PROPERTIES if c in bus_stops_nyc.columns] + ["geometry"]].copy()
+    compact["routes"] = [",".join(map(str, routes)) for routes in route_indices]
+    compact.to_file(path, driver="FlatGeobuf")
+    # FlatGeobuf has no place for the shared route table; ship it alongside
+    with open(os.path.splitext(path)[0] + ".routes.json", "w") as f:
+        json.dump(table, f, separators=(",", ":"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build bus_stops_nyc.geojson from MTA bus GTFS feeds.")
+    parser.add_argument("--gtfs-dir", default="../gtfs", help="Directory with one sub-directory per GTFS feed")
+    parser.add_argument("--output", default="../gtfs/bus_stops_nyc.geojson", help="Output GeoJSON path")
+    parser.add_argument("--chunksize", type=int, default=1_000_000, help="stop_times.txt rows per chunk (pandas reader)")
+    parser.add_argument("--workers", type=int, default=None, help="Feed worker processes (default: one per feed, up to CPU count)")
+    parser.add_argument("--cache-dir", default=None, help="Per-feed Parquet cache (default: <gtfs-dir>/.cache)")
+    parser.add_argument("--no-cache", action="store_true", help="Rebuild every feed and leave the cache untouched")
+    parser.add_argument("--compact", action="store_true",
+                        help="Write minified GeoJSON with ~1 m coordinates and dictionary-encoded routes")
+    parser.add_argument("--binary", choices=("packed", "fgb"), default=None,
+                        help="Also write a packed typed-array (.bin) or FlatGeobuf (.fgb) file next to --output")
+    parser.add_argument("--compress", default="", help="Also write pre-compressed GeoJSON copies: gzip, br (comma-separated)")
+    args = parser.parse_args()
+    compress = tuple(c.strip() for c in args.compress.split(",") if c.strip())
+    if set(compress) - set(COMPRESSIONS):
+        parser.error(f"--compress accepts: {', '.join(COMPRESSIONS)}")
+    cache_dir = None if args.no_cache else (args.cache_dir or os.path.join(args.gtfs_dir, ".cache"))
+    if cache_dir and not HAS_PARQUET:
+        print("No Parquet engine (pyarrow or fastparquet) installed; feed cache disabled")
+        cache_dir = None
+
+    feed_dirs = sorted(os.path.dirname(p) for p in glob(os.path.join(args.gtfs_dir, "*", "stops.txt")))
+    if not feed_dirs:
+        raise SystemExit(f"No GTFS feeds found under {args.gtfs_dir}")
+
+    bus_stops_nyc = build_bus_stops(feed_dirs, args.chunksize, args.workers, cache_dir)
+
+    # write to geojson
+    if args.compact:
+        write_compact_geojson(bus_stops_nyc, args.output, compress=compress)
+    else:
+        write_geojson(bus_stops_nyc, args.output, compress=compress)
+    print(f"Wrote {len(bus_stops_nyc)} stops to {args.output} ({os.path.getsize(args.output) / 1024:.0f} KiB)")
+
+    if args.binary:
+        binary_path = os.path.splitext(args.output)[0] + (".bin" if args.binary == "packed" else ".fgb")
+        if args.binary == "packed":
+            write_packed_stops(bus_stops_nyc, binary_path)
+        else:
+            write_flatgeobuf_stops(bus_stops_nyc, binary_path)
+        print(f"Wrote {binary_path} ({os.path.getsize(binary_path) / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# Build citibike_stations.geojson (read by the app and by enrich_areas.py) from the culled GBFS
+# station list that citibike_stations.sh downloads ([{short_name, lat, lon}]).
+#
+# Same steps as citibike_stations_geojson.ipynb: coordinates rounded to 5 decimals (~1 m),
+# one Point per station keyed by its unique short_name.
+#
+# Usage: python citibike_stations_geojson.py [--input ../citibike_stations/stations_culled.json]
+#                                            [--output ../citibike_stations/citibike_stations.geojson]
+import argparse
+import os
+
+import geopandas as gpd
+import pandas as pd
+
+
+def stations_to_gdf(path):
+    stations = pd.read_json(path)
+    stations["lat"] = stations["lat"].round(5)
+    stations["lon"] = stations["lon"].round(5)
+    gdf = gpd.GeoDataFrame(stations, geometry=gpd.points_from_xy(stations.lon, stations.lat), crs="EPSG:4326")
+    gdf = gdf.drop(columns=["lat", "lon"]).set_index("short_name", drop=True)
+    if not gdf.index.is_unique:
+        duplicates = sorted(gdf.index[gdf.index.duplicated()].astype(str).unique())
+        raise SystemExit(f"{path}: duplicate short_name(s): {', '.join(duplicates[:10])}")
+    return gdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the culled Citi Bike station list to GeoJSON.")
+    parser.add_argument("--input", default="../citibike_stations/stations_culled.json",
+                        help="Output of citibike_stations.sh (default: ../citibike_stations/stations_culled.json)")
+    parser.add_argument("--output", default="../citibike_stations/citibike_stations.geojson",
+                        help="GeoJSON for the app (default: ../citibike_stations/citibike_stations.geojson)")
+    args = parser.parse_args()
+
+    gdf = stations_to_gdf(args.input)
+    tmp = f"{args.output}.tmp"
+    # The layer name becomes the top-level "name" member; keep it independent of the temp file name
+    layer = os.path.splitext(os.path.basename(args.output))[0]
+    gdf.to_file(tmp, driver="GeoJSON", layer=layer)
+    os.replace(tmp, args.output)
+    print(f"Wrote {len(gdf)} stations to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# Attach nearby-infrastructure counts and nearest distances to the area layers the app loads
+# (public plazas and the minified CEMSID permit areas), so the client no longer works them out.
+#
+# Every area and infrastructure layer is projected once to UTM 18N (meters). Then, per
+# infrastructure layer, one STRtree-backed join gives all counts and one gives all distances:
+#   - gpd.sjoin(points, areas, predicate="dwithin", distance=r) -> <layer>_<r>m: points within r m
+#     of the area (inside it included), counted per area with np.bincount,
+#   - gpd.sjoin_nearest(areas, points)                          -> <layer>_nearest_m: distance in
+#     meters to the closest point (0 when one lies inside), rounded to 1 m.
+# Only properties are added: features are copied from the source document as parsed JSON, so
+# geometry, feature order (the permit areas' packed spatial index refers to features by position)
+# and top-level members such as "name" and "crs" are kept. Rerunning replaces earlier values.
+# The plazas artifact is enriched in place; the minified permit areas, which the permit_areas
+# stage owns, are written to nyc-permit-areas-enriched.geojson next to them.
+#
+# Usage: python enrich_areas.py [--area ../nyc_public_plazas_enriched.geojson[=OUTPUT] ...]
+#                               [--layer bus_stops=../bus_stops_nyc.geojson ...] [--radii 100,250]
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../processing"))
+from geojson_stream import COMPRESSIONS, json_value, write_feature_collection  # noqa: E402
+
+# Source -> output; the plazas file is its own source
+DEFAULT_AREAS = {
+    "../nyc_public_plazas_enriched.geojson": "../nyc_public_plazas_enriched.geojson",
+    "../../permit-areas/nyc-permit-areas-minified.geojson": "../../permit-areas/nyc-permit-areas-enriched.geojson",
+}
+DEFAULT_LAYERS = {
+    "bus_stops": "../bus_stops_nyc.geojson",
+    "citibike": "../citibike_stations/citibike_stations.geojson",
+}
+DEFAULT_RADII = (100, 250)
+# UTM zone 18N: meters, low distortion across the five boroughs
+METRIC_CRS = "EPSG:32618"
+
+
+def load_points(path):
+    """Infrastructure layer as projected points (polygons and lines are reduced to a representative point)."""
+    gdf = gpd.read_file(path, columns=[])
+    gdf = gdf[gdf.geometry.notna() & ~gdf.geometry.is_empty]
+    if gdf.crs is None:
+        gdf = gdf.set_crs("EPSG:4326")
+    gdf = gdf.to_crs(METRIC_CRS)
+    if not (gdf.geom_type == "Point").all():
+        gdf["geometry"] = gdf.geometry.representative_point()
+    return gdf.reset_index(drop=True)
+
+
+def count_within(areas, points, radius):
+    """Number of points within `radius` meters of every area (vectorized dwithin join)."""
+    joined = gpd.sjoin(points, areas[["geometry"]], how="inner", predicate="dwithin", distance=radius)
+    return np.bincount(joined["index_right"].to_numpy(), minlength=len(areas))
+
+
+def nearest_distance(areas, points):
+    """Distance in meters from every area to its closest point (NaN when there are no points)."""
+    if points.empty:
+        return np.full(len(areas), np.nan)
+    joined = gpd.sjoin_nearest(areas[["geometry"]], points, how="left", distance_col="distance")
+    # Ties return several rows per area; they share the same distance
+    distance = joined.groupby(level=0)["distance"].min()
+    return distance.reindex(range(len(areas))).to_numpy()
+
+
+def enrichment_column(name, column):
+    """True for columns this script adds for layer `name` (any radius)."""
+    return re.fullmatch(rf"{re.escape(name)}_(\d+m|nearest_m)", column) is not None
+
+
+def enrich(areas, layers, radii):
+    """Add <layer>_<r>m and <layer>_nearest_m columns to `areas` (any CRS); returns the new columns."""
+    projected = areas[["geometry"]].to_crs(METRIC_CRS).reset_index(drop=True)
+    valid = projected.geometry.notna() & ~projected.geometry.is_empty
+    targets = projected[valid].reset_index(drop=True)
+    positions = np.flatnonzero(valid.to_numpy())
+    columns = []
+    for name, points in layers.items():
+        # Columns from an earlier run, possibly with other radii
+        stale = [c for c in areas.columns if enrichment_column(name, c)]
+        areas.drop(columns=stale, inplace=True)
+        for radius in radii:
+            counts = np.zeros(len(areas), dtype=np.int64)
+            counts[positions] = count_within(targets, points, radius)
+            areas[f"{name}_{radius}m"] = counts
+            columns.append(f"{name}_{radius}m")
+        distance = np.full(len(areas), np.nan)
+        distance[positions] = np.round(nearest_distance(targets, points))
+        # Integer meters; NaN (no geometry, or an empty layer) is written as null
+        areas[f"{name}_nearest_m"] = pd.Series([None if np.isnan(d) else int(d) for d in distance],
+                                               index=areas.index, dtype=object)
+        columns.append(f"{name}_nearest_m")
+    return columns
+
+
+def write_enriched(source_path, output_path, areas, columns, layer_names, compress=()):
+    """Copy the source FeatureCollection to output_path with the enrichment columns set on each feature."""
+    with open(source_path, encoding="utf-8") as f:
+        doc = json.load(f)
+    features = doc.get("features", [])
+    if len(features) != len(areas):
+        raise SystemExit(f"{source_path}: {len(features)} features but {len(areas)} rows were read")
+    values = {column: areas[column].tolist() for column in columns}
+
+    def enriched():
+        for i, feature in enumerate(features):
+            properties = {key: value for key, value in (feature.get("properties") or {}).items()
+                          if not any(enrichment_column(name, key) for name in layer_names)}
+            properties.update((column, json_value(values[column][i])) for column in columns)
+            yield {**feature, "properties": properties}
+
+    extra = {key: value for key, value in doc.items() if key not in ("type", "features")}
+    return write_feature_collection(enriched(), output_path, extra, compress)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add nearby bus stop / Citi Bike counts and distances to area layers.")
+    parser.add_argument("--area", action="append", default=None, metavar="PATH[=OUTPUT]",
+                        help="Area GeoJSON to enrich, written to OUTPUT or in place "
+                             "(repeatable; default: plazas in place, minified permit areas to nyc-permit-areas-enriched.geojson)")
+    parser.add_argument("--layer", action="append", default=None, metavar="NAME=PATH",
+                        help="Infrastructure points as name=path (repeatable; default: bus_stops and citibike)")
+    parser.add_argument("--radii", default=",".join(map(str, DEFAULT_RADII)),
+                        help=f"Comma-separated count radii in meters (default: {','.join(map(str, DEFAULT_RADII))})")
+    parser.add_argument("--compress", default="", help="Also write pre-compressed copies: gzip, br (comma-separated)")
+    args = parser.parse_args()
+
+    compress = tuple(c.strip() for c in args.compress.split(",") if c.strip())
+    if set(compress) - set(COMPRESSIONS):
+        parser.error(f"--compress accepts: {', '.join(COMPRESSIONS)}")
+    try:
+        radii = sorted({int(r) for r in args.radii.split(",") if r.strip()})
+    except ValueError:
+        parser.error("--radii takes comma-separated integers, e.g. 100,250")
+    layer_specs = DEFAULT_LAYERS
+    if args.layer:
+        layer_specs = {}
+        for spec in args.layer:
+            name, sep, path = spec.partition("=")
+            if not sep or not name or not path:
+                parser.error(f"--layer expects name=path, got {spec!r}")
+            layer_specs[name] = path
+
+    start = time.perf_counter()
+    layers = {}
+    for name, path in layer_specs.items():
+        layers[name] = load_points(path)
+        print(f"{name}: {len(layers[name])} points from {path}")
+
+    areas_specs = DEFAULT_AREAS
+    if args.area:
+        areas_specs = {}
+        for spec in args.area:
+            path, _, output = spec.partition("=")
+            areas_specs[path] = output or path
+
+    for path, output in areas_specs.items():
+        if not os.path.exists(path):
+            print(f"Skipping {path}: not found")
+            continue
+        areas = gpd.read_file(path)
+        if areas.crs is None:
+            areas = areas.set_crs("EPSG:4326")
+        area_start = time.perf_counter()
+        columns = enrich(areas, layers, radii)
+        seconds = time.perf_counter() - area_start
+        write_enriched(path, output, areas, columns, list(layers), compress)
+        summary = ", ".join(
+            f"{name} median {np.nanmedian(areas[f'{name}_nearest_m'].astype(float)):.0f} m"
+            for name in layers) if len(areas) else "empty"
+        print(f"Enriched {len(areas)} areas from {path} with {len(columns)} columns in {seconds:.2f}s ({summary}) -> {output}")
+
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
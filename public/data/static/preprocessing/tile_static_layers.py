@@ -0,0 +1,102 @@
+# Cut the citywide static layers (bus stops, public plazas) into z/x/y GeoJSON tiles plus a tile index.
+#
+# The app can then fetch only the tiles covering the current permit area's viewport instead of
+# parsing all of NYC. Points go into the one tile containing them; polygons are copied whole into
+# every tile their bounding box touches, with the feature "id" set to the source row so the client
+# can drop duplicates. index.json lists, per layer, the zooms, the non-empty tiles and their
+# feature counts.
+#
+# Usage: python tile_static_layers.py [--layer bus_stops=../bus_stops_nyc.geojson ...] [--zooms 12,14] [--out-dir ../tiles]
+import argparse
+import json
+import math
+import os
+
+import geopandas as gpd
+import numpy as np
+
+DEFAULT_LAYERS = {
+    "bus_stops": "../bus_stops_nyc.geojson",
+    "plazas": "../nyc_public_plazas_enriched.geojson",
+}
+# Web Mercator latitude limit
+MAX_LAT = 85.0511287798
+
+
+def lon_to_tile_x(lon, zoom):
+    n = 2 ** zoom
+    return np.clip(np.floor((np.asarray(lon) + 180.0) / 360.0 * n), 0, n - 1).astype(np.int64)
+
+
+def lat_to_tile_y(lat, zoom):
+    n = 2 ** zoom
+    lat_rad = np.radians(np.clip(np.asarray(lat), -MAX_LAT, MAX_LAT))
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / math.pi) / 2.0 * n
+    return np.clip(np.floor(y), 0, n - 1).astype(np.int64)
+
+
+def json_default(value):
+    """Serialize list-valued columns (e.g. bus stop route_id), which GDAL reads back as arrays."""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def assign_tiles(gdf, zoom):
+    """Map (x, y) -> list of row positions for every tile a feature's bounding box touches."""
+    bounds = gdf.geometry.bounds
+    x0 = lon_to_tile_x(bounds["minx"], zoom)
+    x1 = lon_to_tile_x(bounds["maxx"], zoom)
+    # Tile y grows southward, so the northern edge gives the smaller y
+    y0 = lat_to_tile_y(bounds["maxy"], zoom)
+    y1 = lat_to_tile_y(bounds["miny"], zoom)
+    tiles = {}
+    for pos in np.flatnonzero(~gdf.geometry.is_empty.to_numpy()):
+        for x in range(x0[pos], x1[pos] + 1):
+            for y in range(y0[pos], y1[pos] + 1):
+                tiles.setdefault((x, y), []).append(pos)
+    return tiles
+
+
+def tile_layer(name, path, zooms, out_dir):
+    """Write one layer's tiles under out_dir/<name>/<z>/<x>/<y>.geojson and return its index entry."""
+    gdf = gpd.read_file(path).to_crs("EPSG:4326").reset_index(drop=True)
+    entry = {"source": os.path.basename(path), "features": len(gdf), "bbox": [round(v, 6) for v in gdf.total_bounds],
+             "zooms": {}}
+    for zoom in zooms:
+        tiles = assign_tiles(gdf, zoom)
+        counts = {}
+        for (x, y), positions in sorted(tiles.items()):
+            tile_dir = os.path.join(out_dir, name, str(zoom), str(x))
+            os.makedirs(tile_dir, exist_ok=True)
+            with open(os.path.join(tile_dir, f"{y}.geojson"), "w") as f:
+                f.write(gdf.iloc[positions].to_json(drop_id=False, default=json_default))
+            counts[f"{x}/{y}"] = len(positions)
+        entry["zooms"][str(zoom)] = {"tiles": counts}
+        print(f"{name} z{zoom}: {len(counts)} tiles, {sum(counts.values())} feature copies from {len(gdf)} features")
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cut static GeoJSON layers into z/x/y tiles with an index.")
+    parser.add_argument("--layer", action="append", default=None, metavar="NAME=PATH",
+                        help="Layer to tile (repeatable; default: bus_stops and plazas)")
+    parser.add_argument("--zooms", default="12,14", help="Comma-separated tile zoom levels (default: 12,14)")
+    parser.add_argument("--out-dir", default="../tiles", help="Output directory for tiles and index.json")
+    args = parser.parse_args()
+
+    layers = dict(DEFAULT_LAYERS)
+    if args.layer:
+        layers = dict(spec.split("=", 1) for spec in args.layer)
+    zooms = sorted({int(z) for z in args.zooms.split(",") if z.strip()})
+
+    index = {"version": 1, "format": "geojson", "scheme": "xyz", "layers": {}}
+    for name, path in layers.items():
+        index["layers"][name] = tile_layer(name, path, zooms, args.out_dir)
+    with open(os.path.join(args.out_dir, "index.json"), "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+    print(f"Wrote tile index to {os.path.join(args.out_dir, 'index.json')}")
+
+
+if __name__ == "__main__":
+    main()